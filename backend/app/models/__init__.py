@@ -1,7 +1,7 @@
 from .base import Base
 from .country import Country, CountryIndicator, TradePair
 from .asset import Asset, AssetType, Price, StockCountryRevenue
-from .user import User, UserTier, PriceAlert, LoginEvent, PageView, EmailAlert, NewsletterSubscriber
+from .user import User, UserTier, PriceAlert, LoginEvent, PageView, PageViewDaily, EmailAlert, NewsletterSubscriber
 from .feed import FeedEvent, UserFollow, UserInteraction, FollowEntityType, InteractionType
 from .summary import PageSummary, PageInsight
 from .user import AlertDelivery, MacroAlert
@@ -9,7 +9,7 @@ from .macro import MacroSeries
 from .earnings import EarningsEvent
 from .macro_calendar import MacroCalendarEvent
 from .company_profile import CompanyProfile
-from .smart_money import SmartMoneyInvestor, SmartMoneyFiling, SmartMoneyHolding
+from .smart_money import SmartMoneyInvestor, SmartMoneyFiling, SmartMoneyHolding, SmartMoneyCusipMap
 
 __all__ = [
     "Base",
@@ -34,6 +34,7 @@ __all__ = [
     "PageInsight",
     "LoginEvent",
     "PageView",
+    "PageViewDaily",
     "MacroSeries",
     "EarningsEvent",
     "EmailAlert",
@@ -43,4 +44,5 @@ __all__ = [
     "SmartMoneyInvestor",
     "SmartMoneyFiling",
     "SmartMoneyHolding",
+    "SmartMoneyCusipMap",
 ]
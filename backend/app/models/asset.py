@@ -49,6 +49,9 @@ class Asset(Base):
     __table_args__ = (
         UniqueConstraint("symbol", "exchange", name="uq_asset_symbol_exchange"),
         Index("ix_assets_type", "asset_type"),
+        # pg_trgm — /api/search Postgres fallback (similarity + substring match)
+        Index("ix_assets_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_assets_symbol_trgm", "symbol", postgresql_using="gin", postgresql_ops={"symbol": "gin_trgm_ops"}),
     )
 
 
@@ -13,6 +13,10 @@ class Country(Base):
     """
 
     __tablename__ = "countries"
+    __table_args__ = (
+        # pg_trgm — /api/search Postgres fallback
+        Index("ix_countries_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -13,7 +13,7 @@ from datetime import datetime
 
 from sqlalchemy import (
     Boolean, DateTime, Enum, Float, ForeignKey, Index, Integer,
-    String, Text, UniqueConstraint,
+    String, Text, UniqueConstraint, text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -29,12 +29,26 @@ class FeedEvent(Base):
     event_subtype narrows it (e.g. event_type='price_move', event_subtype='crypto').
     importance_score (0–10) is set by the generator based on magnitude / market impact.
     The ranker combines importance_score + recency decay + personalisation signals.
+
+    enrichment_status tracks the async AI rewrite of body: the generator inserts
+    the template body immediately and queues enrichment for significant events.
+
+    The table is RANGE-partitioned by month on published_at (migration 0029),
+    so the database primary key is (id, published_at). ids still come from one
+    sequence, so the ORM keeps `id` as the identity. Nothing can hold a foreign
+    key to this table; app.services.feed_archive enforces the old cascade rules.
     """
 
     __tablename__ = "feed_events"
     __table_args__ = (
         Index("ix_feed_events_published_at", "published_at"),
         Index("ix_feed_events_type_subtype", "event_type", "event_subtype"),
+        # Containment (@>) lookups: entity feeds and generator dedup
+        Index("ix_feed_events_related_assets", "related_asset_ids",
+              postgresql_using="gin", postgresql_ops={"related_asset_ids": "jsonb_path_ops"}),
+        Index("ix_feed_events_related_countries", "related_country_ids",
+              postgresql_using="gin", postgresql_ops={"related_country_ids": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (published_at)"},
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -57,8 +71,18 @@ class FeedEvent(Base):
     # 0–10 set by generator: 10 = Fed rate hike, 5 = price moved 3%, 1 = minor update
     importance_score: Mapped[float] = mapped_column(Float, nullable=True, default=0.0)
 
+    # template (no AI needed) | pending (queued) | done (AI body written) | failed (template kept)
+    # NULL for editorial events and rows that predate async enrichment
+    enrichment_status: Mapped[str] = mapped_column(String(10), nullable=True)
+
     # Relationships
-    interactions: Mapped[list["UserInteraction"]] = relationship(back_populates="event")
+    # ORM deletes cascade here like the old FK did; bulk deletes leave orphans
+    # for tasks.feed_archive to prune
+    interactions: Mapped[list["UserInteraction"]] = relationship(
+        back_populates="event",
+        primaryjoin="FeedEvent.id == foreign(UserInteraction.feed_event_id)",
+        cascade="all, delete-orphan",
+    )
 
 
 class FollowEntityType(str, enum.Enum):
@@ -121,15 +145,17 @@ class UserInteraction(Base):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
-    feed_event_id: Mapped[int] = mapped_column(
-        ForeignKey("feed_events.id", ondelete="CASCADE"), nullable=False
-    )
+    # No FK — feed_events is partitioned; orphans are pruned by tasks.feed_archive
+    feed_event_id: Mapped[int] = mapped_column(Integer, nullable=False)
     interaction_type: Mapped[InteractionType] = mapped_column(String(10), nullable=False)
     dwell_seconds: Mapped[int] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     user: Mapped["User"] = relationship(back_populates="interactions")  # type: ignore[name-defined]
-    event: Mapped["FeedEvent"] = relationship(back_populates="interactions")
+    event: Mapped["FeedEvent"] = relationship(
+        back_populates="interactions",
+        primaryjoin="FeedEvent.id == foreign(UserInteraction.feed_event_id)",
+    )
 
 
 # Valid blog category slugs — add new ones here + update BLOG_CATEGORIES in admin router
@@ -166,6 +192,15 @@ class BlogStatus(str, enum.Enum):
     published = "published"
 
 
+# Weighted full-text vector (title A, excerpt B, body C) behind ix_blog_posts_search.
+# Queries must use this exact expression for the planner to pick the index.
+BLOG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'C')"
+)
+
+
 class BlogPost(Base):
     """
     Internal CRM blog post. When published, a FeedEvent is auto-created
@@ -178,6 +213,8 @@ class BlogPost(Base):
         Index("ix_blog_posts_published_at", "published_at"),
         Index("ix_blog_posts_category", "category"),
         Index("ix_blog_posts_author_slug", "author_slug"),
+        Index("ix_blog_posts_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_blog_posts_search", text(f"({BLOG_SEARCH_VECTOR})"), postgresql_using="gin"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -200,9 +237,8 @@ class BlogPost(Base):
     published_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
-    # FK to FeedEvent created on publish (nullable — only set after publish)
-    feed_event_id: Mapped[int] = mapped_column(
-        ForeignKey("feed_events.id", ondelete="SET NULL"), nullable=True
-    )
+    # FeedEvent created on publish (nullable — only set after publish). Not a DB
+    # FK since feed_events is partitioned; nulled when its partition is archived.
+    feed_event_id: Mapped[int] = mapped_column(Integer, nullable=True)
 
     author: Mapped["BlogAuthor"] = relationship(back_populates="posts", foreign_keys=[author_slug])
@@ -101,3 +101,23 @@ class SmartMoneyAlert(Base):
         Index("ix_sm_alerts_slug", "investor_slug"),
         Index("ix_sm_alerts_active", "active"),
     )
+
+
+class SmartMoneyCusipMap(Base):
+    """CUSIP → ticker resolution cache for 13F holdings.
+    Grows every parse run from name matches; manual rows are never overwritten."""
+
+    __tablename__ = "smart_money_cusip_map"
+
+    cusip: Mapped[str] = mapped_column(String(12), primary_key=True)
+    symbol: Mapped[str] = mapped_column(String(20), nullable=False)
+    asset_id: Mapped[Optional[int]] = mapped_column(ForeignKey("assets.id", ondelete="SET NULL"), nullable=True)
+    issuer_name: Mapped[str] = mapped_column(String(300), nullable=True)   # nameOfIssuer as filed
+    match_method: Mapped[str] = mapped_column(String(10), nullable=False)  # exact/fuzzy/manual
+    confidence: Mapped[float] = mapped_column(Float, nullable=True)        # 0.0 - 1.0
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_sm_cusip_map_symbol", "symbol"),
+    )
@@ -1,7 +1,7 @@
 import enum
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import String, Float, DateTime, ForeignKey, Enum, Boolean, Integer, Text, BigInteger, Index, Numeric
+from sqlalchemy import String, Float, Date, DateTime, ForeignKey, Enum, Boolean, Integer, Text, BigInteger, Index, Numeric
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -123,6 +123,24 @@ class PageView(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
 
 
+class PageViewDaily(Base):
+    """
+    Daily rollup of page_views — one row per (entity_type, entity_code, UTC day).
+    Incremented by the page-view flusher alongside the raw insert; kept forever,
+    while raw page_views rows are pruned after PAGE_VIEW_RETENTION_DAYS.
+    """
+    __tablename__ = "page_view_daily"
+    __table_args__ = (
+        Index("ix_page_view_daily_day", "day"),
+    )
+
+    entity_type: Mapped[str] = mapped_column(String(20), primary_key=True)
+    entity_code: Mapped[str] = mapped_column(String(50), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    views: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    user_views: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # views by signed-in users
+
+
 class EmailAlert(Base):
     """
     Email-only asset alert — no account required.
@@ -25,7 +25,10 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.feed import BlogPost, BlogAuthor, BlogStatus, FeedEvent, BLOG_CATEGORIES
 from app.routers.auth import get_admin_user, get_current_user
-from app.models.user import User, LoginEvent, PageView
+from app.models.user import User, LoginEvent, PageViewDaily
+from app.services import meili
+from app.services.local_search import bump_local_index_version
+from app.services.page_view_buffer import enqueue_page_view, write_page_views
 from app.storage import r2_public_url, r2_upload
 from app.limiter import limiter
 from app.utils.deep_links import inject_deep_links, detect_entities
@@ -370,6 +373,9 @@ def update_blog(
     post.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(post)
+    if post.status == BlogStatus.published:
+        bump_local_index_version()
+        meili.upsert_blog(post)
     return post
 
 
@@ -445,6 +451,8 @@ def publish_blog(
     post.feed_event_id = event.id
     db.commit()
     db.refresh(post)
+    bump_local_index_version()
+    meili.upsert_blog(post)
     return post
 
 
@@ -466,8 +474,12 @@ def delete_blog(
         event = db.get(_FeedEvent, post.feed_event_id)
         if event:
             db.delete(event)
+    was_published = post.status == BlogStatus.published
     db.delete(post)
     db.commit()
+    if was_published:
+        bump_local_index_version()
+        meili.delete_blog(post_id)
 
 
 @router.post("/blogs/{post_id}/cover", response_model=dict)
@@ -641,11 +653,13 @@ def admin_stats(
         select(User).order_by(User.created_at.desc()).limit(10)
     ).scalars().all()
 
+    # Daily rollup — a few hundred rows per day instead of scanning raw page_views
+    views_7d = func.sum(PageViewDaily.views)
     top_pages = db.execute(
-        select(PageView.entity_type, PageView.entity_code, func.count(PageView.id).label("views"))
-        .where(PageView.created_at >= d7)
-        .group_by(PageView.entity_type, PageView.entity_code)
-        .order_by(func.count(PageView.id).desc())
+        select(PageViewDaily.entity_type, PageViewDaily.entity_code, views_7d.label("views"))
+        .where(PageViewDaily.day >= d7.date())
+        .group_by(PageViewDaily.entity_type, PageViewDaily.entity_code)
+        .order_by(views_7d.desc())
         .limit(20)
     ).all()
 
@@ -704,6 +718,11 @@ def track_page_view(
     body: TrackIn,
     db: Session = Depends(get_db),
 ):
+    """
+    Buffered: appended to a Redis stream and written in batches by
+    tasks.page_views.flush_page_views (raw rows + page_view_daily rollup).
+    Falls back to an inline write when Redis is unavailable.
+    """
     if body.entity_type not in _VALID_ENTITY_TYPES:
         return  # silently ignore invalid types
 
@@ -719,10 +738,13 @@ def track_page_view(
     except Exception:
         pass
 
-    db.add(PageView(
-        entity_type=body.entity_type,
-        entity_code=body.entity_code[:50],
-        user_id=user_id,
-        created_at=datetime.now(timezone.utc),
-    ))
+    if enqueue_page_view(body.entity_type, body.entity_code[:50], user_id):
+        return
+
+    write_page_views(db, [{
+        "entity_type": body.entity_type,
+        "entity_code": body.entity_code[:50],
+        "user_id": user_id,
+        "created_at": datetime.now(timezone.utc),
+    }])
     db.commit()
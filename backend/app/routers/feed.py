@@ -2,7 +2,9 @@
 Feed router — adaptive personalised financial feed.
 
 Public endpoints (no auth):
-  GET /api/feed               — ranked feed (anonymous = recency + importance only)
+  GET /api/feed               — ranked feed (anonymous = recency + importance only);
+                                pass next_cursor back as ?cursor= for the next page
+  GET /api/feed/entity/{type}/{code} — latest events for one asset or country (detail pages)
 
 Authenticated endpoints (Bearer token required):
   POST /api/feed/{event_id}/interact   — record engagement signal
@@ -18,7 +20,6 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel, model_validator
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.config import settings
@@ -31,10 +32,24 @@ from app.models.feed import (
     FollowEntityType,
     InteractionType,
     UserFollow,
-    UserInteraction,
 )
 from app.models.user import User
-from app.services.feed_ranker import rank_feed
+from app.services.feed_ranker import (
+    ANON_SNAPSHOT_KEY,
+    anonymous_snapshot_id,
+    decode_cursor,
+    encode_cursor,
+    hydrate_events,
+    is_anonymous_sid,
+    load_anonymous_ranking,
+    load_ranking_snapshot,
+    rank_feed_ids,
+    record_anonymous_geo,
+    save_ranking_snapshot,
+)
+from app.services.feed_profile import profile_follow, profile_interaction
+from app.services.interaction_buffer import enqueue_interaction, upsert_interactions
+from app.storage import cache_get, cache_set
 
 router = APIRouter(prefix="/feed", tags=["feed"])
 
@@ -85,6 +100,20 @@ def _require_user(
     return user
 
 
+def _require_user_id(token: str | None = Depends(_oauth2_optional)) -> int:
+    """
+    JWT-only auth for hot write paths — no users-table lookup. Deleted or
+    deactivated accounts are filtered out when the write is flushed.
+    """
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+        return int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
 # ── Pydantic schemas ──────────────────────────────────────────────────────────
 
 class FeedEventOut(BaseModel):
@@ -117,6 +146,7 @@ class FeedPageOut(BaseModel):
     page: int
     page_size: int
     events: list[FeedEventOut]
+    next_cursor: str | None = None  # opaque — None at the end of the ranked snapshot
 
 
 class InteractIn(BaseModel):
@@ -147,6 +177,7 @@ def get_feed(
     request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=50),
+    cursor: str | None = Query(None, max_length=64),
     db: Session = Depends(get_db),
     current_user: User | None = Depends(_optional_user),
 ):
@@ -156,25 +187,68 @@ def get_feed(
     Anonymous users get recency + importance + geo ranking.
     Authenticated users get personalised ranking based on follows + past interactions + geo.
     Geo signal comes from the Cloudflare CF-IPCountry header (2-letter ISO code).
+
+    Anonymous pages are served from the precomputed per-country snapshot
+    (tasks.feed_generator.materialize_anonymous_feeds) without touching the DB;
+    live ranking is the fallback for countries not precomputed yet.
+
+    Pagination: pass the returned next_cursor as ?cursor= to hydrate the
+    following IDs from the same ranking. Signed-in users' first request ranks
+    once and stores the ranked IDs in Redis; anonymous cursors point into the
+    shared precomputed snapshot, so anonymous paging writes nothing. `page` is
+    still honoured for requests without a cursor. An expired cursor re-ranks and
+    continues from the same offset.
     """
     user_id = current_user.id if current_user else None
+    owner = f"user:{user_id}" if user_id else "anon"
+    offset = (page - 1) * page_size
 
     # Detect visitor's country from Cloudflare header (no extra API call needed)
-    geo_country_id: int | None = None
     cf_country = request.headers.get("cf-ipcountry", "").strip().upper()
-    if cf_country and cf_country not in ("", "T1", "XX"):  # T1=Tor, XX=unknown
-        row = db.execute(select(Country.id).where(Country.code == cf_country)).first()
-        if row:
-            geo_country_id = row[0]
-
-    events = rank_feed(
-        db,
-        user_id=user_id,
-        page=page,
+    if cf_country in ("T1", "XX"):  # T1=Tor, XX=unknown
+        cf_country = ""
+
+    anon_snapshot = None
+    if user_id is None:
+        if cf_country:
+            record_anonymous_geo(cf_country)
+        anon_snapshot = cache_get(ANON_SNAPSHOT_KEY)
+
+    ids: list[int] | None = None
+    sid: str | None = None
+    if cursor:
+        parsed = decode_cursor(cursor)
+        if parsed is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        sid, offset = parsed
+        if user_id is None:
+            ids = load_anonymous_ranking(sid, anon_snapshot) if is_anonymous_sid(sid) else None
+        else:
+            ids = load_ranking_snapshot(sid, owner)
+
+    if ids is None:
+        if user_id is None:
+            sid = anonymous_snapshot_id(anon_snapshot, cf_country or None)
+            ids = load_anonymous_ranking(sid, anon_snapshot)
+        if ids is None:
+            geo_country_id: int | None = None
+            if cf_country:
+                row = db.execute(select(Country.id).where(Country.code == cf_country)).first()
+                if row:
+                    geo_country_id = row[0]
+            ids = rank_feed_ids(db, user_id=user_id, geo_country_id=geo_country_id)
+            if user_id is not None:
+                sid = save_ranking_snapshot(ids, owner)
+
+    end = offset + page_size
+    events = hydrate_events(db, ids[offset:end],
+                            cached=anon_snapshot.get("events") if anon_snapshot else None)
+    return FeedPageOut(
+        page=offset // page_size + 1,
         page_size=page_size,
-        geo_country_id=geo_country_id,
+        events=events,
+        next_cursor=encode_cursor(sid, end) if end < len(ids) else None,
     )
-    return FeedPageOut(page=page, page_size=page_size, events=events)
 
 
 @router.get("/events/{event_id}", response_model=FeedEventOut)
@@ -189,41 +263,80 @@ def get_feed_event(request: Request, event_id: int, db: Session = Depends(get_db
     return event
 
 
+@router.get("/entity/{entity_type}/{code}", response_model=list[FeedEventOut])
+@limiter.limit("60/minute")
+def get_entity_feed(
+    request: Request,
+    entity_type: FollowEntityType,
+    code: str,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """
+    Latest feed events mentioning one asset (by symbol) or country (by ISO2 code),
+    newest first. Served by a containment query on the GIN-indexed
+    related_asset_ids / related_country_ids columns.
+    """
+    code = code.strip().upper()
+    cache_key = f"api:feed:entity:{entity_type.value}:{code}:{limit}"
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    if entity_type == FollowEntityType.asset:
+        entity_id = db.execute(
+            select(Asset.id).where(Asset.symbol == code, Asset.is_active == True)
+        ).scalars().first()
+        column = FeedEvent.related_asset_ids
+    else:
+        entity_id = db.execute(select(Country.id).where(Country.code == code)).scalar_one_or_none()
+        column = FeedEvent.related_country_ids
+    if entity_id is None:
+        raise HTTPException(status_code=404, detail=f"{entity_type.value.capitalize()} not found")
+
+    events = db.execute(
+        select(FeedEvent)
+        .where(column.contains([entity_id]))
+        .order_by(FeedEvent.published_at.desc())
+        .limit(limit)
+    ).scalars().all()
+    result = [FeedEventOut.model_validate(e).model_dump(mode="json") for e in events]
+    cache_set(cache_key, result, ttl_seconds=120)
+    return result
+
+
 @router.post("/{event_id}/interact", status_code=status.HTTP_204_NO_CONTENT)
 def record_interaction(
     event_id: int,
     body: InteractIn,
     db: Session = Depends(get_db),
-    current_user: User = Depends(_require_user),
+    user_id: int = Depends(_require_user_id),
 ):
     """
     Record a user interaction on a feed event.
-    Upserts — only the most recent interaction per user per event is kept.
+    One row per user per event — the highest-intent interaction wins.
+
+    Write-behind: appended to a Redis stream and upserted in batches by
+    tasks.feed_interactions.flush_interactions, so this touches neither the DB
+    nor the user_interactions row locks. Unknown event ids are dropped at flush
+    time. If Redis is down, falls back to an inline upsert with the same rule.
     """
-    event = db.get(FeedEvent, event_id)
-    if event is None:
+    interaction_type = body.interaction_type.value
+    # Ranking reads the cached profile, so the next feed request sees this
+    # interaction even before the flusher has written it.
+    profile_interaction(user_id, event_id, interaction_type)
+    if enqueue_interaction(user_id, event_id, interaction_type, body.dwell_seconds):
+        return
+
+    if db.get(FeedEvent, event_id) is None:
         raise HTTPException(status_code=404, detail="Feed event not found")
-
-    # Upsert — if a row exists for (user_id, feed_event_id), update it
-    stmt = (
-        pg_insert(UserInteraction)
-        .values(
-            user_id=current_user.id,
-            feed_event_id=event_id,
-            interaction_type=body.interaction_type,
-            dwell_seconds=body.dwell_seconds,
-            created_at=datetime.now(timezone.utc),
-        )
-        .on_conflict_do_update(
-            constraint="uq_user_interaction",
-            set_={
-                "interaction_type": body.interaction_type,
-                "dwell_seconds": body.dwell_seconds,
-                "created_at": datetime.now(timezone.utc),
-            },
-        )
-    )
-    db.execute(stmt)
+    upsert_interactions(db, [{
+        "user_id": user_id,
+        "feed_event_id": event_id,
+        "interaction_type": interaction_type,
+        "dwell_seconds": body.dwell_seconds,
+        "created_at": datetime.now(timezone.utc),
+    }])
     db.commit()
 
 
@@ -266,6 +379,7 @@ def add_follow(
     db.add(follow)
     db.commit()
     db.refresh(follow)
+    profile_follow(current_user.id, body.entity_type, body.entity_id, following=True)
     return follow
 
 
@@ -291,6 +405,7 @@ def remove_follow(
         raise HTTPException(status_code=404, detail="Follow not found")
     db.delete(follow)
     db.commit()
+    profile_follow(current_user.id, entity_type, entity_id, following=False)
 
 
 @router.get("/watchlist")
@@ -1,84 +1,113 @@
+import logging
+
 from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import func, literal_column, select
 
 from app.database import get_db
 from app.limiter import limiter
 from app.models import Country, Asset
-from app.models.feed import BlogPost, BlogStatus
-from app.config import settings
+from app.models.feed import BLOG_SEARCH_VECTOR, BlogPost, BlogStatus
+from app.services import meili
+from app.services.local_search import get_local_index, tokenize
 
-router = APIRouter(prefix="/search", tags=["search"])
+log = logging.getLogger(__name__)
 
-try:
-    import meilisearch as _meili
-    _MEILI_AVAILABLE = True
-except ImportError:
-    _MEILI_AVAILABLE = False
+router = APIRouter(prefix="/search", tags=["search"])
 
 
 def _meili_search(q: str) -> dict | None:
-    """Search via Meilisearch. Returns None if unavailable or on error."""
-    if not _MEILI_AVAILABLE or not settings.meili_master_key:
+    """One multi-search round trip. None if Meilisearch is unavailable, slow or erroring."""
+    hits = meili.search(q)
+    if hits is None:
         return None
+    result = {
+        "countries": [
+            {"code": h["code"], "name": h["name"], "flag": h.get("flag_emoji", ""), "type": "country"}
+            for h in hits.get("countries", [])
+        ],
+        "assets": [
+            {
+                "symbol": h["symbol"],
+                "name": h["name"],
+                "sector": h.get("sector") or None,
+                "asset_type": h["asset_type"],
+                "type": "asset",
+            }
+            for h in hits.get("assets", [])
+        ],
+    }
+    if "blogs" in hits:
+        result["blogs"] = [
+            {"slug": h["slug"], "title": h["title"], "excerpt": h.get("excerpt", ""), "type": "blog"}
+            for h in hits["blogs"]
+        ]
+    return result
+
+
+def _local_search(q: str, db: Session, sections: tuple[str, ...] = ("countries", "assets", "blogs")) -> dict | None:
+    """In-process index (app.services.local_search). None if it cannot be built."""
     try:
-        client = _meili.Client(settings.meili_url, settings.meili_master_key)
-        countries_res = client.index("countries").search(q, {
-            "limit": 5,
-            "sort": ["is_g20:desc", "name:asc"],
-        })
-        assets_res = client.index("assets").search(q, {
-            "limit": 5,
-            "filter": "is_active = true",
-            "sort": ["market_cap_usd:desc"],
-        })
-        return {
-            "countries": [
-                {"code": h["code"], "name": h["name"], "flag": h.get("flag_emoji", ""), "type": "country"}
-                for h in countries_res["hits"]
-            ],
-            "assets": [
-                {
-                    "symbol": h["symbol"],
-                    "name": h["name"],
-                    "sector": h.get("sector") or None,
-                    "asset_type": h["asset_type"],
-                    "type": "asset",
-                }
-                for h in assets_res["hits"]
-            ],
-        }
+        return get_local_index(db).search(q, sections)
     except Exception:
+        log.warning("Local search index unavailable", exc_info=True)
         return None
 
 
 def _pg_search(q: str, db: Session) -> dict:
-    """Fallback: plain Postgres ilike search."""
+    """
+    Last resort when the local index cannot be built. Substring and typo
+    matches via pg_trgm, blogs via full text over title / excerpt / body
+    (indexes from migration 0032), ranked by similarity.
+    """
     term = q.strip()[:100]
+    pattern = f"%{term}%"
+
+    country_score = func.word_similarity(term, Country.name)
     countries = db.execute(
         select(Country)
-        .where(Country.name.ilike(f"%{term}%") | Country.code.ilike(f"%{term}%"))
-        .order_by(Country.is_g20.desc(), Country.name)
+        .where(
+            Country.name.ilike(pattern)
+            | Country.name.op("%>")(term)
+            | (Country.code == term.upper())
+        )
+        .order_by(
+            (Country.code == term.upper()).desc(),
+            country_score.desc(),
+            Country.is_g20.desc(),
+            Country.name,
+        )
         .limit(5)
     ).scalars().all()
 
+    asset_score = func.greatest(func.similarity(Asset.symbol, term), func.word_similarity(term, Asset.name))
     assets = db.execute(
         select(Asset)
         .where(
             Asset.is_active == True,
-            Asset.symbol.ilike(f"%{term}%") | Asset.name.ilike(f"%{term}%"),
+            Asset.symbol.ilike(pattern) | Asset.name.ilike(pattern) | Asset.name.op("%>")(term),
+        )
+        .order_by(
+            (Asset.symbol == term.upper()).desc(),
+            asset_score.desc(),
+            Asset.market_cap_usd.desc().nullslast(),
         )
-        .order_by(Asset.market_cap_usd.desc().nullslast())
         .limit(5)
     ).scalars().all()
 
+    # Prefix match on every word: "infl expect" finds "inflation expectations"
+    words = tokenize(term)
+    blog_vector = literal_column(f"({BLOG_SEARCH_VECTOR})")
+    blog_match = BlogPost.title.op("%>")(term)
+    blog_score = func.word_similarity(term, BlogPost.title)
+    if words:
+        tsquery = func.to_tsquery("english", " & ".join(f"{w}:*" for w in words))
+        blog_match = blog_match | blog_vector.op("@@")(tsquery)
+        blog_score = blog_score + func.ts_rank_cd(blog_vector, tsquery)
     blogs = db.execute(
         select(BlogPost)
-        .where(
-            BlogPost.status == BlogStatus.published,
-            BlogPost.title.ilike(f"%{term}%"),
-        )
-        .order_by(BlogPost.published_at.desc())
+        .where(BlogPost.status == BlogStatus.published, blog_match)
+        .order_by(blog_score.desc(), BlogPost.published_at.desc())
         .limit(4)
     ).scalars().all()
 
@@ -109,16 +138,35 @@ def _pg_search(q: str, db: Session) -> dict:
     }
 
 
+@router.get("/suggest")
+@limiter.limit("120/minute")
+def suggest(request: Request, q: str = Query(default="", max_length=100), db: Session = Depends(get_db)) -> dict:
+    """Typeahead: ranked countries and assets for a partial query, from the precomputed prefix table."""
+    q = q.strip()
+    if not q:
+        return {"suggestions": []}
+    try:
+        return {"suggestions": get_local_index(db).suggest(q)}
+    except Exception:
+        log.warning("Local search index unavailable for suggest", exc_info=True)
+        return {"suggestions": []}
+
+
 @router.get("")
 @limiter.limit("60/minute")
 def search(request: Request, q: str = Query(default="", max_length=100), db: Session = Depends(get_db)) -> dict:
     if not q or len(q.strip()) < 2:
         return {"countries": [], "assets": [], "blogs": []}
 
-    result = _meili_search(q.strip())
+    q = q.strip()
+    result = _meili_search(q)
     if result is not None:
-        # Meilisearch doesn't index blogs — fetch from Postgres and merge
-        pg = _pg_search(q.strip(), db)
-        result["blogs"] = pg["blogs"]
+        if "blogs" not in result:
+            # blogs index not built yet — fill that section locally
+            local = _local_search(q, db, ("blogs",))
+            result["blogs"] = local["blogs"] if local is not None else _pg_search(q, db)["blogs"]
         return result
-    return _pg_search(q.strip(), db)
+    local = _local_search(q, db)
+    if local is not None:
+        return local
+    return _pg_search(q, db)
@@ -7,16 +7,21 @@ Route: GET /snapshots/{key}
 
 Cloudflare caches responses based on Cache-Control headers set in main.py middleware.
 Redis warms on first hit so subsequent requests in the same worker skip R2.
+
+Snapshots are stored gzip-compressed (tasks.r2_snapshots). Clients that accept
+gzip get the stored bytes as-is with Content-Encoding: gzip; others get them
+decompressed. Redis holds the compressed body (base64), never the plain JSON.
 """
 
-import json
+import base64
+import gzip
 import logging
 
 import botocore.exceptions
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Request, Response
 
 from app.config import settings
-from app.storage import get_r2_client, redis_json_get, redis_json_set
+from app.storage import get_r2_client, get_redis
 
 router = APIRouter(prefix="/snapshots", tags=["cdn"])
 
@@ -34,10 +39,11 @@ _ALLOWED_PREFIXES = (
 
 # Redis TTL for snapshot cache — 1 hour (snapshots regenerate daily at 7am)
 _REDIS_TTL = 3600
+_GZIP_MAGIC = b"\x1f\x8b"
 
 
 @router.get("/{key:path}")
-def serve_snapshot(key: str) -> Response:
+def serve_snapshot(key: str, request: Request) -> Response:
     """Return a pre-built JSON snapshot from R2. Cloudflare caches the response at the edge."""
     # R2 keys are always lowercase — normalise to avoid case-sensitive 404s
     r2_key = f"snapshots/{key.lower()}"
@@ -49,21 +55,31 @@ def serve_snapshot(key: str) -> Response:
         raise HTTPException(status_code=404, detail="Not found")
 
     # L1: Redis cache — avoids hitting R2 on repeated requests within the worker lifetime
-    redis_key = f"cdn:snap:{r2_key}"
-    cached_raw = redis_json_get(redis_key)
-    if cached_raw is not None:
-        return Response(
-            content=json.dumps(cached_raw, default=str),
-            media_type="application/json",
-        )
-
-    # R2 fetch
+    redis_key = f"cdn:snapgz:{r2_key}"
+    body = _redis_get_bytes(redis_key)
+    if body is None:
+        body = _fetch(r2_key)
+        if body[:2] != _GZIP_MAGIC:
+            body = gzip.compress(body)   # written before snapshots were pre-compressed
+        # Warm Redis so the next request in this worker skips R2
+        _redis_set_bytes(redis_key, body)
+
+    headers = {"Vary": "Accept-Encoding"}
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(body), media_type="application/json", headers=headers)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _fetch(r2_key: str) -> bytes:
     if not (settings.r2_endpoint and settings.r2_access_key_id and settings.r2_secret_access_key):
         raise HTTPException(status_code=503, detail="R2 storage not configured")
 
     try:
         obj = get_r2_client().get_object(Bucket=settings.r2_bucket_name, Key=r2_key)
-        body: bytes = obj["Body"].read()
+        return obj["Body"].read()
     except botocore.exceptions.ClientError as exc:
         code = exc.response["Error"]["Code"]
         if code in ("NoSuchKey", "404"):
@@ -74,10 +90,33 @@ def serve_snapshot(key: str) -> Response:
         log.warning("R2 fetch failed for %s: %s", r2_key, exc)
         raise HTTPException(status_code=503, detail="Upstream unavailable")
 
-    # Warm Redis so the next request in this worker skips R2
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """True unless gzip is absent from Accept-Encoding or explicitly refused with q=0."""
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip() not in ("gzip", "*"):
+            continue
+        name, _, value = params.replace(" ", "").partition("=")
+        if name != "q":
+            return True
+        try:
+            return float(value) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _redis_get_bytes(key: str) -> bytes | None:
     try:
-        redis_json_set(redis_key, json.loads(body), ttl_seconds=_REDIS_TTL)
+        raw = get_redis().get(key)
+        return base64.b64decode(raw) if raw else None
     except Exception:
-        pass  # Non-fatal — just means no Redis warm
+        return None
+
 
-    return Response(content=body, media_type="application/json")
+def _redis_set_bytes(key: str, body: bytes) -> None:
+    try:
+        get_redis().setex(key, _REDIS_TTL, base64.b64encode(body).decode())
+    except Exception:
+        pass  # Non-fatal — just means no Redis warm
@@ -14,6 +14,7 @@ from sqlalchemy import select
 
 from app.database import SessionLocal
 from app.models import Asset, AssetType, Country, StockCountryRevenue
+from app.services.screener import refresh_revenue_pivot
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -1071,6 +1072,7 @@ def seed_edgar(db: Session) -> int:
     )
     db.execute(stmt)
     db.commit()
+    refresh_revenue_pivot(db)
     log.info(f"Upserted {len(records)} geo revenue rows for {len(EDGAR_DATA)} stocks")
     return len(records)
 
@@ -0,0 +1,153 @@
+"""
+feed_events partition maintenance, archival and interaction pruning.
+
+feed_events is RANGE-partitioned by calendar month on published_at
+(migration 0029): feed_events_pYYYY_MM plus a feed_events_default catch-all.
+The ranker only reads the last 7 days, so everything here works on whole
+partitions:
+
+  ensure_partitions()        create next months' partitions before rows arrive
+                             (rows landing in the default partition block the
+                             matching CREATE, so stay PARTITION_MONTHS_AHEAD ahead)
+  archive_old_partitions()   months entirely older than FEED_EVENT_RETENTION_DAYS:
+                             export to R2 as gzipped JSON lines, then apply the
+                             old FK rules (delete user_interactions, null
+                             blog_posts.feed_event_id) and DETACH + DROP
+  prune_orphan_interactions() user_interactions whose event was deleted row-wise
+                             (daily_insight replacement, admin deletes) — the FK
+                             that used to cascade cannot point at a partitioned
+                             table keyed on (id, published_at)
+
+Archive objects: archive/feed_events/YYYY-MM.jsonl.gz — one event per line,
+every column, JSON-encoded.
+"""
+
+import gzip
+import json
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.storage import r2_upload
+
+log = logging.getLogger(__name__)
+
+FEED_EVENT_RETENTION_DAYS = 180
+PARTITION_MONTHS_AHEAD = 2
+ARCHIVE_PREFIX = "archive/feed_events/"
+PRUNE_BATCH_SIZE = 20_000
+
+_PARTITION_RE = re.compile(r"^feed_events_p(\d{4})_(\d{2})$")
+
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+    """Create missing monthly partitions from this month through months_ahead. Caller commits."""
+    existing = {name for name, _ in _partitions(db)}
+    created: list[str] = []
+    month = datetime.now(timezone.utc).date().replace(day=1)
+    for _ in range(months_ahead + 1):
+        name = _partition_name(month)
+        if name not in existing:
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF feed_events "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+def archive_old_partitions(db: Session, retention_days: int = FEED_EVENT_RETENTION_DAYS) -> list[str]:
+    """
+    Archive and drop every monthly partition whose whole range is older than
+    retention_days. One commit per partition; the R2 upload happens before
+    anything is deleted, so a failure leaves the partition in place for the
+    next run.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).date()
+    archived: list[str] = []
+    for name, month in _partitions(db):
+        if _next_month(month) > cutoff:
+            continue
+        key = f"{ARCHIVE_PREFIX}{month:%Y-%m}.jsonl.gz"
+        rows = _export(db, name)
+        r2_upload(key, rows, content_type="application/gzip", cache_control="private, no-store")
+        _drop_partition(db, name)
+        db.commit()
+        log.info("feed_archive: %s → %s (%d bytes)", name, key, len(rows))
+        archived.append(key)
+    return archived
+
+
+def prune_orphan_interactions(db: Session) -> int:
+    """Delete user_interactions rows whose feed event no longer exists, in batches."""
+    total = 0
+    while True:
+        deleted = db.execute(text("""
+            DELETE FROM user_interactions
+            WHERE id IN (
+                SELECT ui.id FROM user_interactions ui
+                WHERE NOT EXISTS (SELECT 1 FROM feed_events fe WHERE fe.id = ui.feed_event_id)
+                LIMIT :n
+            )
+        """), {"n": PRUNE_BATCH_SIZE}).rowcount
+        db.commit()
+        total += deleted
+        if deleted < PRUNE_BATCH_SIZE:
+            return total
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _partition_name(month: date) -> str:
+    return f"feed_events_p{month:%Y_%m}"
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _partitions(db: Session) -> list[tuple[str, date]]:
+    """(name, first day of month) for every monthly partition, oldest first."""
+    names = db.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'feed_events'::regclass
+    """)).scalars()
+    monthly = []
+    for name in names:
+        m = _PARTITION_RE.match(name)
+        if m:
+            monthly.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(monthly, key=lambda p: p[1])
+
+
+def _export(db: Session, partition: str) -> bytes:
+    """Gzipped JSON lines of every row in the partition."""
+    result = db.execute(text(f"SELECT * FROM {partition} ORDER BY published_at, id"))
+    lines = [
+        json.dumps(dict(row._mapping), default=_json_default, separators=(",", ":"))
+        for row in result
+    ]
+    return gzip.compress(("\n".join(lines) + "\n").encode() if lines else b"")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"not JSON serialisable: {type(value).__name__}")
+
+
+def _drop_partition(db: Session, partition: str) -> None:
+    """Apply the old FK rules for the partition's ids, then detach and drop it."""
+    db.execute(text(
+        f"DELETE FROM user_interactions WHERE feed_event_id IN (SELECT id FROM {partition})"
+    ))
+    db.execute(text(
+        f"UPDATE blog_posts SET feed_event_id = NULL WHERE feed_event_id IN (SELECT id FROM {partition})"
+    ))
+    db.execute(text(f"ALTER TABLE feed_events DETACH PARTITION {partition}"))
+    db.execute(text(f"DROP TABLE {partition}"))
@@ -0,0 +1,196 @@
+"""
+Per-user personalisation profile for feed ranking, cached in Redis.
+
+Key `feed:profile:{user_id}` is a hash:
+
+  a:{asset_id}    → "1"           followed asset
+  c:{country_id}  → "1"           followed country
+  i:{event_id}    → "{type}|{ts}" strongest interaction with that event
+  _v              → "1"           sentinel — an empty profile is still a cached one
+
+Built on a miss from user_follows plus user_interactions inside the candidate
+window (FALLBACK_WINDOW_HOURS), which rides ix_user_interactions_user, so
+ranking cost no longer grows with a user's lifetime history. Follow and
+unfollow patch the hash in place only if it exists (user_follows is written
+synchronously, so a rebuild sees them). Interactions reach user_interactions
+through the write-behind stream up to ~10s later, so an interaction with no
+cached profile creates a partial hash (no `_v`, PENDING_TTL) instead of being
+dropped; the next read rebuilds from the DB and merges those pending fields,
+so a rebuild never forgets a just-skipped card. Interactions older than the
+window are dropped on read.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.feed import UserFollow, UserInteraction
+from app.services.interaction_buffer import INTENT_RANK
+from app.storage import get_redis
+
+log = logging.getLogger(__name__)
+
+PROFILE_PREFIX = "feed:profile:"
+PROFILE_TTL = 86400            # seconds — idle users rebuild from the DB next visit
+PENDING_TTL = 600              # seconds — partial hash outlives the stream flush by far
+
+# HSET/HDEL only if the profile is cached. For interactions (ARGV[4] = INTENT_RANK
+# as JSON, ARGV[5] = incoming rank, ARGV[6] = PENDING_TTL) a weaker intent never
+# replaces a stronger one, and a missing profile becomes a partial one.
+_PATCH_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  if not ARGV[4] then return 0 end
+  redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+  redis.call('EXPIRE', KEYS[1], ARGV[6])
+  return 1
+end
+if ARGV[1] == 'del' then
+  redis.call('HDEL', KEYS[1], ARGV[2])
+  return 1
+end
+if ARGV[4] then
+  local cur = redis.call('HGET', KEYS[1], ARGV[2])
+  if cur then
+    local cur_type = string.match(cur, '^([^|]+)')
+    local ranks = cjson.decode(ARGV[4])
+    if (ranks[cur_type] or 0) > tonumber(ARGV[5]) then return 0 end
+  end
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+@dataclass
+class UserProfile:
+    followed_assets: set[int] = field(default_factory=set)
+    followed_countries: set[int] = field(default_factory=set)
+    interactions: dict[int, str] = field(default_factory=dict)   # event_id → interaction type
+
+
+def load_profile(db: Session, user_id: int, window_hours: int) -> UserProfile:
+    """Cached profile, or rebuilt from the DB (and cached) on a miss / Redis failure."""
+    key = PROFILE_PREFIX + str(user_id)
+    try:
+        raw = get_redis().hgetall(key)
+    except Exception as exc:
+        log.warning("Profile read failed for user %s: %s", user_id, exc)
+        return _build(db, user_id, window_hours)[0]
+    if "_v" in raw:
+        return _parse(key, raw, window_hours)
+
+    profile, fields = _build(db, user_id, window_hours)
+    _merge_pending(profile, fields, raw)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, PROFILE_TTL)
+        pipe.execute()
+    except Exception as exc:
+        log.warning("Profile write failed for user %s: %s", user_id, exc)
+    return profile
+
+
+def profile_follow(user_id: int, entity_type: str, entity_id: int, following: bool) -> None:
+    """Patch a cached profile after follow / unfollow."""
+    prefix = "a" if entity_type == "asset" else "c"
+    _patch(user_id, "set" if following else "del", f"{prefix}:{entity_id}", "1")
+
+
+def profile_interaction(user_id: int, event_id: int, interaction_type: str) -> None:
+    """Patch a cached profile after an interaction — highest intent wins, as in user_interactions."""
+    value = f"{interaction_type}|{datetime.now(timezone.utc).timestamp():.0f}"
+    _patch(user_id, "set", f"i:{event_id}", value,
+           rank=INTENT_RANK.get(interaction_type, 0))
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+_patch_script = None
+_INTENT_RANK_JSON = json.dumps(INTENT_RANK)
+
+
+def _patch(user_id: int, op: str, field_name: str, value: str, rank: int | None = None) -> None:
+    global _patch_script
+    try:
+        if _patch_script is None:
+            _patch_script = get_redis().register_script(_PATCH_LUA)
+        args = [op, field_name, value]
+        if rank is not None:
+            args += [_INTENT_RANK_JSON, rank, PENDING_TTL]
+        _patch_script(keys=[PROFILE_PREFIX + str(user_id)], args=args)
+    except Exception as exc:
+        # Stale profile is worse than none — drop it so the next read rebuilds
+        log.warning("Profile patch failed for user %s, invalidating: %s", user_id, exc)
+        try:
+            get_redis().delete(PROFILE_PREFIX + str(user_id))
+        except Exception:
+            pass
+
+
+def _build(db: Session, user_id: int, window_hours: int) -> tuple[UserProfile, dict[str, str]]:
+    since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+    follows = db.execute(
+        select(UserFollow.entity_type, UserFollow.entity_id).where(UserFollow.user_id == user_id)
+    ).all()
+    interactions = db.execute(
+        select(UserInteraction.feed_event_id, UserInteraction.interaction_type, UserInteraction.created_at)
+        .where(UserInteraction.user_id == user_id, UserInteraction.created_at >= since)
+    ).all()
+
+    profile = UserProfile()
+    fields: dict[str, str] = {"_v": "1"}
+    for entity_type, entity_id in follows:
+        if entity_type == "asset":
+            profile.followed_assets.add(entity_id)
+            fields[f"a:{entity_id}"] = "1"
+        else:
+            profile.followed_countries.add(entity_id)
+            fields[f"c:{entity_id}"] = "1"
+    for event_id, interaction_type, created_at in interactions:
+        itype = getattr(interaction_type, "value", interaction_type)
+        profile.interactions[event_id] = itype
+        fields[f"i:{event_id}"] = f"{itype}|{created_at.timestamp():.0f}"
+    return profile, fields
+
+
+def _merge_pending(profile: UserProfile, fields: dict[str, str], pending: dict[str, str]) -> None:
+    """Overlay interactions from a partial hash (not yet flushed to the DB) — highest intent wins."""
+    for name, value in pending.items():
+        kind, _, ident = name.partition(":")
+        if kind != "i":
+            continue
+        itype = value.partition("|")[0]
+        current = fields.get(name)
+        if current and INTENT_RANK.get(current.partition("|")[0], 0) > INTENT_RANK.get(itype, 0):
+            continue
+        fields[name] = value
+        profile.interactions[int(ident)] = itype
+
+
+def _parse(key: str, raw: dict[str, str], window_hours: int) -> UserProfile:
+    cutoff = datetime.now(timezone.utc).timestamp() - window_hours * 3600
+    profile = UserProfile()
+    expired: list[str] = []
+    for name, value in raw.items():
+        kind, _, ident = name.partition(":")
+        if kind == "a":
+            profile.followed_assets.add(int(ident))
+        elif kind == "c":
+            profile.followed_countries.add(int(ident))
+        elif kind == "i":
+            itype, _, ts = value.partition("|")
+            if ts and float(ts) < cutoff:
+                expired.append(name)
+            else:
+                profile.interactions[int(ident)] = itype
+    if expired:
+        try:
+            get_redis().hdel(key, *expired)
+        except Exception:
+            pass
+    return profile
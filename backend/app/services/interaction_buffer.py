@@ -0,0 +1,158 @@
+"""
+Write-behind buffer for feed interactions.
+
+POST /api/feed/{id}/interact appends to a Redis stream (one XADD) instead of
+upserting user_interactions inline. tasks.feed_interactions.flush_interactions
+drains the stream through a consumer group and writes each batch as a single
+multi-row upsert:
+
+  - repeats per (user, event) inside a batch collapse to the highest-intent one
+  - ON CONFLICT only overwrites a stored row when the incoming intent is at
+    least as strong, so a late auto-tracked `view` never clobbers a `save`
+  - rows for deleted events / inactive users are dropped before the insert
+
+Entries are acked only after commit (app.storage.redis_stream_drain), so a
+crashed flush is replayed — the upsert is idempotent. If Redis is unreachable
+the router falls back to upsert_interactions() inline with the same rule.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import case, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.feed import FeedEvent, UserInteraction
+from app.models.user import User
+from app.storage import get_redis, redis_stream_drain
+
+log = logging.getLogger(__name__)
+
+STREAM_KEY = "feed:interactions"
+STREAM_GROUP = "flushers"
+STREAM_MAXLEN = 500_000        # approximate cap — ~1h of peak traffic if the flusher stalls
+FLUSH_BATCH_SIZE = 5000
+
+# Intent strength — skip is an explicit dismissal, as strong as a save.
+# Equal strength: the later interaction wins.
+INTENT_RANK: dict[str, int] = {
+    "view":  1,
+    "click": 2,
+    "share": 3,
+    "save":  4,
+    "skip":  4,
+}
+
+
+def enqueue_interaction(user_id: int, event_id: int, interaction_type: str,
+                        dwell_seconds: int | None) -> bool:
+    """Append one interaction to the stream. False if Redis is unavailable."""
+    fields = {
+        "u": user_id,
+        "e": event_id,
+        "t": interaction_type,
+        "d": "" if dwell_seconds is None else dwell_seconds,
+        "ts": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        get_redis().xadd(STREAM_KEY, fields, maxlen=STREAM_MAXLEN, approximate=True)
+        return True
+    except Exception as exc:
+        log.warning("Interaction enqueue failed, writing inline: %s", exc)
+        return False
+
+
+def upsert_interactions(db: Session, rows: list[dict]) -> int:
+    """
+    Multi-row upsert into user_interactions with highest-intent-wins semantics.
+    rows: dicts with user_id, feed_event_id, interaction_type, dwell_seconds, created_at.
+    Caller commits.
+    """
+    rows = _collapse(rows)
+    if not rows:
+        return 0
+    stmt = pg_insert(UserInteraction).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        constraint="uq_user_interaction",
+        set_={
+            "interaction_type": stmt.excluded.interaction_type,
+            "dwell_seconds": stmt.excluded.dwell_seconds,
+            "created_at": stmt.excluded.created_at,
+        },
+        where=_intent_rank(stmt.excluded.interaction_type) >= _intent_rank(UserInteraction.interaction_type),
+    ))
+    return len(rows)
+
+
+def flush_stream(db: Session, consumer: str, max_batches: int = 20) -> dict:
+    """Drain up to max_batches × FLUSH_BATCH_SIZE entries into user_interactions."""
+    dropped = 0
+
+    def write(batch: list[dict]) -> int:
+        nonlocal dropped
+        rows = [row for row in map(_row, batch) if row is not None]
+        valid = _drop_orphans(db, rows)
+        written = upsert_interactions(db, valid)
+        db.commit()
+        dropped += len(batch) - len(valid)
+        return written
+
+    stats = redis_stream_drain(STREAM_KEY, STREAM_GROUP, consumer, write,
+                               batch_size=FLUSH_BATCH_SIZE, max_batches=max_batches)
+    return {**stats, "dropped": dropped}
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _intent_rank(column):
+    return case(
+        *[(column == itype, rank) for itype, rank in INTENT_RANK.items()],
+        else_=0,
+    )
+
+
+def _collapse(rows: list[dict]) -> list[dict]:
+    """One row per (user, event): highest intent, then latest created_at."""
+    best: dict[tuple[int, int], dict] = {}
+    for row in rows:
+        key = (row["user_id"], row["feed_event_id"])
+        cur = best.get(key)
+        if cur is None or (
+            (INTENT_RANK.get(row["interaction_type"], 0), row["created_at"])
+            >= (INTENT_RANK.get(cur["interaction_type"], 0), cur["created_at"])
+        ):
+            best[key] = row
+    return list(best.values())
+
+
+def _row(fields: dict) -> dict | None:
+    try:
+        return {
+            "user_id": int(fields["u"]),
+            "feed_event_id": int(fields["e"]),
+            "interaction_type": fields["t"],
+            "dwell_seconds": int(fields["d"]) if fields.get("d") else None,
+            "created_at": datetime.fromisoformat(fields["ts"]),
+        }
+    except (KeyError, ValueError) as exc:
+        log.warning("Dropping malformed interaction entry %s: %s", fields, exc)
+        return None
+
+
+def _drop_orphans(db: Session, rows: list[dict]) -> list[dict]:
+    """Filter out rows whose event was deleted or whose user is gone/inactive (FK safety)."""
+    if not rows:
+        return rows
+    event_ids = {row["feed_event_id"] for row in rows}
+    user_ids = {row["user_id"] for row in rows}
+    live_events = set(db.execute(
+        select(FeedEvent.id).where(FeedEvent.id.in_(event_ids))
+    ).scalars())
+    live_users = set(db.execute(
+        select(User.id).where(User.id.in_(user_ids), User.is_active == True)
+    ).scalars())
+    return [
+        row for row in rows
+        if row["feed_event_id"] in live_events and row["user_id"] in live_users
+    ]
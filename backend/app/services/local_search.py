@@ -0,0 +1,320 @@
+"""
+In-process search index over countries, active assets and published blogs.
+
+Serves /api/search when Meilisearch is down or MEILI_MASTER_KEY is unset, and
+always serves the blog section (Meilisearch did not index blogs), so a search
+never runs leading-wildcard ILIKE scans.
+
+Per section, documents are stored in rank order — countries G20 first then by
+name, assets by market cap, blogs newest first — so a doc's position *is* its
+rank and posting lists are born sorted:
+
+  prefixes   every prefix of every normalised token → posting list of doc
+             positions (a flattened prefix trie: one dict hit per query token)
+  trigrams   token trigrams ("$" padded) → token ids; a query token with no
+             prefix match looks up candidates here and accepts those within
+             1 edit (4–7 chars) or 2 edits (8+), transpositions counting once
+             — the same typo budget the Meilisearch indexes use
+
+Multi-word queries intersect the posting lists; exact symbol / code / name
+matches are promoted to the top. Lookups never touch the DB.
+
+Typeahead (/api/search/suggest) is served from a precomputed table built with
+the index: every 1–SUGGEST_PREFIX_MAX character prefix of a country or asset
+token → its top SUGGEST_LIMIT suggestions, already merged and ranked, so a
+keystroke is one dict lookup. Longer or multi-word input is ranked on the fly
+from the same prefix postings.
+
+Each API worker builds its own copy (~3 queries) and rebuilds when
+LOCAL_INDEX_VERSION_KEY changes — bumped on blog publish/update/delete and by
+tasks.search_index — or after LOCAL_INDEX_MAX_AGE.
+"""
+
+import logging
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Asset, Country
+from app.models.feed import BlogPost, BlogStatus
+from app.storage import get_redis
+
+log = logging.getLogger(__name__)
+
+LOCAL_INDEX_VERSION_KEY = "search:local:version"
+LOCAL_INDEX_CHECK_SECONDS = 30
+LOCAL_INDEX_MAX_AGE = 3600     # seconds — catches market-cap reordering without a bump
+SECTION_LIMITS = {"countries": 5, "assets": 5, "blogs": 4}
+FUZZY_MIN_LEN = 4
+FUZZY_CANDIDATES = 64
+SUGGEST_LIMIT = 8
+SUGGEST_PREFIX_MAX = 4
+SUGGEST_COUNTRY_SLOTS = 3      # non-exact countries ahead of assets
+
+
+def normalize(text: str) -> str:
+    """Lower-case, strip accents, non-alphanumerics → spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return "".join(ch if ch.isalnum() else " " for ch in text)
+
+
+def tokenize(text: str) -> list[str]:
+    return normalize(text).split()
+
+
+class _Section:
+    """One searchable section. docs must be passed in rank order."""
+
+    def __init__(self, docs: list[dict], texts: list[str], exact: list[set[str]]):
+        self.docs = docs
+        self.exact = exact
+        self.exact_positions: dict[str, list[int]] = {}
+        for pos, keys in enumerate(exact):
+            for key in keys:
+                self.exact_positions.setdefault(key, []).append(pos)
+        self.prefixes: dict[str, list[int]] = {}
+        self.tokens: list[str] = []
+        self.token_docs: list[list[int]] = []
+        self.trigrams: dict[str, list[int]] = {}
+
+        token_id: dict[str, int] = {}
+        for pos, text in enumerate(texts):
+            for token in set(tokenize(text)):
+                for end in range(1, len(token) + 1):
+                    posting = self.prefixes.setdefault(token[:end], [])
+                    if not posting or posting[-1] != pos:
+                        posting.append(pos)
+                tid = token_id.get(token)
+                if tid is None:
+                    tid = token_id[token] = len(self.tokens)
+                    self.tokens.append(token)
+                    self.token_docs.append([])
+                    for gram in _trigrams(token):
+                        self.trigrams.setdefault(gram, []).append(tid)
+                self.token_docs[tid].append(pos)
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        return [self.docs[p] for p in self._rank(query, limit)]
+
+    def top(self, key: str, limit: int) -> tuple[list[dict], list[dict]]:
+        """(exact, other) docs for a normalised single-token prefix — no fuzzy matching."""
+        exact = self.exact_positions.get(key, [])[:limit]
+        seen = set(exact)
+        other = [p for p in self.prefixes.get(key, ())[:limit + len(exact)] if p not in seen]
+        return [self.docs[p] for p in exact], [self.docs[p] for p in other[:limit - len(exact)]]
+
+    def split(self, query: str, limit: int) -> tuple[list[dict], list[dict]]:
+        """(exact, other) docs for any query, ranked like search()."""
+        key = normalize(query).strip()
+        exact, other = [], []
+        for p in self._rank(query, limit):
+            (exact if key in self.exact[p] else other).append(self.docs[p])
+        return exact, other
+
+    def _rank(self, query: str, limit: int) -> list[int]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = []
+        for token in tokens:
+            posting = self.prefixes.get(token)
+            if posting is None:
+                posting = self._fuzzy(token)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        if len(postings) == 1:
+            hits = postings[0]
+        else:
+            postings.sort(key=len)
+            common = set(postings[0]).intersection(*postings[1:])
+            hits = sorted(common)
+
+        key = normalize(query).strip()
+        exact = [p for p in hits[:200] if key in self.exact[p]]
+        if exact:
+            seen = set(exact)
+            hits = exact + [p for p in hits if p not in seen]
+        return hits[:limit]
+
+    def _fuzzy(self, token: str) -> list[int]:
+        """Doc positions for tokens within the typo budget of `token` (as a word or a prefix)."""
+        if len(token) < FUZZY_MIN_LEN:
+            return []
+        budget = 1 if len(token) < 8 else 2
+        grams = _trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigrams.get(gram, ()))
+        # One edit destroys at most 3 trigrams
+        floor = max(1, len(grams) - 3 * budget)
+        candidates = [tid for tid, n in shared.items() if n >= floor]
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = sorted(candidates, key=shared.__getitem__, reverse=True)[:FUZZY_CANDIDATES]
+        matched: set[int] = set()
+        for tid in candidates:
+            candidate = self.tokens[tid]
+            if (_edit_distance(token, candidate, budget) <= budget
+                    or _edit_distance(token, candidate[:len(token)], budget) <= budget):
+                matched.update(self.token_docs[tid])
+        return sorted(matched)
+
+
+class LocalSearchIndex:
+    def __init__(self, sections: dict[str, _Section]):
+        self.sections = sections
+        self.built_at = time.time()
+        countries, assets = sections["countries"], sections["assets"]
+        keys = {
+            p for section in (countries, assets) for p in section.prefixes
+            if len(p) <= SUGGEST_PREFIX_MAX
+        }
+        self.suggestions: dict[str, list[dict]] = {
+            key: _merge_suggestions(countries.top(key, SUGGEST_LIMIT), assets.top(key, SUGGEST_LIMIT))
+            for key in keys
+        }
+
+    def search(self, q: str, sections: tuple[str, ...] = tuple(SECTION_LIMITS)) -> dict[str, list[dict]]:
+        return {name: self.sections[name].search(q, SECTION_LIMITS[name]) for name in sections}
+
+    def suggest(self, q: str) -> list[dict]:
+        """Ranked typeahead suggestions (countries and assets) for a partial query."""
+        key = normalize(q).strip()
+        if not key:
+            return []
+        hits = self.suggestions.get(key)
+        if hits is not None:
+            return hits
+        return _merge_suggestions(
+            self.sections["countries"].split(key, SUGGEST_LIMIT),
+            self.sections["assets"].split(key, SUGGEST_LIMIT),
+        )
+
+    def sizes(self) -> dict[str, int]:
+        return {name: len(section.docs) for name, section in self.sections.items()}
+
+
+def build_local_index(db: Session) -> LocalSearchIndex:
+    countries = db.execute(
+        select(Country).order_by(Country.is_g20.desc(), Country.name)
+    ).scalars().all()
+    assets = db.execute(
+        select(Asset).where(Asset.is_active == True)
+        .order_by(Asset.market_cap_usd.desc().nullslast(), Asset.symbol)
+    ).scalars().all()
+    blogs = db.execute(
+        select(BlogPost.slug, BlogPost.title, BlogPost.excerpt)
+        .where(BlogPost.status == BlogStatus.published)
+        .order_by(BlogPost.published_at.desc())
+    ).all()
+
+    return LocalSearchIndex({
+        "countries": _Section(
+            [{"code": c.code, "name": c.name, "flag": c.flag_emoji, "type": "country"} for c in countries],
+            [f"{c.code} {c.name} {c.name_official or ''}" for c in countries],
+            [{c.code.lower(), normalize(c.name).strip()} for c in countries],
+        ),
+        "assets": _Section(
+            [
+                {
+                    "symbol": a.symbol,
+                    "name": a.name,
+                    "sector": a.sector,
+                    "asset_type": a.asset_type.value,
+                    "type": "asset",
+                }
+                for a in assets
+            ],
+            [f"{a.symbol} {a.name}" for a in assets],
+            [{normalize(a.symbol).strip(), normalize(a.name).strip()} for a in assets],
+        ),
+        "blogs": _Section(
+            [{"slug": b.slug, "title": b.title, "excerpt": b.excerpt or "", "type": "blog"} for b in blogs],
+            [b.title for b in blogs],
+            [{normalize(b.title).strip()} for b in blogs],
+        ),
+    })
+
+
+_index: LocalSearchIndex | None = None
+_index_version: str | None = None
+_index_loaded_at = 0.0
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_local_index(db: Session) -> LocalSearchIndex:
+    """This worker's index, rebuilt if invalidated or older than LOCAL_INDEX_MAX_AGE."""
+    global _index, _index_version, _index_loaded_at, _index_checked_at
+    now = time.monotonic()
+    if _index is not None and now - _index_checked_at < LOCAL_INDEX_CHECK_SECONDS:
+        return _index
+    with _index_lock:
+        if _index is not None and now - _index_checked_at < LOCAL_INDEX_CHECK_SECONDS:
+            return _index
+        version = _current_version()
+        if (_index is None or version != _index_version
+                or now - _index_loaded_at >= LOCAL_INDEX_MAX_AGE):
+            t0 = time.perf_counter()
+            _index = build_local_index(db)
+            _index_version = version
+            _index_loaded_at = now
+            log.info("local search index built %s in %.0fms",
+                     _index.sizes(), (time.perf_counter() - t0) * 1000)
+        _index_checked_at = now
+        return _index
+
+
+def bump_local_index_version() -> None:
+    """Tell every API worker to rebuild on its next search."""
+    try:
+        get_redis().incr(LOCAL_INDEX_VERSION_KEY)
+    except Exception as exc:
+        log.warning("local search version bump failed (rebuild within %ds): %s",
+                    LOCAL_INDEX_MAX_AGE, exc)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _merge_suggestions(countries: tuple[list[dict], list[dict]],
+                       assets: tuple[list[dict], list[dict]]) -> list[dict]:
+    """Exact code / symbol / name hits first, then a few countries, then assets by market cap."""
+    head = countries[0] + assets[0] + countries[1][:SUGGEST_COUNTRY_SLOTS]
+    return (head + assets[1] + countries[1][SUGGEST_COUNTRY_SLOTS:])[:SUGGEST_LIMIT]
+
+
+def _current_version() -> str | None:
+    try:
+        return get_redis().get(LOCAL_INDEX_VERSION_KEY)
+    except Exception:
+        return _index_version
+
+
+def _trigrams(token: str) -> set[str]:
+    padded = f"$${token}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, cap: int) -> int:
+    """Optimal-string-alignment distance (adjacent transposition = 1), cut off above cap."""
+    if abs(len(a) - len(b)) > cap:
+        return cap + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > cap:
+            return cap + 1
+        prev2, prev = prev, cur
+    return prev[-1]
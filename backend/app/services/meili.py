@@ -0,0 +1,161 @@
+"""
+Meilisearch access for the API — one pooled HTTP client per worker.
+
+search() sends a single POST /multi-search covering the countries, assets and
+blogs indexes, so a search costs one round trip over a kept-alive connection
+instead of a new client plus one request per index.
+
+Latency budget: SEARCH_TIMEOUT caps the whole call; on timeout or error the
+caller falls back to the in-process index (app.services.local_search). After
+_CB_THRESHOLD consecutive failures Meilisearch is skipped for _CB_BACKOFF_SEC
+so a degraded server costs nothing per request. An index that does not exist
+yet (blogs before the first reindex) is dropped from the query for
+_MISSING_INDEX_SEC and the caller fills that section locally.
+
+The blogs index is written by tasks.search_index; publish / update / delete
+also push single documents here (best effort) so new posts are searchable
+immediately.
+"""
+
+import html
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import httpx
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+SEARCH_TIMEOUT = httpx.Timeout(0.25, connect=0.1)   # seconds — per search, all indexes
+WRITE_TIMEOUT = httpx.Timeout(2.0, connect=0.5)
+BLOG_BODY_CHARS = 20_000
+
+# indexUid → per-query params (limits match the search response sections)
+SEARCH_QUERIES = {
+    "countries": {"limit": 5, "sort": ["is_g20:desc", "name:asc"]},
+    "assets":    {"limit": 5, "filter": "is_active = true", "sort": ["market_cap_usd:desc"]},
+    "blogs":     {"limit": 4},
+}
+
+_CB_THRESHOLD = 3
+_CB_BACKOFF_SEC = 30
+_MISSING_INDEX_SEC = 300
+
+_state_lock = threading.Lock()
+_failures = 0
+_open_until = 0.0
+_missing: dict[str, float] = {}   # indexUid → monotonic time to retry it
+
+
+def enabled() -> bool:
+    return bool(settings.meili_master_key)
+
+
+@lru_cache(maxsize=1)
+def get_client() -> httpx.Client:
+    """Module-level keep-alive client; httpx.Client is thread-safe."""
+    return httpx.Client(
+        base_url=settings.meili_url,
+        headers={"Authorization": f"Bearer {settings.meili_master_key}"},
+        timeout=SEARCH_TIMEOUT,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    )
+
+
+def search(q: str) -> dict[str, list[dict]] | None:
+    """
+    Raw hits per index, e.g. {"countries": [...], "assets": [...], "blogs": [...]}.
+    Indexes currently known to be missing are absent from the result.
+    None if Meilisearch is disabled, tripped, slow or failing.
+    """
+    if not enabled() or _is_open():
+        return None
+    now = time.monotonic()
+    uids = [uid for uid in SEARCH_QUERIES if _missing.get(uid, 0) <= now]
+    try:
+        r = get_client().post("/multi-search", json={
+            "queries": [{"indexUid": uid, "q": q, **SEARCH_QUERIES[uid]} for uid in uids],
+        })
+        if r.status_code == 400 and r.json().get("code") == "index_not_found":
+            _mark_missing(r.json().get("message", ""), uids)
+            return None
+        r.raise_for_status()
+        results = {res["indexUid"]: res["hits"] for res in r.json()["results"]}
+    except Exception as exc:
+        _record_failure(exc)
+        return None
+    _record_success()
+    return results
+
+
+def blog_document(post) -> dict:
+    """Meilisearch document for a published BlogPost (also used by tasks.search_index)."""
+    body = html.unescape(re.sub(r"<[^>]+>", " ", post.body or ""))
+    return {
+        "id": post.id,
+        "slug": post.slug,
+        "title": post.title,
+        "excerpt": post.excerpt or "",
+        "body": " ".join(body.split())[:BLOG_BODY_CHARS],
+        "category": post.category or "",
+        "published_ts": int(post.published_at.timestamp()) if isinstance(post.published_at, datetime) else 0,
+    }
+
+
+def upsert_blog(post) -> None:
+    """Best effort — tasks.search_index.sync_search_delta repairs anything missed."""
+    _write("POST", "/indexes/blogs/documents", [blog_document(post)])
+
+
+def delete_blog(post_id: int) -> None:
+    _write("DELETE", f"/indexes/blogs/documents/{post_id}", None)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _write(method: str, path: str, payload) -> None:
+    if not enabled():
+        return
+    try:
+        get_client().request(method, path, json=payload, timeout=WRITE_TIMEOUT).raise_for_status()
+    except Exception as exc:
+        log.warning("Meilisearch %s %s failed: %s", method, path, exc)
+
+
+def _is_open() -> bool:
+    with _state_lock:
+        return _failures >= _CB_THRESHOLD and time.monotonic() < _open_until
+
+
+def _record_success() -> None:
+    global _failures, _open_until
+    with _state_lock:
+        _failures = 0
+        _open_until = 0.0
+
+
+def _record_failure(exc: Exception) -> None:
+    global _failures, _open_until
+    with _state_lock:
+        _failures += 1
+        if _failures >= _CB_THRESHOLD:
+            _open_until = time.monotonic() + _CB_BACKOFF_SEC
+            log.warning("Meilisearch disabled for %ds after %d failures: %s",
+                        _CB_BACKOFF_SEC, _failures, exc)
+
+
+def _mark_missing(message: str, uids: list[str]) -> None:
+    """Drop the index named in an index_not_found error from queries for a while."""
+    retry_at = time.monotonic() + _MISSING_INDEX_SEC
+    for uid in uids:
+        if f"`{uid}`" in message:
+            _missing[uid] = retry_at
+            log.warning("Meilisearch index %s not found — searching it locally for %ds",
+                        uid, _MISSING_INDEX_SEC)
+            return
+    _record_failure(RuntimeError(message))
@@ -0,0 +1,135 @@
+"""
+Buffered page-view ingestion for POST /api/track.
+
+The endpoint appends each hit to the `analytics:page_views` Redis stream
+instead of opening a Postgres transaction per page load.
+tasks.page_views.flush_page_views drains it every 30 seconds and per batch:
+
+  1. inserts the raw rows into page_views (one multi-row INSERT)
+  2. increments page_view_daily (entity_type, entity_code, day) counters with a
+     single ON CONFLICT upsert — this is what admin stats and popularity read
+
+Raw rows older than PAGE_VIEW_RETENTION_DAYS are pruned daily; the rollup is
+kept forever. Delivery is at-least-once: a crash between commit and ack
+replays (and double-counts) that one batch.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.user import PageView, PageViewDaily, User
+from app.storage import get_redis, redis_stream_drain
+
+log = logging.getLogger(__name__)
+
+STREAM_KEY = "analytics:page_views"
+STREAM_GROUP = "flushers"
+STREAM_MAXLEN = 1_000_000      # approximate cap if the flusher stalls
+FLUSH_BATCH_SIZE = 10_000
+PAGE_VIEW_RETENTION_DAYS = 90
+PRUNE_BATCH_SIZE = 50_000
+
+
+def enqueue_page_view(entity_type: str, entity_code: str, user_id: int | None) -> bool:
+    """Append one page view to the stream. False if Redis is unavailable."""
+    fields = {
+        "t": entity_type,
+        "c": entity_code,
+        "u": user_id or "",
+        "ts": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        get_redis().xadd(STREAM_KEY, fields, maxlen=STREAM_MAXLEN, approximate=True)
+        return True
+    except Exception as exc:
+        log.warning("Page view enqueue failed, writing inline: %s", exc)
+        return False
+
+
+def write_page_views(db: Session, rows: list[dict]) -> int:
+    """
+    Insert raw page_views rows and bump their daily rollups. Caller commits.
+    rows: dicts with entity_type, entity_code, user_id, created_at.
+    """
+    if not rows:
+        return 0
+    db.execute(insert(PageView), rows)
+
+    views: Counter = Counter()
+    user_views: Counter = Counter()
+    for row in rows:
+        key = (row["entity_type"], row["entity_code"], row["created_at"].astimezone(timezone.utc).date())
+        views[key] += 1
+        if row["user_id"]:
+            user_views[key] += 1
+    stmt = pg_insert(PageViewDaily).values([
+        {"entity_type": t, "entity_code": c, "day": d, "views": n, "user_views": user_views[(t, c, d)]}
+        for (t, c, d), n in views.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["entity_type", "entity_code", "day"],
+        set_={
+            "views": PageViewDaily.views + stmt.excluded.views,
+            "user_views": PageViewDaily.user_views + stmt.excluded.user_views,
+        },
+    ))
+    return len(rows)
+
+
+def flush_stream(db: Session, consumer: str, max_batches: int = 20) -> dict:
+    """Drain up to max_batches × FLUSH_BATCH_SIZE buffered page views."""
+    def write(batch: list[dict]) -> int:
+        rows = [row for row in map(_row, batch) if row is not None]
+        _null_unknown_users(db, rows)
+        written = write_page_views(db, rows)
+        db.commit()
+        return written
+
+    return redis_stream_drain(STREAM_KEY, STREAM_GROUP, consumer, write,
+                              batch_size=FLUSH_BATCH_SIZE, max_batches=max_batches)
+
+
+def prune_raw_page_views(db: Session, retention_days: int = PAGE_VIEW_RETENTION_DAYS) -> int:
+    """Delete raw rows past retention in PRUNE_BATCH_SIZE chunks (short locks, one commit each)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    total = 0
+    while True:
+        deleted = db.execute(text("""
+            DELETE FROM page_views
+            WHERE id IN (SELECT id FROM page_views WHERE created_at < :cutoff LIMIT :n)
+        """), {"cutoff": cutoff, "n": PRUNE_BATCH_SIZE}).rowcount
+        db.commit()
+        total += deleted
+        if deleted < PRUNE_BATCH_SIZE:
+            return total
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _row(fields: dict) -> dict | None:
+    try:
+        return {
+            "entity_type": fields["t"],
+            "entity_code": fields["c"][:50],
+            "user_id": int(fields["u"]) if fields.get("u") else None,
+            "created_at": datetime.fromisoformat(fields["ts"]),
+        }
+    except (KeyError, ValueError) as exc:
+        log.warning("Dropping malformed page view entry %s: %s", fields, exc)
+        return None
+
+
+def _null_unknown_users(db: Session, rows: list[dict]) -> None:
+    """Accounts deleted since the hit was buffered would violate the FK — count them as anonymous."""
+    user_ids = {row["user_id"] for row in rows if row["user_id"]}
+    if not user_ids:
+        return
+    known = set(db.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    for row in rows:
+        if row["user_id"] and row["user_id"] not in known:
+            row["user_id"] = None
@@ -0,0 +1,396 @@
+"""
+Screener data shared by the API and the EDGAR revenue worker.
+
+screener_revenue_pivot (migration 0030) is a materialized view holding each
+stock's latest-fiscal-year revenue split — china/us/eu/japan/india/em pct,
+country_count, fiscal_year. Anything that writes stock_country_revenues calls
+refresh_revenue_pivot() afterwards, which also bumps UNIVERSE_VERSION_KEY.
+
+Engine: the screener universe is ~500 stocks, so each API worker holds it as
+a ScreenerUniverse — NumPy columns (market cap, sector code, the pivot
+columns) plus a dense asset × country latest-year revenue pct matrix — and
+every filter / sort / page is a handful of vector ops in-process instead of a
+Postgres round trip. A worker reloads when the Redis version changes (checked
+every UNIVERSE_CHECK_SECONDS) or its copy is older than UNIVERSE_MAX_AGE,
+which also picks up market cap updates.
+
+Exposure filters (`exposure=DE:>10,BRICS:<5`) threshold any country column of
+the matrix or any bloc aggregate — bloc columns (BLOC_FLAGS from the Country
+grouping flags, plus EM) are precomputed as revenue @ membership at load.
+Benchmark:
+    cd backend && python -m app.services.screener bench [sizes...]
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.storage import get_redis
+
+log = logging.getLogger(__name__)
+
+PIVOT_VIEW = "screener_revenue_pivot"
+UNIVERSE_VERSION_KEY = "screener:universe:version"
+UNIVERSE_CHECK_SECONDS = 30
+UNIVERSE_MAX_AGE = 900         # seconds — same freshness the old no-filter cache gave
+
+# MSCI Emerging Markets universe — the em_pct bucket of the pivot
+EM_CODES = (
+    'CN','IN','BR','MX','RU','ZA','KR','TW','ID','TH','MY','PH','CL','CO',
+    'PE','TR','EG','QA','AE','SA','AR','NG','PK','VN','BD','PL','HU','CZ',
+    'RO','GR','UA','KZ',
+)
+
+# Blocs accepted by `exposure=` — Country grouping flag per bloc, plus EM from EM_CODES
+BLOC_FLAGS = {
+    "G7":           "is_g7",
+    "G20":          "is_g20",
+    "EU":           "is_eu",
+    "EUROZONE":     "is_eurozone",
+    "NATO":         "is_nato",
+    "OPEC":         "is_opec",
+    "BRICS":        "is_brics",
+    "ASEAN":        "is_asean",
+    "OECD":         "is_oecd",
+    "COMMONWEALTH": "is_commonwealth",
+}
+MAX_EXPOSURE_TERMS = 10
+
+# Matrix values are the stored float64 pcts, but bloc columns are sums, so
+# thresholds compare with a tolerance far below the 0.1 the API displays:
+# `BRICS:<=10.1` keeps a stock whose shares add up to 10.100000000000001.
+EXPOSURE_TOLERANCE = 1e-6
+_EXPOSURE_OPS = {
+    ">":  lambda v, t: v > t + EXPOSURE_TOLERANCE,
+    ">=": lambda v, t: v >= t - EXPOSURE_TOLERANCE,
+    "<":  lambda v, t: v < t - EXPOSURE_TOLERANCE,
+    "<=": lambda v, t: v <= t + EXPOSURE_TOLERANCE,
+    "=":  lambda v, t: np.abs(v - t) <= EXPOSURE_TOLERANCE,
+}
+_EXPOSURE_TERM = re.compile(r"^\s*([A-Za-z0-9]{2,12})\s*:\s*(>=|<=|>|<|=)\s*(\d+(?:\.\d+)?)\s*$")
+
+# Slider filters: query prefix → pivot column (`{prefix}_min` / `{prefix}_max`)
+RANGE_FILTERS = {
+    "china": "china_pct",
+    "us":    "us_pct",
+    "eu":    "eu_pct",
+    "japan": "japan_pct",
+    "india": "india_pct",
+    "em":    "em_pct",
+}
+PCT_COLUMNS = tuple(RANGE_FILTERS.values())
+
+# sort_by value → column; strings sort by their precomputed rank
+SORT_COLUMNS = {
+    "market_cap":    "market_cap_usd",
+    "china_pct":     "china_pct",
+    "us_pct":        "us_pct",
+    "eu_pct":        "eu_pct",
+    "japan_pct":     "japan_pct",
+    "india_pct":     "india_pct",
+    "em_pct":        "em_pct",
+    "symbol":        "symbol_rank",
+    "sector":        "sector_rank",
+    "country_count": "country_count",
+}
+
+
+def refresh_revenue_pivot(db: Session) -> None:
+    """Rebuild the pivot without blocking readers and tell API workers to reload. Commits."""
+    db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {PIVOT_VIEW}"))
+    db.commit()
+    bump_universe_version()
+    log.info("screener: %s refreshed", PIVOT_VIEW)
+
+
+def bump_universe_version() -> None:
+    try:
+        get_redis().incr(UNIVERSE_VERSION_KEY)
+    except Exception as exc:
+        log.warning("screener: version bump failed (workers reload within %ds): %s",
+                    UNIVERSE_MAX_AGE, exc)
+
+
+def parse_exposure(spec: str) -> list[tuple[str, str, float]]:
+    """
+    `DE:>10,BRICS:<5` → [("DE", ">", 10.0), ("BRICS", "<", 5.0)].
+    Codes are upper-cased; whether they exist is checked against the universe.
+    Raises ValueError on malformed input.
+    """
+    terms = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        m = _EXPOSURE_TERM.match(part)
+        if not m:
+            raise ValueError(f"bad exposure term {part.strip()!r} — expected CODE:>N, e.g. DE:>10")
+        value = float(m.group(3))
+        if value > 100:
+            raise ValueError(f"exposure threshold {value:g} is above 100%")
+        terms.append((m.group(1).upper(), m.group(2), value))
+    if len(terms) > MAX_EXPOSURE_TERMS:
+        raise ValueError(f"at most {MAX_EXPOSURE_TERMS} exposure terms")
+    return terms
+
+
+class ScreenerUniverse:
+    """
+    Struct-of-arrays snapshot of every active stock, row-aligned:
+
+    symbols/names/sectors  Python lists (output only)
+    market_cap_usd         float64, NaN where unknown
+    sector_code            int32 into `sector_names`, −1 where NULL
+    symbol_rank/sector_rank float64 sort keys (sector NaN where NULL)
+    china_pct … em_pct     float64 pivot columns, 0 without revenue data
+    country_count          float64
+    fiscal_year            int32, 0 without revenue data
+    has_revenue            bool
+    revenue                float64 (n_assets × n_countries) latest-year pct matrix,
+                           columns in `country_codes` order
+    bloc_revenue           float64 (n_assets × n_blocs) = revenue @ membership,
+                           columns in `bloc_names` order
+    """
+
+    def __init__(self, assets: list[dict], revenue_rows: list[tuple[int, str, float]],
+                 country_codes: list[str], blocs: dict[str, list[str]] | None = None):
+        n = len(assets)
+        self.ids = np.array([a["id"] for a in assets], dtype=np.int64)
+        self.symbols = [a["symbol"] for a in assets]
+        self.names = [a["name"] for a in assets]
+        self.sectors = [a["sector"] for a in assets]
+
+        self.market_cap_usd = np.array(
+            [np.nan if a["market_cap_usd"] is None else a["market_cap_usd"] for a in assets],
+            dtype=np.float64,
+        )
+        self.sector_names = sorted({s for s in self.sectors if s})
+        sector_index = {s: i for i, s in enumerate(self.sector_names)}
+        self.sector_code = np.array([sector_index.get(s, -1) for s in self.sectors], dtype=np.int32)
+        self.sector_rank = np.where(self.sector_code >= 0, self.sector_code, np.nan).astype(np.float64)
+        self.symbol_rank = np.empty(n, dtype=np.float64)
+        self.symbol_rank[np.argsort(np.array(self.symbols, dtype=object), kind="stable")] = np.arange(n)
+
+        for col in PCT_COLUMNS:
+            setattr(self, col, np.array([a[col] or 0.0 for a in assets], dtype=np.float64))
+        self.country_count = np.array([a["country_count"] or 0 for a in assets], dtype=np.float64)
+        self.fiscal_year = np.array([a["fiscal_year"] or 0 for a in assets], dtype=np.int32)
+        self.has_revenue = np.array([a["has_revenue_data"] for a in assets], dtype=bool)
+
+        self.country_codes = country_codes
+        self.country_index = {c: j for j, c in enumerate(country_codes)}
+        row_of = {int(aid): i for i, aid in enumerate(self.ids)}
+        cells = [
+            (row_of[asset_id], self.country_index[code], pct)
+            for asset_id, code, pct in revenue_rows
+            if asset_id in row_of and code in self.country_index
+        ]
+        self.revenue = np.zeros((n, len(country_codes)), dtype=np.float64)
+        if cells:
+            rows, cols, pcts = zip(*cells)
+            np.maximum.at(self.revenue, (np.array(rows), np.array(cols)), np.array(pcts, dtype=np.float64))
+
+        # Bloc aggregates: one matmul against a 0/1 country × bloc membership matrix
+        blocs = blocs or {}
+        self.bloc_names = list(blocs)
+        self.bloc_index = {b: k for k, b in enumerate(self.bloc_names)}
+        membership = np.zeros((len(country_codes), len(self.bloc_names)), dtype=np.float64)
+        for k, members in enumerate(blocs.values()):
+            cols = [self.country_index[c] for c in members if c in self.country_index]
+            membership[cols, k] = 1.0
+        self.bloc_revenue = self.revenue @ membership
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mask(self, filters: dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for the screener's filter params (None = not set)."""
+        m = np.ones(len(self), dtype=bool)
+        for prefix, col in RANGE_FILTERS.items():
+            values = getattr(self, col)
+            if filters.get(f"{prefix}_min") is not None:
+                m &= values >= filters[f"{prefix}_min"]
+            if filters.get(f"{prefix}_max") is not None:
+                m &= values <= filters[f"{prefix}_max"]
+        if filters.get("sector"):
+            code = self.sector_names.index(filters["sector"]) if filters["sector"] in self.sector_names else -2
+            m &= self.sector_code == code
+        # NaN compares False, so unknown market caps drop out like SQL NULLs
+        if filters.get("market_cap_min") is not None:
+            m &= self.market_cap_usd >= filters["market_cap_min"] * 1_000_000_000
+        if filters.get("market_cap_max") is not None:
+            m &= self.market_cap_usd <= filters["market_cap_max"] * 1_000_000_000
+        if filters.get("country_code"):
+            j = self.country_index.get(filters["country_code"].upper())
+            m &= (self.revenue[:, j] > 0) if j is not None else False
+        for code, op, value in filters.get("exposure") or ():
+            m &= _EXPOSURE_OPS[op](self.exposure(code), value)
+        return m
+
+    def exposure(self, code: str) -> np.ndarray:
+        """Latest-year revenue pct per stock for an ISO2 country or a bloc name. KeyError if unknown."""
+        if code in self.bloc_index:
+            return self.bloc_revenue[:, self.bloc_index[code]]
+        return self.revenue[:, self.country_index[code]]
+
+    def check_exposure(self, terms: list[tuple[str, str, float]]) -> None:
+        """ValueError naming the first code that is neither a country nor a bloc."""
+        for code, _, _ in terms:
+            if code not in self.bloc_index and code not in self.country_index:
+                raise ValueError(f"unknown country or bloc {code!r} — blocs: {', '.join(self.bloc_names)}")
+
+    def order(self, rows: np.ndarray, sort_by: str, sort_dir: str) -> np.ndarray:
+        """
+        `rows` sorted by sort_by. NULLs last for DESC, first for ASC (as the SQL
+        did); ties break by symbol so pages are stable.
+        """
+        key = getattr(self, SORT_COLUMNS.get(sort_by, "market_cap_usd"))[rows]
+        if sort_dir.lower() == "asc":
+            key = np.where(np.isnan(key), -np.inf, key)
+        else:
+            key = np.where(np.isnan(key), np.inf, -key)
+        return rows[np.lexsort((self.symbol_rank[rows], key))]
+
+    def screen(self, filters: dict[str, Any], sort_by: str, sort_dir: str,
+               limit: int, offset: int) -> tuple[list[dict], int]:
+        """(page of result rows, total matching)."""
+        rows = np.flatnonzero(self.mask(filters))
+        page = self.order(rows, sort_by, sort_dir)[offset:offset + limit]
+        return [self.row(int(i)) for i in page], len(rows)
+
+    def row(self, i: int) -> dict:
+        mcap = self.market_cap_usd[i]
+        mcap = None if np.isnan(mcap) else float(mcap)
+        out = {
+            "symbol": self.symbols[i],
+            "name": self.names[i],
+            "sector": self.sectors[i],
+            "market_cap_usd": mcap,
+            "market_cap_b": round(mcap / 1_000_000_000, 1) if mcap else None,
+        }
+        for col in PCT_COLUMNS:
+            out[col] = round(float(getattr(self, col)[i]), 1)
+        out["country_count"] = int(self.country_count[i])
+        out["fiscal_year"] = int(self.fiscal_year[i]) or None
+        out["has_revenue_data"] = bool(self.has_revenue[i])
+        return out
+
+
+_universe: ScreenerUniverse | None = None
+_universe_version: str | None = None
+_universe_loaded_at = 0.0
+_universe_checked_at = 0.0
+_universe_lock = threading.Lock()
+
+
+def get_universe(db: Session) -> ScreenerUniverse:
+    """This worker's universe, reloaded if invalidated or older than UNIVERSE_MAX_AGE."""
+    global _universe, _universe_version, _universe_loaded_at, _universe_checked_at
+    now = time.monotonic()
+    if _universe is not None and now - _universe_checked_at < UNIVERSE_CHECK_SECONDS:
+        return _universe
+    with _universe_lock:
+        if _universe is not None and now - _universe_checked_at < UNIVERSE_CHECK_SECONDS:
+            return _universe
+        version = _current_version()
+        if (_universe is None or version != _universe_version
+                or now - _universe_loaded_at >= UNIVERSE_MAX_AGE):
+            t0 = time.perf_counter()
+            _universe = load_universe(db)
+            _universe_version = version
+            _universe_loaded_at = now
+            log.info("screener: universe loaded (%d stocks, %d countries) in %.0fms",
+                     len(_universe), len(_universe.country_codes), (time.perf_counter() - t0) * 1000)
+        _universe_checked_at = now
+        return _universe
+
+
+def load_universe(db: Session) -> ScreenerUniverse:
+    """Active stocks joined to the pivot, the pivot's latest-year country rows, and bloc membership."""
+    assets = db.execute(text(f"""
+        SELECT
+            a.id, a.symbol, a.name, a.sector, a.market_cap_usd,
+            rp.china_pct, rp.us_pct, rp.eu_pct, rp.japan_pct, rp.india_pct, rp.em_pct,
+            rp.country_count, rp.fiscal_year,
+            rp.asset_id IS NOT NULL AS has_revenue_data
+        FROM assets a
+        LEFT JOIN {PIVOT_VIEW} rp ON rp.asset_id = a.id
+        WHERE a.asset_type = 'stock' AND a.is_active = true
+        ORDER BY a.id
+    """)).mappings().all()
+    revenue_rows = db.execute(text(f"""
+        SELECT scr.asset_id, c.code, scr.revenue_pct
+        FROM stock_country_revenues scr
+        JOIN {PIVOT_VIEW} rp ON rp.asset_id = scr.asset_id AND rp.fiscal_year = scr.fiscal_year
+        JOIN countries c     ON c.id = scr.country_id
+    """)).all()
+    countries = db.execute(text(
+        f"SELECT code, {', '.join(BLOC_FLAGS.values())} FROM countries ORDER BY code"
+    )).mappings().all()
+    country_codes = [c["code"] for c in countries]
+    blocs = {bloc: [c["code"] for c in countries if c[flag]] for bloc, flag in BLOC_FLAGS.items()}
+    blocs["EM"] = list(EM_CODES)
+    return ScreenerUniverse([dict(a) for a in assets], [tuple(r) for r in revenue_rows],
+                            country_codes, blocs)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _current_version() -> str | None:
+    try:
+        return get_redis().get(UNIVERSE_VERSION_KEY)
+    except Exception:
+        return _universe_version  # Redis down — fall back to the max-age reload
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+def _synthetic_universe(n: int, n_countries: int = 250) -> ScreenerUniverse:
+    rng = np.random.default_rng(7)
+    codes = [f"{chr(65 + j // 26 % 26)}{chr(65 + j % 26)}" for j in range(n_countries)]
+    sectors = ["Technology", "Health Care", "Financials", "Energy", "Industrials", None]
+    assets, rows = [], []
+    for i in range(n):
+        split = rng.dirichlet(np.ones(8)) * 100
+        countries = rng.choice(n_countries, size=8, replace=False)
+        rows += [(i + 1, codes[c], float(p)) for c, p in zip(countries, split)]
+        assets.append({
+            "id": i + 1, "symbol": f"S{i:05d}", "name": f"Stock {i}",
+            "sector": sectors[i % len(sectors)],
+            "market_cap_usd": None if i % 50 == 0 else float(rng.lognormal(24, 1.5)),
+            **{col: float(rng.uniform(0, 60)) for col in PCT_COLUMNS},
+            "country_count": 8, "fiscal_year": 2025, "has_revenue_data": True,
+        })
+    blocs = {b: codes[k * 7:k * 7 + 20] for k, b in enumerate([*BLOC_FLAGS, "EM"])}
+    return ScreenerUniverse(assets, rows, codes, blocs)
+
+
+def _bench(sizes: list[int]) -> None:
+    """Time universe build and a filtered, sorted first page (best of 20)."""
+    filters = {"china_max": 10, "us_min": 20, "market_cap_min": 10, "country_code": "AB",
+               "exposure": parse_exposure("AC:>1,BRICS:<40,EU:>=2")}
+    print(f"{'n':>7} {'build':>9} {'screen':>9} {'matches':>8}")
+    for n in sizes:
+        t0 = time.perf_counter()
+        u = _synthetic_universe(n)
+        build = time.perf_counter() - t0
+        best = float("inf")
+        for _ in range(20):
+            t0 = time.perf_counter()
+            _, total = u.screen(filters, "china_pct", "desc", 50, 0)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{n:>7} {build * 1000:>7.1f}ms {best * 1e6:>7.0f}µs {total:>8}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        print("usage: python -m app.services.screener bench [sizes...]")
+        sys.exit(1)
+    _bench([int(a) for a in sys.argv[2:]] or [500, 5000, 50000])
@@ -184,6 +184,40 @@ def redis_json_del(key: str) -> None:
         _kv_log.warning("Redis del failed for %s: %s", key, exc)
 
 
+def redis_stream_drain(key: str, group: str, consumer: str, handler,
+                       batch_size: int = 5000, max_batches: int = 20) -> dict:
+    """
+    Write-behind helper: read a Redis stream through a consumer group in batches
+    and pass each batch's field dicts to handler(list[dict]) -> int (rows written).
+    Entries are acked + deleted only after handler returns, so a crash replays
+    them. This consumer's pending entries (left by a crashed run) are re-read first.
+    """
+    r = get_redis()
+    try:
+        r.xgroup_create(key, group, id="0", mkstream=True)
+    except redis_lib.ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+    stats = {"read": 0, "written": 0, "batches": 0}
+    start_id = "0"
+    for _ in range(max_batches):
+        resp = r.xreadgroup(group, consumer, {key: start_id}, count=batch_size)
+        entries = resp[0][1] if resp else []
+        if not entries:
+            if start_id == "0":
+                start_id = ">"  # pending backlog done — move on to new entries
+                continue
+            break
+        ids = [entry_id for entry_id, _ in entries]
+        stats["written"] += handler([fields for _, fields in entries])
+        r.xack(key, group, *ids)
+        r.xdel(key, *ids)
+        stats["read"] += len(entries)
+        stats["batches"] += 1
+    return stats
+
+
 # ── KV (L2 — Cloudflare edge, pushed for CF Worker to serve) ──────────────────
 
 def kv_json_get(key: str) -> list | dict | None:
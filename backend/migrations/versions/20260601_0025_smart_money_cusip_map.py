@@ -0,0 +1,38 @@
+"""add smart_money_cusip_map table
+
+Revision ID: 0025_smart_money_cusip_map
+Revises: 0024_performance_indexes
+Create Date: 2026-06-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0025_smart_money_cusip_map'
+down_revision: Union[str, None] = '0024_performance_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'smart_money_cusip_map',
+        sa.Column('cusip', sa.String(length=12), nullable=False),
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('asset_id', sa.Integer(), nullable=True),
+        sa.Column('issuer_name', sa.String(length=300), nullable=True),
+        sa.Column('match_method', sa.String(length=10), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('cusip'),
+    )
+    op.create_index('ix_sm_cusip_map_symbol', 'smart_money_cusip_map', ['symbol'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sm_cusip_map_symbol', table_name='smart_money_cusip_map')
+    op.drop_table('smart_money_cusip_map')
@@ -0,0 +1,30 @@
+"""add feed_events.enrichment_status for async AI body enrichment
+
+Revision ID: 0026_feed_event_enrichment
+Revises: 0025_smart_money_cusip_map
+Create Date: 2026-06-02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0026_feed_event_enrichment'
+down_revision: Union[str, None] = '0025_smart_money_cusip_map'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("feed_events", sa.Column("enrichment_status", sa.String(10), nullable=True))
+    # Partial index — the stale-pending sweep only ever scans the handful of queued rows
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_feed_events_enrichment_pending "
+        "ON feed_events (published_at) WHERE enrichment_status = 'pending'"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_feed_events_enrichment_pending")
+    op.drop_column("feed_events", "enrichment_status")
@@ -0,0 +1,42 @@
+"""add page_view_daily rollup, seeded from page_views
+
+Revision ID: 0027_page_view_daily
+Revises: 0026_feed_event_enrichment
+Create Date: 2026-06-03
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0027_page_view_daily'
+down_revision: Union[str, None] = '0026_feed_event_enrichment'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'page_view_daily',
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_code', sa.String(length=50), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('user_views', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('entity_type', 'entity_code', 'day'),
+    )
+    op.create_index('ix_page_view_daily_day', 'page_view_daily', ['day'])
+    # Seed from the raw history so the rollup is complete before raw rows are pruned
+    op.execute("""
+        INSERT INTO page_view_daily (entity_type, entity_code, day, views, user_views)
+        SELECT entity_type, entity_code, (created_at AT TIME ZONE 'UTC')::date,
+               count(*), count(user_id)
+        FROM page_views
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_page_view_daily_day', table_name='page_view_daily')
+    op.drop_table('page_view_daily')
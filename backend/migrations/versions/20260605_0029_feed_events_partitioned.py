@@ -0,0 +1,135 @@
+"""partition feed_events by month on published_at
+
+feed_events becomes a RANGE-partitioned table with one partition per calendar
+month (feed_events_pYYYY_MM) plus a DEFAULT catch-all, so the ranker's
+published_at window only touches the current partitions and old months can be
+archived to R2 and dropped whole (tasks.feed_archive).
+
+Postgres requires every unique constraint on a partitioned table to include
+the partition key, so:
+  - the primary key becomes (id, published_at) — ids still come from
+    feed_events_id_seq and stay unique in practice
+  - uq_feed_events_source_url becomes (source_url, published_at)
+  - the foreign keys from user_interactions (CASCADE) and blog_posts
+    (SET NULL) are dropped; app.services.feed_archive applies both rules
+    when a partition is dropped and sweeps orphaned interactions daily
+
+Revision ID: 0029_feed_events_partitioned
+Revises: 0028_feed_event_related_gin
+Create Date: 2026-06-05
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0029_feed_events_partitioned'
+down_revision: Union[str, None] = '0028_feed_event_related_gin'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 2
+
+_INDEXES = [
+    "CREATE INDEX ix_feed_events_published_at ON feed_events (published_at)",
+    "CREATE INDEX ix_feed_events_type_subtype ON feed_events (event_type, event_subtype)",
+    "CREATE INDEX ix_feed_events_enrichment_pending "
+    "ON feed_events (published_at) WHERE enrichment_status = 'pending'",
+    "CREATE INDEX ix_feed_events_related_assets "
+    "ON feed_events USING gin (related_asset_ids jsonb_path_ops)",
+    "CREATE INDEX ix_feed_events_related_countries "
+    "ON feed_events USING gin (related_country_ids jsonb_path_ops)",
+]
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Drop every FK that points at feed_events, whatever it was named
+    op.execute("""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN SELECT conrelid::regclass AS tbl, conname FROM pg_constraint
+                     WHERE contype = 'f' AND confrelid = 'feed_events'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', r.tbl, r.conname);
+            END LOOP;
+        END $$
+    """)
+
+    op.execute("ALTER TABLE feed_events RENAME TO feed_events_legacy")
+    op.execute(
+        "CREATE TABLE feed_events (LIKE feed_events_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (published_at)"
+    )
+    op.execute("ALTER TABLE feed_events ADD CONSTRAINT feed_events_pkey_v2 PRIMARY KEY (id, published_at)")
+
+    oldest = bind.execute(sa.text("SELECT min(published_at) FROM feed_events_legacy")).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = (oldest.astimezone(timezone.utc).date() if oldest else today).replace(day=1)
+    last = today.replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        nxt = _next_month(month)
+        op.execute(
+            f"CREATE TABLE feed_events_p{month:%Y_%m} PARTITION OF feed_events "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+        )
+        month = nxt
+    op.execute("CREATE TABLE feed_events_default PARTITION OF feed_events DEFAULT")
+
+    op.execute("INSERT INTO feed_events SELECT * FROM feed_events_legacy")
+    op.execute("ALTER SEQUENCE feed_events_id_seq OWNED BY feed_events.id")
+    op.execute("DROP TABLE feed_events_legacy")
+    op.execute("ALTER TABLE feed_events RENAME CONSTRAINT feed_events_pkey_v2 TO feed_events_pkey")
+
+    for ddl in _INDEXES:
+        op.execute(ddl)
+    op.execute(
+        "ALTER TABLE feed_events ADD CONSTRAINT uq_feed_events_source_url "
+        "UNIQUE (source_url, published_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE feed_events RENAME TO feed_events_partitioned")
+    op.execute("CREATE TABLE feed_events (LIKE feed_events_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO feed_events SELECT * FROM feed_events_partitioned")
+    op.execute("ALTER SEQUENCE feed_events_id_seq OWNED BY feed_events.id")
+    op.execute("DROP TABLE feed_events_partitioned CASCADE")
+    op.execute("ALTER TABLE feed_events ADD PRIMARY KEY (id)")
+
+    for ddl in _INDEXES:
+        op.execute(ddl)
+    # Newest row wins for any source_url duplicated across months
+    op.execute("""
+        DELETE FROM feed_events
+        WHERE source_url IS NOT NULL AND id NOT IN (
+            SELECT DISTINCT ON (source_url) id FROM feed_events
+            WHERE source_url IS NOT NULL
+            ORDER BY source_url, published_at DESC
+        )
+    """)
+    op.create_unique_constraint('uq_feed_events_source_url', 'feed_events', ['source_url'])
+
+    op.execute("DELETE FROM user_interactions WHERE feed_event_id NOT IN (SELECT id FROM feed_events)")
+    op.execute(
+        "UPDATE blog_posts SET feed_event_id = NULL "
+        "WHERE feed_event_id IS NOT NULL AND feed_event_id NOT IN (SELECT id FROM feed_events)"
+    )
+    op.create_foreign_key(
+        'user_interactions_feed_event_id_fkey', 'user_interactions', 'feed_events',
+        ['feed_event_id'], ['id'], ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'blog_posts_feed_event_id_fkey', 'blog_posts', 'feed_events',
+        ['feed_event_id'], ['id'], ondelete='SET NULL',
+    )
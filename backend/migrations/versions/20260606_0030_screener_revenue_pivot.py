@@ -0,0 +1,57 @@
+"""add screener_revenue_pivot materialized view (latest-year revenue pivot per stock)
+
+Replaces the latest_year / revenue_pivot CTEs /api/screener rebuilt over all of
+stock_country_revenues on every uncached request. Refreshed (CONCURRENTLY, hence
+the unique index) by edgar_revenue.fetch_all after it upserts.
+
+Revision ID: 0030_screener_revenue_pivot
+Revises: 0029_feed_events_partitioned
+Create Date: 2026-06-06
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0030_screener_revenue_pivot'
+down_revision: Union[str, None] = '0029_feed_events_partitioned'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# MSCI Emerging Markets universe — keep in sync with app.services.screener.EM_CODES
+_EM_CODES = (
+    'CN','IN','BR','MX','RU','ZA','KR','TW','ID','TH','MY','PH','CL','CO',
+    'PE','TR','EG','QA','AE','SA','AR','NG','PK','VN','BD','PL','HU','CZ',
+    'RO','GR','UA','KZ',
+)
+
+
+def upgrade() -> None:
+    em_list = ", ".join(f"'{c}'" for c in _EM_CODES)
+    op.execute(f"""
+        CREATE MATERIALIZED VIEW screener_revenue_pivot AS
+        WITH latest_year AS (
+            SELECT asset_id, MAX(fiscal_year) AS fy
+            FROM stock_country_revenues
+            GROUP BY asset_id
+        )
+        SELECT
+            scr.asset_id,
+            MAX(CASE WHEN c.code = 'CN' THEN scr.revenue_pct END)                AS china_pct,
+            MAX(CASE WHEN c.code = 'US' THEN scr.revenue_pct END)                AS us_pct,
+            COALESCE(SUM(CASE WHEN c.is_eu = true THEN scr.revenue_pct END), 0)  AS eu_pct,
+            MAX(CASE WHEN c.code = 'JP' THEN scr.revenue_pct END)                AS japan_pct,
+            MAX(CASE WHEN c.code = 'IN' THEN scr.revenue_pct END)                AS india_pct,
+            COALESCE(SUM(CASE WHEN c.code IN ({em_list}) THEN scr.revenue_pct END), 0) AS em_pct,
+            COUNT(DISTINCT scr.country_id)                                       AS country_count,
+            MAX(scr.fiscal_year)                                                 AS fiscal_year
+        FROM stock_country_revenues scr
+        JOIN latest_year ly ON ly.asset_id = scr.asset_id AND ly.fy = scr.fiscal_year
+        JOIN countries c    ON c.id = scr.country_id
+        GROUP BY scr.asset_id
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_screener_revenue_pivot_asset ON screener_revenue_pivot (asset_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS screener_revenue_pivot")
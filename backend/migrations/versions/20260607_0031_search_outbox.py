@@ -0,0 +1,79 @@
+"""add search_outbox change log for incremental search indexing
+
+Row-level triggers on countries, assets and blog_posts append (index_uid,
+doc_id) whenever a searchable column changes, a row is inserted or a row is
+deleted. tasks.search_index.sync_search_delta drains the table every few
+minutes and pushes / deletes just those documents, so every writer — seeders,
+admin publish, enrichment, manual SQL — is tracked without touching its code.
+
+UPDATE triggers compare the searchable columns only: seeders that upsert every
+row and price jobs that rewrite market_cap_usd do not flood the outbox
+(market-cap ordering is refreshed by the daily full reindex).
+
+Revision ID: 0031_search_outbox
+Revises: 0030_screener_revenue_pivot
+Create Date: 2026-06-07
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0031_search_outbox'
+down_revision: Union[str, None] = '0030_screener_revenue_pivot'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table → (Meilisearch index, columns that feed its documents)
+_TRACKED = {
+    'countries': ('countries', (
+        'code', 'name', 'name_official', 'flag_emoji', 'region', 'subregion',
+        'currency_code', 'currency_name', 'capital_city', 'is_g20',
+    )),
+    'assets': ('assets', (
+        'symbol', 'name', 'sector', 'industry', 'asset_type', 'is_active',
+    )),
+    'blog_posts': ('blogs', (
+        'slug', 'title', 'excerpt', 'body', 'category', 'status', 'published_at',
+    )),
+}
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE search_outbox (
+            id          BIGSERIAL PRIMARY KEY,
+            index_uid   VARCHAR(20) NOT NULL,
+            doc_id      INTEGER NOT NULL,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("""
+        CREATE FUNCTION search_outbox_enqueue() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO search_outbox (index_uid, doc_id)
+            VALUES (TG_ARGV[0], CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+            RETURN NULL;
+        END $$
+    """)
+    for table, (index_uid, columns) in _TRACKED.items():
+        old = ", ".join(f"OLD.{c}" for c in columns)
+        new = ", ".join(f"NEW.{c}" for c in columns)
+        op.execute(
+            f"CREATE TRIGGER trg_{table}_search_write AFTER INSERT OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION search_outbox_enqueue('{index_uid}')"
+        )
+        op.execute(
+            f"CREATE TRIGGER trg_{table}_search_update AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN (({old}) IS DISTINCT FROM ({new})) "
+            f"EXECUTE FUNCTION search_outbox_enqueue('{index_uid}')"
+        )
+
+
+def downgrade() -> None:
+    for table in _TRACKED:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_search_update ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_search_write ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS search_outbox_enqueue()")
+    op.execute("DROP TABLE IF EXISTS search_outbox")
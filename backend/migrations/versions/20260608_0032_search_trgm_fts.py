@@ -0,0 +1,50 @@
+"""add pg_trgm and full-text indexes for the Postgres search fallback
+
+/api/search falls back to Postgres when neither Meilisearch nor the in-process
+index is available. Its leading-wildcard ILIKEs were sequential scans; these
+GIN indexes serve them and the similarity operators that now rank results:
+
+  trigram (gin_trgm_ops)  assets.name, assets.symbol, countries.name,
+                          blog_posts.title
+  full text               weighted tsvector over blog title / excerpt / body
+
+Revision ID: 0032_search_trgm_fts
+Revises: 0031_search_outbox
+Create Date: 2026-06-08
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0032_search_trgm_fts'
+down_revision: Union[str, None] = '0031_search_outbox'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TRGM = [
+    ('ix_assets_name_trgm', 'assets', 'name'),
+    ('ix_assets_symbol_trgm', 'assets', 'symbol'),
+    ('ix_countries_name_trgm', 'countries', 'name'),
+    ('ix_blog_posts_title_trgm', 'blog_posts', 'title'),
+]
+
+# Keep in sync with app.models.feed.BLOG_SEARCH_VECTOR — queries must match it exactly
+_BLOG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in _TRGM:
+        op.execute(f"CREATE INDEX {name} ON {table} USING gin ({column} gin_trgm_ops)")
+    op.execute(f"CREATE INDEX ix_blog_posts_search ON blog_posts USING gin (({_BLOG_SEARCH_VECTOR}))")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_blog_posts_search")
+    for name, _, _ in _TRGM:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
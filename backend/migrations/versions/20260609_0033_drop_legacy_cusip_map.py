@@ -0,0 +1,29 @@
+"""drop 'legacy' rows from smart_money_cusip_map
+
+0025 used to seed the map from holdings resolved by the old name-LIKE lookup —
+the very mappings the resolver replaces. Cached CUSIPs short-circuit
+resolution and flush() never overwrites, so those rows would have been
+permanent. Deleting them lets the exact/fuzzy resolver relearn each CUSIP on
+the next 13F run. No-op on databases migrated after the seed was removed.
+
+Revision ID: 0033_drop_legacy_cusip_map
+Revises: 0032_search_trgm_fts
+Create Date: 2026-06-09
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0033_drop_legacy_cusip_map'
+down_revision: Union[str, None] = '0032_search_trgm_fts'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DELETE FROM smart_money_cusip_map WHERE match_method = 'legacy'")
+
+
+def downgrade() -> None:
+    pass
@@ -13,6 +13,7 @@ mkdir -p /var/log/metricshour
 echo "=== Copying systemd services ==="
 cp /root/metricshour/deploy/metricshour-api.service    /etc/systemd/system/
 cp /root/metricshour/deploy/metricshour-worker.service /etc/systemd/system/
+cp /root/metricshour/deploy/metricshour-worker-enrichment.service /etc/systemd/system/
 
 echo "=== Enabling Nginx config ==="
 cp /root/metricshour/deploy/nginx.conf /etc/nginx/sites-available/metricshour
@@ -22,13 +23,14 @@ nginx -t && systemctl reload nginx
 
 echo "=== Starting services ==="
 systemctl daemon-reload
-systemctl enable metricshour-api metricshour-worker
-systemctl start metricshour-api metricshour-worker
+systemctl enable metricshour-api metricshour-worker metricshour-worker-enrichment
+systemctl start metricshour-api metricshour-worker metricshour-worker-enrichment
 
 echo ""
 echo "=== Status ==="
 systemctl status metricshour-api --no-pager
 systemctl status metricshour-worker --no-pager
+systemctl status metricshour-worker-enrichment --no-pager
 
 echo ""
 echo "=== Next: SSL ==="
@@ -63,6 +63,9 @@ app = Celery('metricshour', include=[
     'tasks.fx',
     'tasks.backup',
     'tasks.feed_generator',
+    'tasks.feed_interactions',
+    'tasks.feed_archive',
+    'tasks.page_views',
     'tasks.summaries',
     'tasks.og_images',
     'tasks.price_alert_checker',
@@ -124,6 +127,11 @@ app.conf.update(
     worker_prefetch_multiplier=1,
     worker_max_memory_per_child=512000,   # recycle worker at 512 MB (prevents OOM kills)
     worker_max_tasks_per_child=200,       # also recycle after 200 tasks
+    # LLM-bound feed enrichment runs in its own worker pool (metricshour-worker-enrichment)
+    # so slow DeepSeek/Gemini calls never occupy the main worker's slots.
+    task_routes={
+        'tasks.feed_generator.enrich_feed_event': {'queue': 'enrichment'},
+    },
     beat_schedule={
         'crypto-every-2min': {
             'task': 'tasks.crypto.fetch_crypto_prices',
@@ -180,6 +188,30 @@ app.conf.update(
             'task': 'tasks.feed_generator.generate_feed_events',
             'schedule': 180.0,
         },
+        # Write-behind flush of /api/feed/{id}/interact (Redis stream → user_interactions)
+        'feed-interactions-flush-every-10s': {
+            'task': 'tasks.feed_interactions.flush_interactions',
+            'schedule': 10.0,
+        },
+        # Buffered /api/track page views → page_views + page_view_daily rollups
+        'page-views-flush-every-30s': {
+            'task': 'tasks.page_views.flush_page_views',
+            'schedule': 30.0,
+        },
+        'page-views-prune-daily-350am': {
+            'task': 'tasks.page_views.prune_page_views',
+            'schedule': crontab(hour=3, minute=50),
+        },
+        # feed_events monthly partitions: create ahead, archive old months to R2, prune orphans
+        'feed-events-maintain-daily-405am': {
+            'task': 'tasks.feed_archive.maintain_feed_events',
+            'schedule': crontab(hour=4, minute=5),
+        },
+        # Re-queue AI enrichment for feed events whose task was lost on a worker restart
+        'feed-enrichment-sweep-every-15min': {
+            'task': 'tasks.feed_generator.requeue_stale_enrichments',
+            'schedule': 900.0,
+        },
         'macro-calendar-sync-daily-615am': {
             'task': 'tasks.macro_calendar.sync_macro_events',
             'schedule': crontab(hour=6, minute=15),
@@ -339,7 +371,7 @@ app.conf.update(
             'schedule': crontab(hour=6, minute=30),
         },
 
-        # Price history backfill — 5yr daily OHLCV, monthly on 2nd at 1am
+        # Price history backfill — fills gaps in 5yr daily OHLCV (resumable), monthly on 2nd at 1am
         'price-backfill-monthly': {
             'task': 'tasks.backfill.backfill_price_history',
             'schedule': crontab(hour=1, minute=0, day_of_month=2),
@@ -356,6 +388,12 @@ app.conf.update(
             'task': 'tasks.search_index.reindex_search',
             'schedule': crontab(hour=7, minute=15),
         },
+        # Meilisearch delta — every 2 min, only documents changed since last run (search_outbox)
+        'search-delta-every-2min': {
+            'task': 'tasks.search_index.sync_search_delta',
+            'schedule': 120.0,
+            'options': {'expires': 110},
+        },
 
         # Social content — 6 daily slots: posts (copy-ready Telegram) + reels (via tg-bridge → Moltis)
         # expires=3600: discard if worker was down — stale market data at wrong time is useless
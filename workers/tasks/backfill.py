@@ -1,6 +1,20 @@
 """
 Historical price backfill — 5 years of daily OHLCV for stocks, crypto, and FX.
 
+Gap-aware: one windowed SQL pass finds missing date ranges per asset (leading,
+interior and trailing holes in the 1d series) and only those ranges are fetched
+from yfinance and upserted. Chunks run one after another with a pause between
+them — yf.download keeps its results in module-global state, so concurrent
+calls can lose or swap each other's frames, and Yahoo rate-limits bursts.
+Finished assets are recorded in a Redis set so a killed run resumes where it
+stopped. Empty ranges are only memoised on positive evidence: when yfinance
+returns a ticker's series starting after a gap, its listing day is kept for 90
+days and earlier history is not re-requested. Other empty ranges (exchange
+holidays, trailing days) are kept as the exact range for a week so a resumed
+run skips them; a ticker that comes back with no rows at all is never memoised
+— an empty frame is also what yfinance returns on rate limits and network
+errors — and a chunk with no rows at all counts as a chunk error.
+
 Safe to re-run — upserts on conflict. Run once after deploy, then monthly.
 
 Trigger manually:
@@ -11,15 +25,17 @@ Or schedule via beat (see celery_app.py).
 
 import logging
 import time
-from datetime import datetime, timezone
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
 
 import yfinance as yf
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from celery_app import app
 from app.database import SessionLocal
 from app.models.asset import Asset, AssetType, Price
+from app.storage import get_redis
 
 log = logging.getLogger(__name__)
 
@@ -51,7 +67,34 @@ YFINANCE_FX_MAP: dict[str, str] = {
     'USDINR': 'USDINR=X',
 }
 
-CHUNK_SIZE = 10  # smaller chunks for 5yr downloads
+HISTORY_YEARS = 5
+CHUNK_SIZE    = 10   # tickers per yf.download call
+CHUNK_PAUSE   = 1.0  # seconds between yf.download calls (Yahoo rate limit)
+LISTING_PROBE_DAYS = 7  # fetch past the last gap so a pre-IPO gap still returns the first rows
+
+# Largest run of calendar days without a 1d row that is still "normal":
+# weekends + a holiday for exchange-traded assets, none for 24/7 crypto.
+MAX_NORMAL_GAP_DAYS = {
+    AssetType.stock:  4,
+    AssetType.fx:     4,
+    AssetType.crypto: 1,
+}
+
+_DONE_KEY       = 'worker:backfill:done'        # SET of asset_ids finished this run
+_DONE_TTL       = 172800                        # 2 days — long enough to resume next day
+_NODATA_PREFIX  = 'worker:backfill:nodata:v2:'  # per asset: '<id>:listed' → first day, '<id>:ranges' → SET 'lo:hi'
+_LISTED_TTL     = 90 * 86400
+_NODATA_TTL     = 7 * 86400
+
+
+def _yf_symbol(asset) -> str | None:
+    if asset.asset_type == AssetType.stock:
+        return asset.symbol
+    if asset.asset_type == AssetType.crypto:
+        return YFINANCE_CRYPTO_MAP.get(asset.symbol)
+    if asset.asset_type == AssetType.fx:
+        return YFINANCE_FX_MAP.get(asset.symbol)
+    return None
 
 
 def _upsert_rows(db, rows: list[dict]) -> int:
@@ -72,189 +115,300 @@ def _upsert_rows(db, rows: list[dict]) -> int:
     return len(rows)
 
 
-def _backfill_stocks(db, assets: list) -> int:
-    symbol_to_asset = {a.symbol: a for a in assets}
-    symbols = list(symbol_to_asset.keys())
-    total = 0
-
-    for i in range(0, len(symbols), CHUNK_SIZE):
-        chunk = symbols[i:i + CHUNK_SIZE]
-        try:
-            if len(chunk) == 1:
-                raw = yf.download(chunk[0], period='5y', interval='1d',
-                                  progress=False, auto_adjust=True)
-                frames = {chunk[0]: raw}
-            else:
-                raw = yf.download(chunk, period='5y', interval='1d',
-                                  group_by='ticker', progress=False,
-                                  threads=True, auto_adjust=True)
-                frames = {sym: raw[sym] for sym in chunk}
-
-            rows = []
-            for sym, df in frames.items():
-                asset = symbol_to_asset.get(sym)
-                if asset is None or df.empty:
-                    continue
-                df = df.dropna(subset=['Close'])
-                for ts, r in df.iterrows():
-                    rows.append({
-                        'asset_id':  asset.id,
-                        'timestamp': ts.to_pydatetime().replace(tzinfo=timezone.utc),
-                        'interval':  '1d',
-                        'open':      float(r['Open'])   if r.get('Open')   is not None else None,
-                        'high':      float(r['High'])   if r.get('High')   is not None else None,
-                        'low':       float(r['Low'])    if r.get('Low')    is not None else None,
-                        'close':     float(r['Close']),
-                        'volume':    float(r['Volume']) if r.get('Volume') is not None else None,
-                    })
-
-            n = _upsert_rows(db, rows)
-            db.commit()
-            total += n
-            log.info(f'Stocks backfill chunk {i}–{i+len(chunk)}: {n} rows')
-        except Exception:
-            db.rollback()
-            log.exception(f'Stocks backfill chunk {i}–{i+len(chunk)} failed')
-
-        time.sleep(1)
-
-    return total
-
-
-def _backfill_crypto(db, assets: list) -> int:
-    symbol_to_asset = {a.symbol: a for a in assets}
-    yf_to_asset = {
-        yf_sym: symbol_to_asset[our_sym]
-        for our_sym, yf_sym in YFINANCE_CRYPTO_MAP.items()
-        if our_sym in symbol_to_asset
-    }
-    if not yf_to_asset:
-        return 0
-
-    yf_syms = list(yf_to_asset.keys())
-    total = 0
-
-    for i in range(0, len(yf_syms), CHUNK_SIZE):
-        chunk = yf_syms[i:i + CHUNK_SIZE]
-        try:
-            if len(chunk) == 1:
-                raw = yf.download(chunk[0], period='5y', interval='1d',
-                                  progress=False, auto_adjust=True)
-                frames = {chunk[0]: raw}
-            else:
-                raw = yf.download(chunk, period='5y', interval='1d',
-                                  group_by='ticker', progress=False,
-                                  threads=True, auto_adjust=True)
-                frames = {sym: raw[sym] for sym in chunk}
-
-            rows = []
-            for yf_sym, df in frames.items():
-                asset = yf_to_asset.get(yf_sym)
-                if asset is None or df.empty:
-                    continue
-                df = df.dropna(subset=['Close'])
-                for ts, r in df.iterrows():
-                    rows.append({
-                        'asset_id':  asset.id,
-                        'timestamp': ts.to_pydatetime().replace(tzinfo=timezone.utc),
-                        'interval':  '1d',
-                        'open':      float(r['Open'])   if r.get('Open')   is not None else None,
-                        'high':      float(r['High'])   if r.get('High')   is not None else None,
-                        'low':       float(r['Low'])    if r.get('Low')    is not None else None,
-                        'close':     float(r['Close']),
-                        'volume':    float(r['Volume']) if r.get('Volume') is not None else None,
-                    })
-
-            n = _upsert_rows(db, rows)
-            db.commit()
-            total += n
-            log.info(f'Crypto backfill chunk {i}–{i+len(chunk)}: {n} rows')
-        except Exception:
-            db.rollback()
-            log.exception(f'Crypto backfill chunk {i}–{i+len(chunk)} failed')
-
-        time.sleep(1)
+# ── Gap detection ─────────────────────────────────────────────────────────────
 
-    return total
-
-
-def _backfill_fx(db, assets: list) -> int:
-    symbol_to_asset = {a.symbol: a for a in assets}
-    yf_to_asset = {
-        yf_sym: symbol_to_asset[our_sym]
-        for our_sym, yf_sym in YFINANCE_FX_MAP.items()
-        if our_sym in symbol_to_asset
-    }
-    if not yf_to_asset:
+_COVERAGE_SQL = text("""
+    WITH days AS (
+        SELECT DISTINCT asset_id, (timestamp AT TIME ZONE 'UTC')::date AS day
+        FROM prices
+        WHERE interval = '1d' AND asset_id = ANY(:ids) AND timestamp >= :start
+    ),
+    lagged AS (
+        SELECT asset_id, day, LAG(day) OVER (PARTITION BY asset_id ORDER BY day) AS prev_day
+        FROM days
+    )
+    SELECT asset_id,
+           MIN(day)  AS first_day,
+           MAX(day)  AS last_day,
+           COUNT(*)  AS n_days,
+           COALESCE(
+               json_agg(json_build_array(prev_day, day))
+                   FILTER (WHERE day - prev_day > :max_gap),
+               '[]'
+           ) AS holes
+    FROM lagged
+    GROUP BY asset_id
+""")
+
+
+def _find_gaps(db, assets: list, start: date, today: date) -> dict[int, list[tuple[date, date]]]:
+    """
+    Return {asset_id: [(gap_start, gap_end), ...]} — inclusive missing-day ranges.
+    One windowed query per asset type (each type has its own normal-gap threshold).
+    Assets with no rows at all get the full window.
+    """
+    gaps: dict[int, list[tuple[date, date]]] = {}
+    by_type: dict[AssetType, list] = defaultdict(list)
+    for a in assets:
+        by_type[a.asset_type].append(a)
+
+    for asset_type, typed in by_type.items():
+        max_gap = MAX_NORMAL_GAP_DAYS.get(asset_type, 4)
+        rows = db.execute(_COVERAGE_SQL, {
+            'ids': [a.id for a in typed], 'start': start, 'max_gap': max_gap,
+        }).all()
+        seen = {r.asset_id: r for r in rows}
+        for a in typed:
+            r = seen.get(a.id)
+            if r is None:
+                gaps[a.id] = [(start, today)]
+                continue
+            ranges: list[tuple[date, date]] = []
+            if (r.first_day - start).days > max_gap:
+                ranges.append((start, r.first_day - timedelta(days=1)))
+            for prev_day, day in r.holes:
+                ranges.append((date.fromisoformat(prev_day) + timedelta(days=1),
+                               date.fromisoformat(day) - timedelta(days=1)))
+            if (today - r.last_day).days > max_gap:
+                ranges.append((r.last_day + timedelta(days=1), today))
+            if ranges:
+                gaps[a.id] = ranges
+    return gaps
+
+
+def _is_known_empty(gap: tuple[date, date], listed: str | None, ranges: set[str]) -> bool:
+    lo, hi = gap
+    if listed and hi < date.fromisoformat(listed):
+        return True
+    return f'{lo}:{hi}' in ranges
+
+
+def _drop_known_empty(redis_client, gaps: dict[int, list[tuple[date, date]]]) -> int:
+    """Remove ranges known to have no data (pre-listing, or empty within the last week). Returns count dropped."""
+    if not redis_client or not gaps:
         return 0
-
-    yf_syms = list(yf_to_asset.keys())
-    total = 0
-
-    try:
-        if len(yf_syms) == 1:
-            raw = yf.download(yf_syms[0], period='5y', interval='1d',
-                              progress=False, auto_adjust=True)
-            frames = {yf_syms[0]: raw}
+    asset_ids = list(gaps)
+    pipe = redis_client.pipeline()
+    for asset_id in asset_ids:
+        pipe.get(f'{_NODATA_PREFIX}{asset_id}:listed')
+        pipe.smembers(f'{_NODATA_PREFIX}{asset_id}:ranges')
+    results = pipe.execute()
+    dropped = 0
+    for i, asset_id in enumerate(asset_ids):
+        listed, ranges = results[2 * i], results[2 * i + 1]
+        if not listed and not ranges:
+            continue
+        kept = [g for g in gaps[asset_id] if not _is_known_empty(g, listed, ranges)]
+        dropped += len(gaps[asset_id]) - len(kept)
+        if kept:
+            gaps[asset_id] = kept
         else:
-            raw = yf.download(yf_syms, period='5y', interval='1d',
-                              group_by='ticker', progress=False,
-                              threads=True, auto_adjust=True)
-            frames = {sym: raw[sym] for sym in yf_syms}
-
-        rows = []
-        for yf_sym, df in frames.items():
-            asset = yf_to_asset.get(yf_sym)
-            if asset is None or df.empty:
+            del gaps[asset_id]
+    return dropped
+
+
+def _coverage_stats(db, assets: list, start: date, today: date) -> dict[str, dict]:
+    """Per asset type: assets, assets with rows, day coverage vs. expected trading days."""
+    stats: dict[str, dict] = {}
+    by_type: dict[AssetType, list] = defaultdict(list)
+    for a in assets:
+        by_type[a.asset_type].append(a)
+    for asset_type, typed in by_type.items():
+        rows = db.execute(_COVERAGE_SQL, {
+            'ids': [a.id for a in typed], 'start': start,
+            'max_gap': MAX_NORMAL_GAP_DAYS.get(asset_type, 4),
+        }).all()
+        span = (today - start).days + 1
+        per_day = 1.0 if asset_type == AssetType.crypto else 5 / 7
+        expected = span * per_day * len(typed)
+        n_days = sum(r.n_days for r in rows)
+        stats[asset_type.value] = {
+            'assets':           len(typed),
+            'assets_with_data': len(rows),
+            'assets_complete':  sum(1 for r in rows if not r.holes),
+            'days':             n_days,
+            'coverage_pct':     round(min(n_days / expected, 1.0) * 100, 1) if expected else None,
+        }
+    return stats
+
+
+# ── Fetch + upsert ────────────────────────────────────────────────────────────
+
+def _fetch_chunk(chunk: list[tuple[int, str, list[tuple[date, date]], bool]]) -> tuple[int, list[int], dict, dict]:
+    """
+    Download one chunk over the union of its gap windows, keep only rows that
+    fall inside each asset's gaps, upsert in a private session.
+    Returns (rows_upserted, asset_ids_done, {asset_id: empty_ranges},
+    {asset_id: listing_day}). Tickers that returned no rows report neither;
+    raises if the whole chunk came back empty.
+    """
+    yf_to_asset = {yf_sym: (asset_id, ranges, has_volume)
+                   for asset_id, yf_sym, ranges, has_volume in chunk}
+    yf_syms = list(yf_to_asset)
+    win_start = min(lo for _, _, ranges, _ in chunk for lo, _ in ranges)
+    win_end = max(hi for _, _, ranges, _ in chunk for _, hi in ranges) + timedelta(days=LISTING_PROBE_DAYS + 1)
+
+    if len(yf_syms) == 1:
+        raw = yf.download(yf_syms[0], start=win_start.isoformat(), end=win_end.isoformat(),
+                          interval='1d', progress=False, auto_adjust=True)
+        frames = {yf_syms[0]: raw}
+    else:
+        raw = yf.download(yf_syms, start=win_start.isoformat(), end=win_end.isoformat(),
+                          interval='1d', group_by='ticker', progress=False,
+                          threads=True, auto_adjust=True)
+        frames = {sym: raw[sym] for sym in yf_syms if sym in raw.columns.get_level_values(0)}
+
+    rows = []
+    filled: dict[int, set[tuple[date, date]]] = defaultdict(set)
+    first_seen: dict[int, date] = {}
+    for yf_sym, df in frames.items():
+        asset_id, ranges, has_volume = yf_to_asset[yf_sym]
+        if df.empty:
+            continue
+        df = df.dropna(subset=['Close'])
+        if df.empty:
+            continue
+        first_seen[asset_id] = min(df.index).date()
+        for ts, r in df.iterrows():
+            day = ts.date()
+            hit = [g for g in ranges if g[0] <= day <= g[1]]
+            if not hit:
                 continue
-            df = df.dropna(subset=['Close'])
-            for ts, r in df.iterrows():
-                rows.append({
-                    'asset_id':  asset.id,
-                    'timestamp': ts.to_pydatetime().replace(tzinfo=timezone.utc),
-                    'interval':  '1d',
-                    'open':      float(r['Open'])  if r.get('Open')  is not None else None,
-                    'high':      float(r['High'])  if r.get('High')  is not None else None,
-                    'low':       float(r['Low'])   if r.get('Low')   is not None else None,
-                    'close':     float(r['Close']),
-                    'volume':    None,
-                })
-
-        total = _upsert_rows(db, rows)
+            filled[asset_id].update(hit)
+            rows.append({
+                'asset_id':  asset_id,
+                'timestamp': ts.to_pydatetime().replace(tzinfo=timezone.utc),
+                'interval':  '1d',
+                'open':      float(r['Open'])   if r.get('Open')   is not None else None,
+                'high':      float(r['High'])   if r.get('High')   is not None else None,
+                'low':       float(r['Low'])    if r.get('Low')    is not None else None,
+                'close':     float(r['Close']),
+                'volume':    float(r['Volume']) if has_volume and r.get('Volume') is not None else None,
+            })
+
+    if not first_seen:
+        raise RuntimeError(f'yf.download returned no rows for {yf_syms}')
+
+    db = SessionLocal()
+    try:
+        n = _upsert_rows(db, rows)
         db.commit()
-        log.info(f'FX backfill: {total} rows')
     except Exception:
         db.rollback()
-        log.exception('FX backfill failed')
+        raise
+    finally:
+        db.close()
 
-    return total
+    # A leading gap (it opens the window) that ends before the ticker's first
+    # row is pre-listing; other unfilled gaps are only empty this time.
+    empty: dict[int, list[tuple[date, date]]] = {}
+    listed: dict[int, date] = {}
+    for asset_id, _, ranges, _ in chunk:
+        first = first_seen.get(asset_id)
+        if first is None:
+            continue
+        for g in ranges:
+            if g in filled[asset_id]:
+                continue
+            if g[0] == win_start and g[1] < first:
+                listed[asset_id] = first
+            else:
+                empty.setdefault(asset_id, []).append(g)
+    return n, [asset_id for asset_id, _, _, _ in chunk], empty, listed
 
 
 @app.task(name='tasks.backfill.backfill_price_history', bind=True)
 def backfill_price_history(self):
     """
-    Backfill 5 years of daily price history for all active assets.
-    Upserts on conflict — safe to re-run. Scheduled monthly on the 2nd at 1am.
+    Fill missing daily price history (last 5 years) for all active stocks, crypto
+    and FX. Only gap ranges are fetched, one chunk at a time; progress is
+    checkpointed in Redis. Scheduled monthly on the 2nd at 1am.
+    Returns rows upserted per asset type plus before/after coverage stats.
     """
+    try:
+        redis_client = get_redis()
+        redis_client.ping()
+    except Exception:
+        redis_client = None
+
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=365 * HISTORY_YEARS)
+
     db = SessionLocal()
     try:
         all_assets = db.execute(select(Asset).where(Asset.is_active == True)).scalars().all()
-        stocks = [a for a in all_assets if a.asset_type == AssetType.stock]
-        crypto = [a for a in all_assets if a.asset_type == AssetType.crypto]
-        fx     = [a for a in all_assets if a.asset_type == AssetType.fx]
+        assets = [a for a in all_assets if a.asset_type in MAX_NORMAL_GAP_DAYS and _yf_symbol(a)]
 
-        log.info(f'Backfill starting: {len(stocks)} stocks, {len(crypto)} crypto, {len(fx)} FX')
+        done: set[int] = set()
+        if redis_client:
+            done = {int(x) for x in redis_client.smembers(_DONE_KEY)}
 
-        s = _backfill_stocks(db, stocks)
-        c = _backfill_crypto(db, crypto)
-        f = _backfill_fx(db, fx)
+        coverage_before = _coverage_stats(db, assets, start, today)
+        gaps = _find_gaps(db, [a for a in assets if a.id not in done], start, today)
+        skipped = _drop_known_empty(redis_client, gaps)
+    finally:
+        db.close()
 
-        log.info(f'Backfill complete — stocks: {s}, crypto: {c}, FX: {f}')
-        return {'stocks': s, 'crypto': c, 'fx': f}
+    by_id = {a.id: a for a in assets}
+    n_ranges = sum(len(g) for g in gaps.values())
+    log.info(f'Backfill starting: {len(gaps)} assets with {n_ranges} gap ranges '
+             f'({len(done)} already done via checkpoint, {skipped} known-empty ranges skipped)')
+
+    # Chunk per asset type (volume handling differs) with similar windows together
+    # so each yf.download spans as little extra history as possible.
+    chunks: list[tuple[AssetType, list]] = []
+    by_type: dict[AssetType, list] = defaultdict(list)
+    for asset_id, ranges in gaps.items():
+        a = by_id[asset_id]
+        by_type[a.asset_type].append((asset_id, _yf_symbol(a), ranges, a.asset_type != AssetType.fx))
+    for asset_type, items in by_type.items():
+        items.sort(key=lambda it: (min(lo for lo, _ in it[2]), max(hi for _, hi in it[2])))
+        for i in range(0, len(items), CHUNK_SIZE):
+            chunks.append((asset_type, items[i:i + CHUNK_SIZE]))
+
+    totals: dict[str, int] = defaultdict(int)
+    errors = 0
+    for i, (asset_type, chunk) in enumerate(chunks):
+        if i:
+            time.sleep(CHUNK_PAUSE)
+        try:
+            n, asset_ids, empty, listed = _fetch_chunk(chunk)
+        except Exception:
+            errors += 1
+            log.exception(f'{asset_type.value} backfill chunk failed')
+            continue
+        totals[asset_type.value] += n
+        if redis_client:
+            pipe = redis_client.pipeline()
+            pipe.sadd(_DONE_KEY, *asset_ids)
+            pipe.expire(_DONE_KEY, _DONE_TTL)
+            for asset_id, first in listed.items():
+                pipe.set(f'{_NODATA_PREFIX}{asset_id}:listed', first.isoformat(), ex=_LISTED_TTL)
+            for asset_id, ranges in empty.items():
+                key = f'{_NODATA_PREFIX}{asset_id}:ranges'
+                pipe.sadd(key, *(f'{lo}:{hi}' for lo, hi in ranges))
+                pipe.expire(key, _NODATA_TTL)
+            pipe.execute()
+        log.info(f'{asset_type.value} backfill chunk: {n} rows')
+
+    if redis_client and not errors:
+        redis_client.delete(_DONE_KEY)
 
-    except Exception as exc:
-        db.rollback()
-        log.exception('Price history backfill failed')
-        raise
+    db = SessionLocal()
+    try:
+        coverage_after = _coverage_stats(db, assets, start, today)
     finally:
         db.close()
+
+    for asset_type, after in coverage_after.items():
+        before = coverage_before.get(asset_type, {})
+        log.info(f'Backfill coverage {asset_type}: {before.get("coverage_pct")}% → '
+                 f'{after["coverage_pct"]}% ({after["assets_complete"]}/{after["assets"]} complete)')
+    log.info(f'Backfill complete — rows: {dict(totals)}, chunk errors: {errors}')
+    return {
+        'rows': dict(totals),
+        'gap_ranges': n_ranges,
+        'chunk_errors': errors,
+        'coverage_before': coverage_before,
+        'coverage_after': coverage_after,
+    }
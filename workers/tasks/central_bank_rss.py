@@ -184,9 +184,17 @@ def fetch_central_bank_news(self):
                 "event_data": event_data,
             })
 
-        # Upsert on source_url — skip already-stored items
+        # Skip already-stored items. The unique key is (source_url, published_at)
+        # since feed_events is partitioned, so items without a pubDate (stamped
+        # with now()) are filtered by source_url up front as well.
+        known = set(db.execute(
+            select(FeedEvent.source_url).where(FeedEvent.source_url.in_([r["source_url"] for r in rows]))
+        ).scalars())
+        rows = list({r["source_url"]: r for r in rows if r["source_url"] not in known}.values())
+        if not rows:
+            return "ok: no new items"
         stmt = pg_insert(FeedEvent).values(rows)
-        stmt = stmt.on_conflict_do_nothing(index_elements=["source_url"])
+        stmt = stmt.on_conflict_do_nothing(index_elements=["source_url", "published_at"])
         result = db.execute(stmt)
         db.commit()
 
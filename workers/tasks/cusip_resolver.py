@@ -0,0 +1,215 @@
+"""
+In-memory CUSIP / issuer-name → ticker resolver for 13F holdings.
+
+Built once per parse_holdings run (two SELECTs), then every lookup is a dict hit:
+
+  1. CUSIP map   — smart_money_cusip_map, persisted across runs
+  2. Exact name  — normalized issuer name ("APPLE INC" / "Apple Inc." → "apple")
+  3. Fuzzy name  — token match against an inverted index of 4-char token stems,
+                   IDF-weighted overlap with prefix tolerance ("BANK AMER CORP"
+                   → "Bank of America Corporation"), accepted at >= FUZZY_MIN_SCORE
+
+Every name match is remembered against its CUSIP and written back by flush(),
+so the next quarter resolves the same security by CUSIP directly.
+report() returns per-method counts and value-weighted coverage for the run.
+"""
+
+import logging
+import math
+import re
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.asset import Asset, AssetType
+from app.models.smart_money import SmartMoneyCusipMap
+
+log = logging.getLogger(__name__)
+
+FUZZY_MIN_SCORE = 0.6
+_STEM_LEN = 4
+
+# Legal-form, share-class and filing boilerplate — carries no identity
+_STOPWORDS = {
+    "the", "of", "and", "inc", "incorporated", "corp", "corporation", "co", "company",
+    "ltd", "limited", "plc", "llc", "lp", "sa", "nv", "ag", "se", "spa", "asa", "ab",
+    "oyj", "bhd", "tbk", "holding", "holdings", "hldgs", "group", "grp",
+    "cl", "class", "a", "b", "c", "com", "common", "stk", "stock", "shs", "shares",
+    "ord", "ordinary", "new", "del", "cap", "sponsored", "spon", "ads", "adr", "ny",
+    "registered", "reg", "par", "usd", "unit", "units",
+}
+
+# 13F issuer names are truncated/abbreviated by filers
+_ABBREVIATIONS = {
+    "mfg": "manufacturing", "intl": "international", "int": "international",
+    "svcs": "services", "svc": "services", "sys": "systems", "tech": "technologies",
+    "techs": "technologies", "technology": "technologies", "pharma": "pharmaceuticals",
+    "pharmaceutical": "pharmaceuticals", "finl": "financial", "fin": "financial",
+    "natl": "national", "bancorporation": "bancorp", "hlth": "health",
+    "ins": "insurance", "inds": "industries", "ind": "industries", "entmt": "entertainment",
+    "commun": "communications", "communication": "communications", "amer": "america",
+    "ctls": "controls", "elec": "electric", "labs": "laboratories", "lab": "laboratories",
+    "semicondtr": "semiconductor", "semiconductors": "semiconductor", "pete": "petroleum",
+}
+
+_PUNCT_RE = re.compile(r"[^a-z0-9& ]+")
+
+
+def normalize_tokens(name: str) -> tuple[str, ...]:
+    """'TAIWAN SEMICONDUCTOR MFG LTD SPONSORED ADS' → ('taiwan', 'semiconductor', 'manufacturing')."""
+    text = _PUNCT_RE.sub(" ", (name or "").lower().replace(".", ""))
+    tokens = []
+    for tok in text.split():
+        tok = _ABBREVIATIONS.get(tok, tok)
+        if tok and tok not in _STOPWORDS:
+            tokens.append(tok)
+    return tuple(tokens)
+
+
+def _tokens_match(a: str, b: str) -> bool:
+    """Equal, or one is a >=3-char prefix of the other (filer truncation)."""
+    if a == b:
+        return True
+    short, long_ = (a, b) if len(a) < len(b) else (b, a)
+    return len(short) >= 3 and long_.startswith(short)
+
+
+class SymbolResolver:
+    """Per-run resolver. Construct with SymbolResolver.load(db)."""
+
+    def __init__(self, cusip_map: dict[str, str], assets: list[tuple[int, str, str]]):
+        self._cusip_map = cusip_map                         # cusip → symbol
+        self._exact: dict[str, tuple[int, str]] = {}        # normalized name → (asset_id, symbol)
+        self._asset_tokens: list[tuple[int, str, tuple[str, ...]]] = []
+        self._stem_index: dict[str, set[int]] = defaultdict(set)
+        self._idf: dict[str, float] = {}
+
+        df: dict[str, int] = defaultdict(int)
+        for asset_id, symbol, name in assets:
+            tokens = normalize_tokens(name)
+            if not tokens:
+                continue
+            # First-seen wins — assets arrive ordered by market cap, so the
+            # primary listing beats secondary share classes / cross-listings
+            self._exact.setdefault(" ".join(tokens), (asset_id, symbol))
+            idx = len(self._asset_tokens)
+            self._asset_tokens.append((asset_id, symbol, tokens))
+            for tok in set(tokens):
+                df[tok] += 1
+                self._stem_index[tok[:_STEM_LEN]].add(idx)
+        n = max(len(self._asset_tokens), 1)
+        self._idf = {tok: math.log(1 + n / cnt) for tok, cnt in df.items()}
+        self._max_idf = math.log(1 + n)
+
+        self._misses: set[str] = set()                      # normalized names with no match
+        self._new: dict[str, dict] = {}                     # cusip → row for flush()
+        self._stats = {"cusip": 0, "exact": 0, "fuzzy": 0, "unresolved": 0}
+        self._value = {"resolved": 0.0, "total": 0.0}
+        self._unresolved: dict[str, float] = defaultdict(float)
+
+    @classmethod
+    def load(cls, db) -> "SymbolResolver":
+        cusip_map = dict(db.execute(
+            select(SmartMoneyCusipMap.cusip, SmartMoneyCusipMap.symbol)
+        ).all())
+        assets = db.execute(
+            select(Asset.id, Asset.symbol, Asset.name)
+            .where(Asset.asset_type == AssetType.stock)
+            .where(Asset.is_active == True)
+            .order_by(Asset.market_cap_usd.desc().nullslast())
+        ).all()
+        resolver = cls(cusip_map, [tuple(a) for a in assets])
+        log.info("SymbolResolver: %d CUSIPs, %d stock names indexed",
+                 len(cusip_map), len(resolver._asset_tokens))
+        return resolver
+
+    def _idf_of(self, tok: str) -> float:
+        return self._idf.get(tok, self._max_idf)
+
+    def _fuzzy(self, tokens: tuple[str, ...]) -> Optional[tuple[int, str, float]]:
+        candidates: set[int] = set()
+        for tok in tokens:
+            candidates |= self._stem_index.get(tok[:_STEM_LEN], set())
+        if not candidates:
+            return None
+
+        best: Optional[tuple[int, str, float]] = None
+        for idx in candidates:
+            asset_id, symbol, a_tokens = self._asset_tokens[idx]
+            matched_q = [q for q in tokens if any(_tokens_match(q, a) for a in a_tokens)]
+            if not matched_q or not _tokens_match(tokens[0], a_tokens[0]):
+                continue  # leading token carries the brand — must agree
+            matched_a = [a for a in a_tokens if any(_tokens_match(q, a) for q in tokens)]
+            overlap = sum(self._idf_of(t) for t in matched_q) + sum(self._idf_of(t) for t in matched_a)
+            total = sum(self._idf_of(t) for t in tokens) + sum(self._idf_of(t) for t in a_tokens)
+            score = overlap / total if total else 0.0
+            if best is None or score > best[2]:
+                best = (asset_id, symbol, score)
+        if best and best[2] >= FUZZY_MIN_SCORE:
+            return best
+        return None
+
+    def resolve(self, company_name: str, cusip: str, value_usd: float = 0.0) -> Optional[str]:
+        """Return ticker for a holding, or None. Records stats for report()."""
+        cusip = (cusip or "").strip().upper()
+        self._value["total"] += value_usd or 0.0
+
+        symbol = self._cusip_map.get(cusip) if cusip else None
+        method = "cusip" if symbol else None
+        asset_id = None
+        confidence = 1.0
+
+        if symbol is None:
+            tokens = normalize_tokens(company_name)
+            key = " ".join(tokens)
+            if tokens and key not in self._misses:
+                hit = self._exact.get(key)
+                if hit:
+                    asset_id, symbol = hit
+                    method = "exact"
+                else:
+                    fuzzy = self._fuzzy(tokens)
+                    if fuzzy:
+                        asset_id, symbol, confidence = fuzzy
+                        method = "fuzzy"
+                    else:
+                        self._misses.add(key)
+
+        if symbol is None:
+            self._stats["unresolved"] += 1
+            self._unresolved[company_name or cusip] += value_usd or 0.0
+            return None
+
+        self._stats[method] += 1
+        self._value["resolved"] += value_usd or 0.0
+        if method != "cusip" and cusip:
+            self._cusip_map[cusip] = symbol
+            self._new[cusip] = {
+                "cusip": cusip, "symbol": symbol, "asset_id": asset_id,
+                "issuer_name": (company_name or "")[:300],
+                "match_method": method, "confidence": round(confidence, 3),
+            }
+        return symbol
+
+    def flush(self, db) -> int:
+        """Persist CUSIPs learned this run. Existing rows (incl. manual) are kept."""
+        if not self._new:
+            return 0
+        rows = list(self._new.values())
+        db.execute(pg_insert(SmartMoneyCusipMap).values(rows).on_conflict_do_nothing())
+        self._new.clear()
+        return len(rows)
+
+    def report(self, top_unresolved: int = 10) -> dict:
+        total = sum(self._stats.values())
+        worst = sorted(self._unresolved.items(), key=lambda kv: -kv[1])[:top_unresolved]
+        return {
+            **self._stats,
+            "holdings": total,
+            "resolved_pct": round((total - self._stats["unresolved"]) / total * 100, 1) if total else None,
+            "value_resolved_pct": round(self._value["resolved"] / self._value["total"] * 100, 1)
+                                  if self._value["total"] else None,
+            "top_unresolved": [{"name": name, "value_usd": round(v)} for name, v in worst],
+        }
@@ -0,0 +1,266 @@
+"""
+Shared SEC EDGAR HTTP client — used by edgar_revenue and smart_money.
+
+Three pieces:
+
+1. Pooled session — one requests.Session per process with keep-alive and
+   urllib3 retries on 429/5xx, instead of a fresh TCP+TLS handshake per call.
+
+2. Global rate limiter — Redis token bucket shared by every worker process
+   (key `worker:edgar:ratelimit`). SEC fair-use is 10 req/sec per host; we run
+   at EDGAR_RATE_LIMIT (default 8/sec) so concurrent tasks never trip a 403 block.
+   Falls back to an in-process bucket if Redis is unreachable.
+
+3. On-disk cache — responses for /Archives/edgar/data/{cik}/{accession}/... are
+   immutable once a filing is accepted, so they are stored under EDGAR_CACHE_DIR
+   keyed by sha256(url) and never re-downloaded. Cache hits skip the rate limiter.
+   Submissions JSON and company_tickers.json change daily and are never cached.
+
+Usage:
+    from tasks.edgar_client import edgar_get
+    r = edgar_get(url)          # EdgarResponse or None (404 / network error)
+    r.text, r.json(), r.content
+
+    f = edgar_open(url)         # binary file object for streaming parsers (large 13F XML)
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.storage import get_redis
+
+log = logging.getLogger(__name__)
+
+HEADERS = {"User-Agent": "MetricsHour info@metricshour.com", "Accept-Encoding": "gzip, deflate"}
+
+RATE_LIMIT  = float(os.environ.get("EDGAR_RATE_LIMIT", "8"))   # req/sec across all workers
+RATE_BURST  = 4                                                # max tokens banked while idle
+CACHE_DIR   = os.environ.get("EDGAR_CACHE_DIR", "/root/metricshour/cache/edgar")
+
+_BUCKET_KEY = "worker:edgar:ratelimit"
+
+# Accession-scoped archive paths: /Archives/edgar/data/<cik>/<18-digit accession>/...
+_IMMUTABLE_RE = re.compile(r"^https://www\.sec\.gov/Archives/edgar/data/\d+/\d{18}/", re.I)
+
+# Reservation-style token bucket: always takes a token (tokens may go negative),
+# returns how long the caller must sleep before its slot comes up. One round trip,
+# no retry loop, strict FIFO across processes.
+_BUCKET_LUA = """
+local rate  = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now   = tonumber(ARGV[3])
+local data  = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts     = tonumber(data[2]) or now
+if now > ts then
+  tokens = math.min(burst, tokens + (now - ts) * rate)
+  ts = now
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('EXPIRE', KEYS[1], 60)
+if tokens >= 0 then
+  return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class EdgarResponse:
+    """Minimal response wrapper — same shape whether served from network or disk."""
+
+    __slots__ = ("url", "status_code", "content", "from_cache")
+
+    def __init__(self, url: str, status_code: int, content: bytes, from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# ── Pooled session ────────────────────────────────────────────────────────────
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                s.headers.update(HEADERS)
+                retry = Retry(total=3, backoff_factor=1.0,
+                              status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=("GET",), respect_retry_after_header=True)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+# ── Rate limiter ──────────────────────────────────────────────────────────────
+
+_bucket_script = None
+_local_lock = threading.Lock()
+_local_tokens = float(RATE_BURST)
+_local_ts = time.monotonic()
+
+
+def _local_acquire() -> float:
+    """In-process fallback bucket — same semantics as the Redis script."""
+    global _local_tokens, _local_ts
+    with _local_lock:
+        now = time.monotonic()
+        _local_tokens = min(RATE_BURST, _local_tokens + (now - _local_ts) * RATE_LIMIT)
+        _local_ts = now
+        _local_tokens -= 1
+        return 0.0 if _local_tokens >= 0 else -_local_tokens / RATE_LIMIT
+
+
+def _acquire() -> None:
+    """Block until this process may send one request to SEC."""
+    global _bucket_script
+    try:
+        if _bucket_script is None:
+            _bucket_script = get_redis().register_script(_BUCKET_LUA)
+        wait = float(_bucket_script(keys=[_BUCKET_KEY], args=[RATE_LIMIT, RATE_BURST, time.time()]))
+    except Exception as e:
+        log.debug("EDGAR Redis rate limiter unavailable, using local bucket: %s", e)
+        wait = _local_acquire()
+    if wait > 0:
+        time.sleep(wait)
+
+
+# ── Disk cache ────────────────────────────────────────────────────────────────
+
+def is_immutable(url: str) -> bool:
+    """True for accession-scoped archive URLs whose content never changes."""
+    return bool(_IMMUTABLE_RE.match(url))
+
+
+def _cache_path(url: str) -> str:
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], digest[2:4], digest + ".gz")
+
+
+def _cache_read(url: str) -> Optional[bytes]:
+    path = _cache_path(url)
+    try:
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.debug("EDGAR cache read failed %s: %s", path, e)
+        return None
+
+
+def _cache_write(url: str, content: bytes) -> None:
+    """Atomic write (tmp file + rename) so concurrent workers never see partial files."""
+    _cache_write_chunks(url, (content,))
+
+
+def _cache_write_chunks(url: str, chunks) -> bool:
+    """Stream chunks into the cache file atomically. Returns False if nothing was stored."""
+    path = _cache_path(url)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        log.debug("EDGAR cache write failed %s: %s", path, e)
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+        return False
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def edgar_get(url: str, timeout: int = 20, use_cache: bool = True) -> Optional[EdgarResponse]:
+    """
+    GET an SEC URL through the shared limiter and cache.
+    Returns None on 404 or any network/HTTP error (logged at debug), matching the
+    old per-module _get helpers.
+    """
+    cacheable = use_cache and is_immutable(url)
+    if cacheable:
+        cached = _cache_read(url)
+        if cached is not None:
+            return EdgarResponse(url, 200, cached, from_cache=True)
+
+    _acquire()
+    try:
+        r = _get_session().get(url, timeout=timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+    except Exception as e:
+        log.debug("GET %s failed: %s", url, e)
+        return None
+
+    if cacheable:
+        _cache_write(url, r.content)
+    return EdgarResponse(url, r.status_code, r.content)
+
+
+def edgar_open(url: str, timeout: int = 60) -> Optional[BinaryIO]:
+    """
+    Open an SEC document as a binary stream for incremental parsers.
+
+    Immutable archive URLs are streamed from the network straight into the disk
+    cache (64 KB chunks) and then read back through gzip, so the full document is
+    never held in memory. Mutable URLs — or an unwritable cache — fall back to an
+    in-memory buffer. Caller closes the returned file. None on 404/error.
+    """
+    if not is_immutable(url):
+        r = edgar_get(url, timeout=timeout)
+        return io.BytesIO(r.content) if r is not None else None
+
+    path = _cache_path(url)
+    if not os.path.exists(path):
+        _acquire()
+        try:
+            with _get_session().get(url, timeout=timeout, stream=True) as r:
+                if r.status_code == 404:
+                    return None
+                r.raise_for_status()
+                stored = _cache_write_chunks(url, r.iter_content(chunk_size=65536))
+        except Exception as e:
+            log.debug("GET %s failed: %s", url, e)
+            return None
+        if not stored:
+            r = edgar_get(url, timeout=timeout, use_cache=False)
+            return io.BytesIO(r.content) if r is not None else None
+
+    try:
+        return gzip.open(path, "rb")
+    except OSError as e:
+        log.debug("EDGAR cache open failed %s: %s", path, e)
+        return None
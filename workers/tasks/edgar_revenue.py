@@ -4,12 +4,14 @@ Live EDGAR geographic revenue fetcher — R-file parser approach.
 For each stock missing stock_country_revenues data:
   1. Lookup CIK via SEC company_tickers.json
   2. Find latest 10-K accession from submissions API
-  3. Scan R-files (XBRL viewer) to find the geographic segment note
+  3. Read FilingSummary.xml, pick segment/geographic note R-files by title,
+     fetch only those (concurrently) to find the geographic segment note
   4. Parse revenue by geography from the HTML table text
   5. Map segment names → ISO country codes + regional splits
   6. Upsert into stock_country_revenues
 
-Rate limit: ~5 req/sec (SEC fair-use: 10 req/sec max).
+Rate limit: shared EDGAR client (tasks.edgar_client) — Redis token bucket across
+all workers, archive R-files served from the on-disk cache on repeat runs.
 Runs: weekly Sunday 02:00 UTC via Celery beat. Also runnable directly.
 """
 
@@ -17,10 +19,11 @@ import json
 import logging
 import re
 import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import psutil
-import requests
 from bs4 import BeautifulSoup
 from celery.exceptions import SoftTimeLimitExceeded
 from sqlalchemy import select
@@ -29,15 +32,36 @@ from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.database import SessionLocal
 from app.models.asset import Asset, AssetType, StockCountryRevenue
 from app.models.country import Country
+from app.services.screener import refresh_revenue_pivot
 from app.storage import get_redis
 from celery_app import app
+from tasks.edgar_client import EdgarResponse, edgar_get
 
 log = logging.getLogger(__name__)
 
-HEADERS = {"User-Agent": "MetricsHour info@metricshour.com", "Accept-Encoding": "gzip, deflate"}
 SEC_TICKERS_URL  = "https://www.sec.gov/files/company_tickers.json"
 SEC_SUBMISSIONS  = "https://data.sec.gov/submissions/CIK{cik}.json"
 SEC_R_FILE       = "https://www.sec.gov/Archives/edgar/data/{cik}/{accn}/R{n}.htm"
+SEC_FILING_SUMMARY = "https://www.sec.gov/Archives/edgar/data/{cik}/{accn}/FilingSummary.xml"
+SEC_ARCHIVE_FILE = "https://www.sec.gov/Archives/edgar/data/{cik}/{accn}/{name}"
+
+# FilingSummary report titles → relevance weight. Geographic detail tables rank
+# highest; generic segment/revenue notes are fallbacks within the same filing.
+_REPORT_TITLE_WEIGHTS: list[tuple[re.Pattern, int]] = [
+    (re.compile(r"geograph", re.I),                              10),
+    (re.compile(r"by\s+(region|country|area)|regional", re.I),   8),
+    (re.compile(r"segment", re.I),                               5),
+    (re.compile(r"disaggregat", re.I),                           4),
+    (re.compile(r"revenue|net\s+sales", re.I),                   2),
+]
+# Balance-sheet style geo notes — long-lived assets etc. never carry revenue splits
+_REPORT_TITLE_EXCLUDE = re.compile(
+    r"long.?lived|property|plant|equipment|goodwill|intangible|lease|tax", re.I)
+# Menu categories: numeric detail/tables beat narrative notes/policies
+_REPORT_CATEGORY_BONUS = {"details": 3, "tables": 2, "notes": 1}
+_MAX_CANDIDATE_REPORTS = 8
+_FETCH_WORKERS         = 4     # concurrent R-file fetches (shared rate limiter still applies)
+_FALLBACK_MAX_R        = 60    # sequential probe ceiling when FilingSummary.xml is missing
 
 # Keywords that indicate a geographic segment note
 GEO_KEYWORDS = [
@@ -165,16 +189,9 @@ REGION_SPLITS: dict[str, list[tuple[str, float]]] = {
 
 # ── HTTP helpers ──────────────────────────────────────────────────────────────
 
-def _get(url: str, timeout: int = 20) -> Optional[requests.Response]:
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout)
-        if r.status_code == 404:
-            return None
-        r.raise_for_status()
-        return r
-    except Exception as e:
-        log.debug("GET %s failed: %s", url, e)
-        return None
+def _get(url: str, timeout: int = 20) -> Optional[EdgarResponse]:
+    """Rate-limited, disk-cached GET via the shared EDGAR client. None on 404/error."""
+    return edgar_get(url, timeout=timeout)
 
 
 # ── CIK + accession lookup ────────────────────────────────────────────────────
@@ -243,27 +260,87 @@ _REVENUE_RE = re.compile(
 )
 
 
-def _find_geo_r_file(cik: str, accn: str, max_r: int = 200) -> Optional[str]:
+def _candidate_reports(cik: str, accn: str) -> Optional[list[str]]:
     """
-    Scan R1..R{max_r}.htm.  Two passes:
-    1. Return the first R-file that has geo segments AND revenue keywords
-       (net revenues / net sales) — avoids earnings/inventory geo tables.
-    2. If no revenue-keyword file found, return the first valid geo file.
+    Rank the filing's XBRL viewer reports by title using FilingSummary.xml.
+    Returns R-file names (best first), [] if the index has no plausible report,
+    or None if the index itself is unavailable (older filings).
+    """
+    r = _get(SEC_FILING_SUMMARY.format(cik=cik, accn=accn), timeout=15)
+    if r is None:
+        return None
+    try:
+        root = ET.fromstring(r.content)
+    except ET.ParseError as e:
+        log.debug("FilingSummary parse error %s/%s: %s", cik, accn, e)
+        return None
+
+    scored: list[tuple[int, int, str]] = []
+    for pos, report in enumerate(root.iter("Report")):
+        fname = (report.findtext("HtmlFileName") or "").strip()
+        if not fname:
+            continue
+        title = " ".join(filter(None, (report.findtext("LongName"),
+                                       report.findtext("ShortName"))))
+        if _REPORT_TITLE_EXCLUDE.search(title):
+            continue
+        score = sum(w for pat, w in _REPORT_TITLE_WEIGHTS if pat.search(title))
+        if not score:
+            continue
+        category = (report.findtext("MenuCategory") or "").strip().lower()
+        score += _REPORT_CATEGORY_BONUS.get(category, 0)
+        scored.append((-score, pos, fname))
+
+    scored.sort()
+    return [fname for _, _, fname in scored[:_MAX_CANDIDATE_REPORTS]]
+
+
+def _is_geo_revenue_html(html: str) -> bool:
+    """True if the R-file holds a geo table that _parse_geo_table can actually parse."""
+    if not _r_file_has_geo(html):
+        return False
+    table = _find_geo_table(html)
+    return bool(table) and _parse_geo_table(table) is not None
+
+
+def _fetch_geo_html(url: str) -> Optional[str]:
+    """Fetch one R-file; return its HTML only if it holds a parseable geo revenue table."""
+    r = _get(url, timeout=15)
+    if r is None:
+        return None
+    return r.text if _is_geo_revenue_html(r.text) else None
+
+
+def _find_geo_r_file(cik: str, accn: str) -> Optional[str]:
+    """
+    Locate the geographic segment R-file for a filing.
+
+    Candidates come from FilingSummary.xml (ranked by report title) and are
+    fetched concurrently — typically 1 index + a handful of R-files instead of
+    probing R1..R200. Among valid geo files, prefer one that explicitly mentions
+    net revenues / net sales (avoids earnings/inventory geo tables); otherwise
+    return the best-ranked valid file.
+
+    Filings without a FilingSummary fall back to a bounded sequential probe.
     """
     base_cik = str(int(cik))
-    candidates: list[str] = []          # all valid geo R-file htmls
-    for n in range(1, max_r + 1):
-        url = SEC_R_FILE.format(cik=base_cik, accn=accn, n=n)
-        r = _get(url, timeout=15)
-        if r is None:
-            break
-        if _r_file_has_geo(r.text):
-            table = _find_geo_table(r.text)
-            if table and _parse_geo_table(table) is not None:
+    reports = _candidate_reports(base_cik, accn)
+
+    if reports is None:
+        candidates: list[str] = []
+        for n in range(1, _FALLBACK_MAX_R + 1):
+            url = SEC_R_FILE.format(cik=base_cik, accn=accn, n=n)
+            r = _get(url, timeout=15)
+            if r is None:
+                break
+            if _is_geo_revenue_html(r.text):
                 candidates.append(r.text)
-        time.sleep(0.1)
+    else:
+        urls = [SEC_ARCHIVE_FILE.format(cik=base_cik, accn=accn, name=name) for name in reports]
+        with ThreadPoolExecutor(max_workers=_FETCH_WORKERS) as pool:
+            # map() keeps title-rank order regardless of completion order
+            candidates = [html for html in pool.map(_fetch_geo_html, urls) if html]
 
-    # Prefer a file that explicitly mentions net revenues / net sales
     for html in candidates:
         if _REVENUE_RE.search(html):
             return html
@@ -530,7 +607,6 @@ def _build_result(pairs, total_rev: float, fiscal_year: int) -> Optional[dict]:
 def _fetch_geo_revenue(cik: str, ticker: str) -> Optional[dict]:
     """Return parsed geographic revenue dict or None."""
     result = _latest_10k_accession(cik)
-    time.sleep(0.2)
     if not result:
         return None
     accn, _ = result
@@ -628,7 +704,6 @@ def fetch_edgar_revenue(self, force_all: bool = False):
         log.info("EDGAR: %d stocks to process (%d already done via checkpoint)",
                  len(stocks), len(done_symbols))
         cik_map = _fetch_cik_map()
-        time.sleep(0.3)
 
         success = skipped = errors = 0
         completed: list[str] = list(done_symbols)
@@ -673,12 +748,16 @@ def fetch_edgar_revenue(self, force_all: bool = False):
 
         if redis_client:
             redis_client.delete(_CHECKPOINT_KEY)
+        if success:
+            refresh_revenue_pivot(db)
         log.info("EDGAR done: success=%d skipped=%d errors=%d", success, skipped, errors)
         return {"processed": len(stocks), "success": success, "skipped": skipped, "errors": errors}
 
     except SoftTimeLimitExceeded:
         if redis_client:
             redis_client.setex(_CHECKPOINT_KEY, _CHECKPOINT_TTL, json.dumps(completed))
+        if success:
+            refresh_revenue_pivot(db)  # publish what this run upserted before the retry
         log.warning("EDGAR soft time limit — checkpoint saved (%d done), retrying in 5min", len(completed))
         raise self.retry(countdown=300, max_retries=self.max_retries)
     except Exception as exc:
@@ -709,4 +788,3 @@ if __name__ == "__main__":
                 print(f"    {iso}: {pct:.1f}%")
         else:
             print("  No geographic revenue data found")
-        time.sleep(0.3)
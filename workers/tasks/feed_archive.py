@@ -0,0 +1,42 @@
+"""
+feed_events retention worker.
+
+maintain_feed_events — daily: create upcoming monthly partitions, archive
+                       partitions past retention to R2 and drop them, and
+                       prune user_interactions left behind by deleted events
+
+See app.services.feed_archive for the partition layout and archive format.
+"""
+import logging
+
+from celery_app import app
+from app.database import SessionLocal
+from app.services.feed_archive import (
+    FEED_EVENT_RETENTION_DAYS,
+    archive_old_partitions,
+    ensure_partitions,
+    prune_orphan_interactions,
+)
+
+log = logging.getLogger(__name__)
+
+
+@app.task(name='tasks.feed_archive.maintain_feed_events', ignore_result=True)
+def maintain_feed_events():
+    db = SessionLocal()
+    try:
+        created = ensure_partitions(db)
+        db.commit()
+        archived = archive_old_partitions(db)
+        pruned = prune_orphan_interactions(db)
+        log.info(
+            "maintain_feed_events: %d partitions created, %d archived (>%d days), %d orphan interactions pruned",
+            len(created), len(archived), FEED_EVENT_RETENTION_DAYS, pruned,
+        )
+        return {"created": created, "archived": archived, "pruned": pruned}
+    except Exception as exc:
+        db.rollback()
+        log.error("maintain_feed_events: failed — %s", exc, exc_info=True)
+        raise
+    finally:
+        db.close()
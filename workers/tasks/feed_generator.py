@@ -11,19 +11,33 @@ Events generated:
 importance_score logic:
   price_move:    floor(abs(change_pct)) capped at 10  (e.g. 5.2% → 5, 11% → 10)
   macro_release: based on indicator tier (see INDICATOR_IMPORTANCE below)
+
+AI enrichment is asynchronous: events are inserted with the template body and
+enrichment_status='pending', then enrich_feed_event runs on the dedicated
+`enrichment` queue and rewrites body in place. A slow LLM never delays detection.
 """
 
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import select, text
+from sqlalchemy import select, text, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from celery_app import app
 from app.database import SessionLocal
-from app.models.asset import Asset, AssetType, Price
+from app.models.asset import AssetType
 from app.models.country import CountryIndicator
 from app.models.feed import FeedEvent
+from app.services.feed_ranker import (
+    ANON_RANKINGS_PREFIX,
+    ANON_SNAPSHOT_KEY,
+    ANON_SNAPSHOT_TTL,
+    CURSOR_SNAPSHOT_TTL,
+    build_anonymous_snapshot,
+    seen_anonymous_geos,
+)
+from app.storage import redis_json_set
 from tasks.summaries import _call_ai
 
 log = logging.getLogger(__name__)
@@ -52,6 +66,14 @@ INDICATOR_IMPORTANCE: dict[str, float] = {
 }
 DEFAULT_INDICATOR_IMPORTANCE = 3.0
 
+# AI enrichment cut-offs — below these the template body is final
+AI_PRICE_MOVE_MIN_PCT = 2.0
+AI_MACRO_MIN_IMPORTANCE = 7.0
+
+# Pending rows older than this were lost by the broker (acks_late=False) — re-queue
+ENRICHMENT_STALE_MINUTES = 10
+ENRICHMENT_MAX_AGE_HOURS = 6
+
 # Price-move thresholds by asset type — lower = more events
 PRICE_MOVE_THRESHOLD: dict[str, float] = {
     "crypto":    0.8,   # crypto: 0.8% triggers a card (active 24/7 market)
@@ -80,10 +102,16 @@ PRICE_MOVE_MAX_PCT: dict[str, float] = {
 def generate_feed_events(self):
     db = SessionLocal()
     try:
-        triggered = _generate_price_moves(db)
-        triggered += _generate_macro_releases(db)
+        to_enrich: list[int] = []
+        triggered = _generate_price_moves(db, to_enrich)
+        triggered += _generate_macro_releases(db, to_enrich)
         db.commit()
-        log.info("feed_generator: completed — %d events triggered summary refreshes", len(triggered))
+        log.info("feed_generator: completed — %d events triggered summary refreshes, %d queued for AI",
+                 len(triggered), len(to_enrich))
+        # Queue only after commit so the enrichment worker can see the rows
+        for event_id in to_enrich:
+            enrich_feed_event.delay(event_id)
+        materialize_anonymous_feeds.delay()
         # Async summary refresh for significant events (importance >= 7)
         for entity_type, entity_code in triggered:
             from tasks.summaries import refresh_entity_summary
@@ -127,125 +155,277 @@ def _ai_macro_body(country_name: str, indicator_label: str, value_str: str,
     return _call_ai(prompt, min_words=28, max_words=55, prefer_gemini=(importance >= 8))
 
 
-# ── Price move events ─────────────────────────────────────────────────────────
+def _ai_body_for(event: FeedEvent) -> str | None:
+    """Rebuild the AI prompt inputs from the event's own event_data."""
+    data = event.event_data or {}
+    if event.event_type == "price_move":
+        return _ai_price_body(
+            data.get("name") or data.get("symbol", ""), data.get("symbol", ""),
+            float(data["change_pct"]), float(data["price"]),
+            data.get("currency") or "", event.event_subtype or "",
+        )
+    if event.event_type == "macro_release":
+        indicator = data.get("indicator", "")
+        period = datetime.fromisoformat(data["period"]).strftime("%B %Y")
+        return _ai_macro_body(
+            data.get("country_name") or data.get("country_code", ""),
+            indicator.replace("_", " ").title(), f"{float(data['value']):,.2f}",
+            period, data.get("source") or "", event.importance_score or 0.0,
+        )
+    return None
+
 
-def _generate_price_moves(db) -> list[tuple[str, str]]:
+@app.task(name='tasks.feed_generator.enrich_feed_event', bind=True, max_retries=2)
+def enrich_feed_event(self, event_id: int):
     """
-    Compare the latest price to the price 15 minutes earlier.
-    If abs(change_pct) >= threshold, create/update a feed event.
-    De-duplicate: one price_move event per asset per 15-minute window.
-    Returns list of (entity_type, entity_code) tuples for significant events.
+    Replace a pending event's template body with an AI-written one.
+    Runs on the `enrichment` queue (see task_routes) so LLM latency is isolated
+    from the detection loop. Idempotent — only touches rows still 'pending'.
     """
+    db = SessionLocal()
+    try:
+        event = db.get(FeedEvent, event_id)
+        if event is None or event.enrichment_status != "pending":
+            return {"event_id": event_id, "status": "skipped"}
+
+        body = _ai_body_for(event)
+        status = "done" if body else "failed"
+        values = {"enrichment_status": status}
+        if body:
+            values["body"] = body[:5000]
+        db.execute(
+            update(FeedEvent)
+            .where(FeedEvent.id == event_id, FeedEvent.enrichment_status == "pending")
+            .values(**values)
+        )
+        db.commit()
+        return {"event_id": event_id, "status": status}
+    except Exception as exc:
+        db.rollback()
+        if self.request.retries >= self.max_retries:
+            log.error("enrich_feed_event: giving up on %d — %s", event_id, exc)
+            db.execute(
+                update(FeedEvent)
+                .where(FeedEvent.id == event_id, FeedEvent.enrichment_status == "pending")
+                .values(enrichment_status="failed")
+            )
+            db.commit()
+            return {"event_id": event_id, "status": "failed"}
+        raise self.retry(exc=exc, countdown=30)
+    finally:
+        db.close()
+
+
+@app.task(name='tasks.feed_generator.requeue_stale_enrichments')
+def requeue_stale_enrichments():
+    """Re-queue 'pending' events whose enrichment task was lost (worker restart, broker flush)."""
     now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            select(FeedEvent.id).where(
+                FeedEvent.enrichment_status == "pending",
+                FeedEvent.published_at < now - timedelta(minutes=ENRICHMENT_STALE_MINUTES),
+                FeedEvent.published_at >= now - timedelta(hours=ENRICHMENT_MAX_AGE_HOURS),
+            )
+        ).scalars().all()
+        # Too old to be worth an LLM call — the template body stays
+        expired = db.execute(
+            update(FeedEvent)
+            .where(
+                FeedEvent.enrichment_status == "pending",
+                FeedEvent.published_at < now - timedelta(hours=ENRICHMENT_MAX_AGE_HOURS),
+            )
+            .values(enrichment_status="failed")
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    for event_id in ids:
+        enrich_feed_event.delay(event_id)
+    if ids or expired:
+        log.info("requeue_stale_enrichments: %d re-queued, %d expired", len(ids), expired)
+    return {"requeued": len(ids), "expired": expired}
+
+
+# ── Anonymous feed snapshot ───────────────────────────────────────────────────
+
+@app.task(name='tasks.feed_generator.materialize_anonymous_feeds')
+def materialize_anonymous_feeds():
+    """
+    Precompute the ranked anonymous feed for every country seen in CF-IPCountry
+    traffic (last 7 days) plus the no-geo default, and store it as one Redis key.
+    GET /api/feed serves anonymous pages from it without a DB round trip.
+    """
+    from app.models.country import Country
+
+    t0 = time.monotonic()
+    try:
+        codes = seen_anonymous_geos()
+    except Exception as exc:
+        log.warning("materialize_anonymous_feeds: geo set unavailable — %s", exc)
+        codes = []
+
+    db = SessionLocal()
+    try:
+        known = dict(db.execute(
+            select(Country.code, Country.id).where(Country.code.in_(codes))
+        ).all()) if codes else {}
+        snapshot = build_anonymous_snapshot(db, {code: known.get(code) for code in codes})
+    finally:
+        db.close()
+
+    redis_json_set(ANON_SNAPSHOT_KEY, snapshot, ttl_seconds=ANON_SNAPSHOT_TTL)
+    # Anonymous cursors name their version — keep its rankings for a scroll session
+    redis_json_set(ANON_RANKINGS_PREFIX + snapshot["version"], snapshot["rankings"],
+                   ttl_seconds=CURSOR_SNAPSHOT_TTL)
+    elapsed = time.monotonic() - t0
+    log.info("materialize_anonymous_feeds: %d rankings, %d events in %.2fs",
+             len(snapshot["rankings"]), len(snapshot["events"]), elapsed)
+    return {"rankings": len(snapshot["rankings"]), "events": len(snapshot["events"]),
+            "seconds": round(elapsed, 2)}
+
+
+# ── Price move events ─────────────────────────────────────────────────────────
+
+# One round trip for the whole universe: per active asset, the latest price in
+# the last 22 min and the latest one 22–45 min ago (both LATERAL probes use the
+# (asset_id, timestamp) index), with change_pct computed server-side. Rows below
+# the smallest per-type threshold never leave Postgres.
+_PRICE_MOVE_CANDIDATES_SQL = text("""
+    SELECT a.id, a.symbol, a.name, a.asset_type, a.currency, a.country_id,
+           l.close AS latest_close,
+           (l.close - p.close) / p.close * 100 AS change_pct
+    FROM assets a
+    CROSS JOIN LATERAL (
+        SELECT close FROM prices
+        WHERE asset_id = a.id AND timestamp >= :latest_cutoff
+        ORDER BY timestamp DESC LIMIT 1
+    ) l
+    CROSS JOIN LATERAL (
+        SELECT close FROM prices
+        WHERE asset_id = a.id AND timestamp < :prev_end AND timestamp >= :prev_start
+        ORDER BY timestamp DESC LIMIT 1
+    ) p
+    WHERE a.is_active = true
+      AND p.close <> 0
+      AND abs((l.close - p.close) / p.close * 100) >= :min_threshold
+""")
+
+
+def _price_move_candidates(db, now: datetime) -> list:
+    """Assets whose price moved at least the global minimum threshold, with change_pct."""
     # Prices are fetched every 15 min — use a 22-min window so a price
     # fetched up to one full cycle ago is still eligible as "latest".
     # Prev window goes back a further 20 min (one full fetch cycle before that).
     latest_cutoff = now - timedelta(minutes=22)
-    prev_end      = latest_cutoff
-    prev_start    = now - timedelta(minutes=45)
+    return db.execute(_PRICE_MOVE_CANDIDATES_SQL, {
+        "latest_cutoff": latest_cutoff,
+        "prev_end":      latest_cutoff,
+        "prev_start":    now - timedelta(minutes=45),
+        "min_threshold": min(PRICE_MOVE_THRESHOLD.values()),
+    }).all()
+
+
+def _recent_price_move_keys(db, since: datetime) -> set[tuple[str, int]]:
+    """(subtype, asset_id) for every single-asset price_move published since `since` — one query."""
+    rows = db.execute(
+        select(FeedEvent.event_subtype, FeedEvent.related_asset_ids).where(
+            FeedEvent.event_type == "price_move",
+            FeedEvent.published_at >= since,
+        )
+    ).all()
+    return {
+        (subtype, ids[0])
+        for subtype, ids in rows
+        if ids and len(ids) == 1
+    }
 
-    assets = db.execute(select(Asset).where(Asset.is_active == True)).scalars().all()
-    triggered: list[tuple[str, str]] = []
 
-    for asset in assets:
-        # Latest price — most recent within the last 22 min
-        latest = db.execute(
-            select(Price)
-            .where(Price.asset_id == asset.id, Price.timestamp >= latest_cutoff)
-            .order_by(Price.timestamp.desc())
-            .limit(1)
-        ).scalar_one_or_none()
-        if latest is None:
-            continue
+def _generate_price_moves(db, to_enrich: list[int]) -> list[tuple[str, str]]:
+    """
+    Compare the latest price to the price 15 minutes earlier.
+    If abs(change_pct) >= threshold, create/update a feed event.
+    De-duplicate: one price_move event per asset per 15-minute window.
+    Returns list of (entity_type, entity_code) tuples for significant events.
 
-        # Previous price — the fetch one cycle earlier (22–45 min ago)
-        prev = db.execute(
-            select(Price)
-            .where(
-                Price.asset_id == asset.id,
-                Price.timestamp < prev_end,
-                Price.timestamp >= prev_start,
-            )
-            .order_by(Price.timestamp.desc())
-            .limit(1)
-        ).scalar_one_or_none()
-        if prev is None or prev.close == 0:
-            continue
+    Set-based: one candidate query + one dedup query per run, regardless of
+    how many assets are tracked. IDs of moves worth an AI body are appended to
+    to_enrich for the caller to queue after commit.
+    """
+    now = datetime.now(timezone.utc)
+    triggered: list[tuple[str, str]] = []
 
-        change_pct = ((latest.close - prev.close) / prev.close) * 100
-        threshold = PRICE_MOVE_THRESHOLD.get(asset.asset_type.value, 1.5)
-        max_pct = PRICE_MOVE_MAX_PCT.get(asset.asset_type.value, 20.0)
+    candidates = _price_move_candidates(db, now)
+    if not candidates:
+        return triggered
+    recent = _recent_price_move_keys(db, now - timedelta(minutes=15))
+
+    for c in candidates:
+        asset_type = c.asset_type.value if isinstance(c.asset_type, AssetType) else str(c.asset_type)
+        change_pct = float(c.change_pct)
+        threshold = PRICE_MOVE_THRESHOLD.get(asset_type, 1.5)
+        max_pct = PRICE_MOVE_MAX_PCT.get(asset_type, 20.0)
         if abs(change_pct) < threshold:
             continue
         if abs(change_pct) > max_pct:
             log.warning(
                 'feed_generator: spike ignored %s %.1f%% (max %.1f%%)',
-                asset.symbol, change_pct, max_pct,
+                c.symbol, change_pct, max_pct,
             )
             continue
 
+        subtype = asset_type  # stock, crypto, commodity, fx
+        if (subtype, c.id) in recent:
+            continue
+        recent.add((subtype, c.id))
+
         direction = "up" if change_pct > 0 else "down"
         sign = "+" if change_pct > 0 else ""
         importance = round(min(10.0, max(1.0, abs(change_pct))), 1)
-        subtype = asset.asset_type.value  # stock, crypto, commodity, fx
-
-        # Dedup check BEFORE calling AI — skip AI if this event would be dropped anyway
-        dedup_cutoff = now - timedelta(minutes=15)
-        already_exists = db.execute(
-            select(FeedEvent.id).where(
-                FeedEvent.event_type == "price_move",
-                FeedEvent.event_subtype == subtype,
-                FeedEvent.related_asset_ids == [asset.id],
-                FeedEvent.published_at >= dedup_cutoff,
-            )
-        ).scalar()
-        if already_exists:
-            continue
 
-        title = f"{asset.symbol} {sign}{change_pct:.1f}% — {asset.name}"
+        title = f"{c.symbol} {sign}{change_pct:.1f}% — {c.name}"
         fallback_body = (
-            f"{asset.name} ({asset.symbol}) moved {sign}{change_pct:.2f}% "
-            f"in the last 15 minutes, trading at {latest.close:,.4f} {asset.currency}."
+            f"{c.name} ({c.symbol}) moved {sign}{change_pct:.2f}% "
+            f"in the last 15 minutes, trading at {c.latest_close:,.4f} {c.currency}."
         )
-        # Only call AI for meaningful moves (≥2%) — use template for small noise moves
-        if abs(change_pct) >= 2.0:
-            body = (
-                _ai_price_body(asset.name, asset.symbol, change_pct, latest.close,
-                               asset.currency, asset.asset_type.value)
-                or fallback_body
-            )
-        else:
-            body = fallback_body
+        # Only meaningful moves (≥2%) get an AI body — template is final for noise moves
+        enrich = abs(change_pct) >= AI_PRICE_MOVE_MIN_PCT
 
-        # Upsert: one event per asset per 15-min window (identified by dedup_window)
-        _upsert_feed_event(
+        # Already deduped against the bulk set above — insert directly
+        event_id = _upsert_feed_event(
             db,
             event_type="price_move",
             event_subtype=subtype,
             title=title,
-            body=body,
+            body=fallback_body,
             published_at=now,
-            related_asset_ids=[asset.id],
-            related_country_ids=[asset.country_id] if asset.country_id else [],
+            related_asset_ids=[c.id],
+            related_country_ids=[c.country_id] if c.country_id else [],
             importance_score=importance,
             event_data={
-                "symbol": asset.symbol,
+                "symbol": c.symbol,
+                "name": c.name,
                 "change_pct": round(change_pct, 4),
-                "price": latest.close,
-                "currency": asset.currency,
+                "price": c.latest_close,
+                "currency": c.currency,
                 "direction": direction,
             },
+            dedup=False,
+            enrich=enrich,
         )
+        if event_id is not None:
+            to_enrich.append(event_id)
         # Trigger summary refresh for large moves (≥7% = high importance)
-        if importance >= 7 and asset.asset_type.value == "stock":
-            triggered.append(("stock", asset.symbol))
+        if importance >= 7 and asset_type == "stock":
+            triggered.append(("stock", c.symbol))
 
     return triggered
 
 
 # ── Macro release events ───────────────────────────────────────────────────────
 
-def _generate_macro_releases(db) -> list[tuple[str, str]]:
+def _generate_macro_releases(db, to_enrich: list[int]) -> list[tuple[str, str]]:
     """
     Surface high-importance economic indicator data as feed events.
     Uses NOW as published_at (when we surface it) not period_date.
@@ -292,39 +472,36 @@ def _generate_macro_releases(db) -> list[tuple[str, str]]:
             f"as of {period_str}. "
             f"Source: {indicator_row.source}."
         )
-        # Only call AI for high-importance macro events (≥7) — template is fine for tier-2
-        if importance >= 7.0:
-            body = (
-                _ai_macro_body(country.name, label, value_str, period_str,
-                               indicator_row.source, importance)
-                or fallback_body
-            )
-        else:
-            body = fallback_body
+        # Only high-importance macro events (≥7) get an AI body — template is fine for tier-2
+        enrich = importance >= AI_MACRO_MIN_IMPORTANCE
 
         # Dedup per (country, indicator, period) — not just indicator.
         # Each data point published once; only re-published if period_date is new.
         period_slug = indicator_row.period_date.strftime("%Y-%m")
         subtype_with_period = f"{indicator_row.indicator}:{period_slug}"
 
-        _upsert_feed_event(
+        event_id = _upsert_feed_event(
             db,
             event_type="macro_release",
             event_subtype=subtype_with_period,
             title=title,
-            body=body,
+            body=fallback_body,
             published_at=now,
             related_asset_ids=[],
             related_country_ids=[country.id],
             importance_score=importance,
             event_data={
                 "country_code": country.code,
+                "country_name": country.name,
                 "indicator": indicator_row.indicator,
                 "value": indicator_row.value,
                 "period": str(indicator_row.period_date),
                 "source": indicator_row.source,
             },
+            enrich=enrich,
         )
+        if event_id is not None:
+            to_enrich.append(event_id)
         # Trigger summary refresh for high-importance macro events
         if importance >= 7:
             triggered.append(("country", country.code))
@@ -345,11 +522,16 @@ def _upsert_feed_event(
     related_country_ids: list[int],
     importance_score: float,
     event_data: dict,
-) -> None:
+    dedup: bool = True,
+    enrich: bool = False,
+) -> int | None:
     """
     Insert a feed event. Deduplicates per (type, subtype, asset/country) within
     a rolling window to prevent identical cards on repeated task runs.
     Window: 15 min for price_move, 6 hours for macro/indicator.
+    Pass dedup=False when the caller has already deduped in bulk.
+    enrich=True marks the row 'pending' and returns its id (flushed) so the caller
+    can queue enrich_feed_event after commit; otherwise 'template' and None.
     """
     if event_type == 'price_move':
         dedup_minutes = 15   # one card per asset per 15 min — matches fetch cadence
@@ -367,18 +549,19 @@ def _upsert_feed_event(
         FeedEvent.published_at >= dedup_cutoff,
     )
 
-    # For price moves: dedup per asset
+    # For price moves: dedup per asset; for macro/indicator: per country.
+    # @> hits the GIN index, the equality recheck keeps the match exact.
     if related_asset_ids:
-        q = q.where(FeedEvent.related_asset_ids == related_asset_ids)
-
-    # For macro/indicator: dedup per country
+        q = q.where(FeedEvent.related_asset_ids.contains(related_asset_ids),
+                    FeedEvent.related_asset_ids == related_asset_ids)
     if related_country_ids:
-        q = q.where(FeedEvent.related_country_ids == related_country_ids)
+        q = q.where(FeedEvent.related_country_ids.contains(related_country_ids),
+                    FeedEvent.related_country_ids == related_country_ids)
 
-    if db.execute(q).scalar():
-        return
+    if dedup and db.execute(q).scalar():
+        return None
 
-    db.add(FeedEvent(
+    event = FeedEvent(
         title=title,
         body=body,
         event_type=event_type,
@@ -388,4 +571,10 @@ def _upsert_feed_event(
         related_country_ids=related_country_ids or None,
         importance_score=importance_score,
         event_data=event_data,
-    ))
+        enrichment_status="pending" if enrich else "template",
+    )
+    db.add(event)
+    if not enrich:
+        return None
+    db.flush()  # assign id so the caller can queue enrichment after commit
+    return event.id
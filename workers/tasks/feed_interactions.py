@@ -0,0 +1,37 @@
+"""
+Flush buffered feed interactions from the Redis stream into user_interactions.
+
+POST /api/feed/{id}/interact only XADDs to `feed:interactions`; this task drains
+the stream every 10 seconds via the `flushers` consumer group and writes each
+batch as one multi-row upsert (highest-intent wins — see
+app.services.interaction_buffer). Entries are acked after commit, so a crashed
+run is simply replayed on the next tick.
+"""
+import logging
+import socket
+
+from celery_app import app
+from app.database import SessionLocal
+from app.services.interaction_buffer import flush_stream
+
+log = logging.getLogger(__name__)
+
+# Stable consumer name per host — a restarted worker re-reads its own pending entries
+_CONSUMER = f"flusher@{socket.gethostname()}"
+
+
+@app.task(name='tasks.feed_interactions.flush_interactions', ignore_result=True)
+def flush_interactions():
+    db = SessionLocal()
+    try:
+        stats = flush_stream(db, _CONSUMER)
+        if stats["read"]:
+            log.info("flush_interactions: %d read, %d upserted, %d dropped in %d batches",
+                     stats["read"], stats["written"], stats["dropped"], stats["batches"])
+        return stats
+    except Exception as exc:
+        db.rollback()
+        log.error("flush_interactions: failed — %s", exc, exc_info=True)
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,52 @@
+"""
+Page-view ingestion workers.
+
+flush_page_views  — every 30s: drain the `analytics:page_views` Redis stream
+                    into page_views (multi-row INSERT) + page_view_daily rollups
+prune_page_views  — daily: delete raw page_views past retention (rollups stay)
+
+See app.services.page_view_buffer for the buffering contract.
+"""
+import logging
+import socket
+
+from celery_app import app
+from app.database import SessionLocal
+from app.services.page_view_buffer import PAGE_VIEW_RETENTION_DAYS, flush_stream, prune_raw_page_views
+
+log = logging.getLogger(__name__)
+
+# Stable consumer name per host — a restarted worker re-reads its own pending entries
+_CONSUMER = f"flusher@{socket.gethostname()}"
+
+
+@app.task(name='tasks.page_views.flush_page_views', ignore_result=True)
+def flush_page_views():
+    db = SessionLocal()
+    try:
+        stats = flush_stream(db, _CONSUMER)
+        if stats["read"]:
+            log.info("flush_page_views: %d views in %d batches", stats["written"], stats["batches"])
+        return stats
+    except Exception as exc:
+        db.rollback()
+        log.error("flush_page_views: failed — %s", exc, exc_info=True)
+        raise
+    finally:
+        db.close()
+
+
+@app.task(name='tasks.page_views.prune_page_views', ignore_result=True)
+def prune_page_views():
+    db = SessionLocal()
+    try:
+        deleted = prune_raw_page_views(db)
+        log.info("prune_page_views: deleted %d raw rows older than %d days",
+                 deleted, PAGE_VIEW_RETENTION_DAYS)
+        return {"deleted": deleted}
+    except Exception as exc:
+        db.rollback()
+        log.error("prune_page_views: failed — %s", exc, exc_info=True)
+        raise
+    finally:
+        db.close()
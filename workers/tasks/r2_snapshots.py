@@ -13,22 +13,39 @@ R2 key layout:
   snapshots/rankings/stability.json        — country stability scores
   snapshots/meta/snapshot_index.json       — manifest of all generated keys + timestamps
 
-Run manually:
+Objects are stored gzip-compressed (Content-Encoding: gzip) — the JSON is
+highly repetitive, so this cuts storage, R2 egress and transfer several-fold.
+Cloudflare passes the encoding through (or decodes for the rare client that
+does not accept gzip); the API proxy negotiates the same way.
+
+Writes are incremental: every payload is hashed (generated_at excluded) and
+compared with the "objects" map ({key: hash}) of the previous manifest; only
+objects whose content changed are uploaded and purged from the Cloudflare
+cache. An unchanged object keeps its earlier generated_at. The hash also covers
+STORAGE_FORMAT, so changing the encoding (and bumping the tag) makes the next
+run re-upload everything in the new format.
+
+Run manually (force=True re-uploads everything, e.g. after a bucket restore):
   celery -A celery_app call tasks.r2_snapshots.write_r2_snapshots
 """
 
+import gzip
+import hashlib
 import json
 import logging
+import os
+import threading
 import time
 import urllib.request
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 
+import botocore.exceptions
 from celery import shared_task
 from sqlalchemy import select, func, or_
 
 # Make backend importable (workers/ sits one level above backend/app/)
-import sys, os
+import sys
 sys.path.insert(0, '/root/metricshour/backend')
 
 from app.database import SessionLocal
@@ -41,29 +58,83 @@ log = logging.getLogger(__name__)
 
 _BUCKET = None  # resolved lazily
 
+MANIFEST_KEY = "snapshots/meta/snapshot_index.json"
+CDN_BASE = "https://cdn.metricshour.com"
+GZIP_LEVEL = 9   # written once a day, read many times
+# Storage-format tag folded into every content hash — bump it whenever the
+# on-R2 encoding changes so the next run rewrites every object in the new format.
+STORAGE_FORMAT = b"gz1:"
+
 
 def _bucket() -> str:
     return settings.r2_bucket_name
 
 
 def _upload(key: str, data: dict | list) -> None:
-    body = json.dumps(data, default=str).encode()
+    body = gzip.compress(json.dumps(data, default=str).encode(), compresslevel=GZIP_LEVEL)
     get_r2_client().put_object(
         Bucket=_bucket(),
         Key=key,
         Body=body,
         ContentType="application/json",
+        ContentEncoding="gzip",
         # s-maxage = Cloudflare edge TTL; max-age = browser TTL
         CacheControl="public, s-maxage=3600, max-age=3600, stale-while-revalidate=86400",
     )
 
 
-def _purge_cf_cache(urls: list[str]) -> None:
+def _content_hash(data: dict | list) -> str:
+    """Stable digest of a payload and its storage format, ignoring top-level generated_at."""
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k != "generated_at"}
+    body = json.dumps(data, default=str, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(STORAGE_FORMAT + body, digest_size=12).hexdigest()
+
+
+def _load_manifest_hashes() -> dict[str, str]:
+    """{key: hash} from the previous run's manifest — empty if missing or pre-dating hashes."""
+    try:
+        obj = get_r2_client().get_object(Bucket=_bucket(), Key=MANIFEST_KEY)
+        body = obj["Body"].read()
+        if body[:2] == b"\x1f\x8b":
+            body = gzip.decompress(body)
+        return json.loads(body).get("objects") or {}
+    except botocore.exceptions.ClientError as exc:
+        if exc.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            log.warning("Snapshot manifest fetch failed — uploading everything: %s", exc)
+        return {}
+    except Exception as exc:
+        log.warning("Snapshot manifest unreadable — uploading everything: %s", exc)
+        return {}
+
+
+class _SnapshotSync:
+    """Uploads a snapshot only when its content hash differs from the previous manifest."""
+
+    def __init__(self, previous: dict[str, str]):
+        self.previous = previous
+        self.hashes: dict[str, str] = {}
+        self.changed: list[str] = []
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: dict | list) -> None:
+        digest = _content_hash(data)
+        unchanged = self.previous.get(key) == digest
+        if not unchanged:
+            _upload(key, data)
+        with self._lock:
+            self.hashes[key] = digest
+            if not unchanged:
+                self.changed.append(key)
+
+
+def _purge_cf_cache(urls: list[str]) -> bool:
+    """Purge URLs from the Cloudflare cache. Never raises; False only when a configured purge failed."""
     token = getattr(settings, "cf_cache_purge_token", None) or os.environ.get("CF_CACHE_PURGE_TOKEN")
     zone_id = getattr(settings, "cf_zone_id", None) or os.environ.get("CF_ZONE_ID")
     if not token or not zone_id:
         log.warning("CF_CACHE_PURGE_TOKEN or CF_ZONE_ID not set — skipping cache purge")
-        return
+        return True
     payload = json.dumps({"files": urls}).encode()
     req = urllib.request.Request(
         f"https://api.cloudflare.com/client/v4/zones/{zone_id}/purge_cache",
@@ -76,10 +147,11 @@ def _purge_cf_cache(urls: list[str]) -> None:
             result = json.loads(resp.read())
             if result.get("success"):
                 log.info("CF cache purged: %s", urls)
-            else:
-                log.warning("CF cache purge failed: %s", result.get("errors"))
+                return True
+            log.warning("CF cache purge failed: %s", result.get("errors"))
     except Exception as exc:
         log.warning("CF cache purge error: %s", exc)
+    return False
 
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
@@ -157,10 +229,10 @@ def _asset_summary(a: Asset, country: Country | None = None, price: Price | None
 
 # ── Snapshot writers ────────────────────────────────────────────────────────────
 
-def _write_country_list(db) -> int:
+def _write_country_list(db, sync: _SnapshotSync) -> int:
     countries = db.execute(select(Country).order_by(Country.name)).scalars().all()
     data = [_country_summary(c) for c in countries]
-    _upload("snapshots/lists/countries.json", {
+    sync.put("snapshots/lists/countries.json", {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "count": len(data),
         "data": data,
@@ -168,7 +240,7 @@ def _write_country_list(db) -> int:
     return len(data)
 
 
-def _write_asset_list(db) -> int:
+def _write_asset_list(db, sync: _SnapshotSync) -> int:
     assets = db.execute(
         select(Asset).where(Asset.is_active == True).order_by(Asset.market_cap_usd.desc().nullslast())
     ).scalars().all()
@@ -198,7 +270,7 @@ def _write_asset_list(db) -> int:
         prices = {p.asset_id: p for p in price_rows}
 
     data = [_asset_summary(a, countries.get(a.country_id), prices.get(a.id)) for a in assets]
-    _upload("snapshots/lists/assets.json", {
+    sync.put("snapshots/lists/assets.json", {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "count": len(data),
         "data": data,
@@ -206,7 +278,7 @@ def _write_asset_list(db) -> int:
     return len(data)
 
 
-def _write_country_snapshots(db) -> int:
+def _write_country_snapshots(db, sync: _SnapshotSync) -> int:
     countries = db.execute(select(Country)).scalars().all()
 
     # Pre-load all indicators, trade pairs, revenues in bulk to avoid N+1 queries
@@ -322,11 +394,11 @@ def _write_country_snapshots(db) -> int:
 
     def _upload_variants(args):
         slug_key, iso_lower_key, iso_upper_key, data = args
-        _upload(slug_key, data)
+        sync.put(slug_key, data)
         if iso_lower_key:
-            _upload(iso_lower_key, data)
+            sync.put(iso_lower_key, data)
         if iso_upper_key:
-            _upload(iso_upper_key, data)
+            sync.put(iso_upper_key, data)
 
     with ThreadPoolExecutor(max_workers=20) as pool:
         futures = [pool.submit(_upload_variants, p) for p in payloads]
@@ -336,7 +408,7 @@ def _write_country_snapshots(db) -> int:
     return len(payloads)
 
 
-def _write_stock_snapshots(db) -> int:
+def _write_stock_snapshots(db, sync: _SnapshotSync) -> int:
     stocks = db.execute(
         select(Asset).where(Asset.asset_type == AssetType.stock, Asset.is_active == True)
     ).scalars().all()
@@ -394,14 +466,14 @@ def _write_stock_snapshots(db) -> int:
 
     payloads = [_build_stock(a) for a in stocks]
     with ThreadPoolExecutor(max_workers=20) as pool:
-        futures = [pool.submit(lambda kv: _upload(kv[0], kv[1]), p) for p in payloads]
+        futures = [pool.submit(lambda kv: sync.put(kv[0], kv[1]), p) for p in payloads]
         for f in as_completed(futures):
             f.result()
 
     return len(payloads)
 
 
-def _write_trade_snapshots(db) -> int:
+def _write_trade_snapshots(db, sync: _SnapshotSync) -> int:
     # Best year per pair: prefer most recent year with imports_usd; fall back to max year overall
     from sqlalchemy import case as sa_case
     best_year_sq = (
@@ -483,9 +555,9 @@ def _write_trade_snapshots(db) -> int:
 
     def _upload_trade(args):
         slug_key, iso_key, data = args
-        _upload(slug_key, data)
+        sync.put(slug_key, data)
         if iso_key:
-            _upload(iso_key, data)
+            sync.put(iso_key, data)
 
     with ThreadPoolExecutor(max_workers=20) as pool:
         futures = [pool.submit(_upload_trade, p) for p in trade_payloads]
@@ -495,7 +567,7 @@ def _write_trade_snapshots(db) -> int:
     return len(trade_payloads)
 
 
-def _write_stability_rankings(db) -> int:
+def _write_stability_rankings(db, sync: _SnapshotSync) -> int:
     """Country stability scores — composite of governance WGI indicators."""
     WGI = [
         "rule_of_law_index", "political_stability_index", "government_effectiveness_index",
@@ -542,7 +614,7 @@ def _write_stability_rankings(db) -> int:
     for i, r in enumerate(rankings):
         r["rank"] = i + 1
 
-    _upload("snapshots/rankings/stability.json", {
+    sync.put("snapshots/rankings/stability.json", {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "count": len(rankings),
         "data": rankings,
@@ -553,8 +625,8 @@ def _write_stability_rankings(db) -> int:
 # ── Main task ─────────────────────────────────────────────────────────────────
 
 @shared_task(name="tasks.r2_snapshots.write_r2_snapshots", bind=True, max_retries=2, default_retry_delay=300)
-def write_r2_snapshots(self):
-    """Write all processed JSON snapshots to Cloudflare R2."""
+def write_r2_snapshots(self, force: bool = False):
+    """Write changed JSON snapshots to Cloudflare R2 (all of them when force=True)."""
     if not (settings.r2_endpoint and settings.r2_access_key_id and settings.r2_secret_access_key):
         log.warning("R2 credentials not configured — skipping snapshot write")
         return {"status": "skipped", "reason": "R2 not configured"}
@@ -563,63 +635,49 @@ def write_r2_snapshots(self):
     stats: dict[str, int] = {}
 
     try:
+        sync = _SnapshotSync({} if force else _load_manifest_hashes())
+
         with SessionLocal() as db:
             log.info("R2 snapshots: writing country list…")
-            stats["country_list"] = _write_country_list(db)
+            stats["country_list"] = _write_country_list(db, sync)
 
             log.info("R2 snapshots: writing asset list…")
-            stats["asset_list"] = _write_asset_list(db)
+            stats["asset_list"] = _write_asset_list(db, sync)
 
             log.info("R2 snapshots: writing %d country snapshots…", stats["country_list"])
-            stats["countries"] = _write_country_snapshots(db)
+            stats["countries"] = _write_country_snapshots(db, sync)
 
             log.info("R2 snapshots: writing stock snapshots…")
-            stats["stocks"] = _write_stock_snapshots(db)
+            stats["stocks"] = _write_stock_snapshots(db, sync)
 
             log.info("R2 snapshots: writing trade pair snapshots…")
-            stats["trade_pairs"] = _write_trade_snapshots(db)
+            stats["trade_pairs"] = _write_trade_snapshots(db, sync)
 
             log.info("R2 snapshots: writing stability rankings…")
-            stats["rankings"] = _write_stability_rankings(db)
-
-        # Write manifest
+            stats["rankings"] = _write_stability_rankings(db, sync)
+
+        # Purge only what changed from the CF cache. Keys whose purge failed are
+        # left out of the manifest so the next run uploads and purges them again.
+        changed = sorted(sync.changed)
+        for i in range(0, len(changed), 30):
+            batch = changed[i:i + 30]
+            if not _purge_cf_cache([f"{CDN_BASE}/{key}" for key in batch]):
+                for key in batch:
+                    sync.hashes.pop(key, None)
+
+        # Write manifest last — its "objects" map is the baseline for the next run
         elapsed = round(time.time() - t0, 1)
         manifest = {
             "generated_at": datetime.now(timezone.utc).isoformat(),
             "elapsed_seconds": elapsed,
             "counts": stats,
+            "uploaded": len(sync.changed),
+            "objects": dict(sorted(sync.hashes.items())),
         }
-        _upload("snapshots/meta/snapshot_index.json", manifest)
-
-        total = sum(stats.values())
-        log.info("R2 snapshots complete: %d objects in %.1fs", total, elapsed)
+        _upload(MANIFEST_KEY, manifest)
 
-        # Purge list snapshots + all country/stock/trade detail pages from CF cache
-        base = "https://cdn.metricshour.com"
-        purge_urls = [
-            f"{base}/snapshots/lists/countries.json",
-            f"{base}/snapshots/lists/assets.json",
-        ]
-        with SessionLocal() as db2:
-            all_countries = db2.execute(select(Country)).scalars().all()
-            for c in all_countries:
-                purge_urls.append(f"{base}/snapshots/countries/{c.slug}.json")
-                if c.code and c.code.lower() != c.slug:
-                    purge_urls.append(f"{base}/snapshots/countries/{c.code.lower()}.json")
-                if c.code:
-                    purge_urls.append(f"{base}/snapshots/countries/{c.code.upper()}.json")
-            pairs = db2.execute(select(TradePair.exporter_id, TradePair.importer_id)).all()
-            slug_map = {c.id: c.slug for c in all_countries}
-            code_map = {c.id: c.code.lower() for c in all_countries if c.code}
-            for e, i in pairs:
-                if e in slug_map and i in slug_map:
-                    purge_urls.append(f"{base}/snapshots/trade/{slug_map[e]}--{slug_map[i]}.json")
-                if e in code_map and i in code_map:
-                    iso = f"{base}/snapshots/trade/{code_map[e]}-{code_map[i]}.json"
-                    purge_urls.append(iso)
-
-        for i in range(0, len(purge_urls), 30):
-            _purge_cf_cache(purge_urls[i:i + 30])
+        log.info("R2 snapshots complete: %d objects, %d changed, in %.1fs",
+                 len(sync.hashes), len(sync.changed), elapsed)
 
         # Ping IndexNow after snapshots are written — content is fresh, crawlers should see it now
         try:
@@ -629,7 +687,7 @@ def write_r2_snapshots(self):
         except Exception as ping_exc:
             log.warning("Failed to queue IndexNow ping: %s", ping_exc)
 
-        return {"status": "ok", "elapsed_seconds": elapsed, **stats}
+        return {"status": "ok", "elapsed_seconds": elapsed, "uploaded": len(sync.changed), **stats}
 
     except Exception as exc:
         log.exception("R2 snapshot write failed: %s", exc)
@@ -1,8 +1,18 @@
 """
-Meilisearch index sync — pushes countries + assets from Postgres into Meilisearch.
+Meilisearch index sync — pushes countries, assets and published blogs from Postgres into Meilisearch.
 
-Runs daily at 7:15am UTC (after R2 snapshots complete at 7am).
-Can also be triggered manually: celery call tasks.search_index.reindex_search
+reindex_search     daily at 7:15am UTC (after R2 snapshots complete at 7am):
+                   full push of every document, which also refreshes the
+                   market-cap ordering of the assets index
+sync_search_delta  every 2 minutes: drains search_outbox (filled by triggers
+                   on countries / assets / blog_posts, migration 0031) and
+                   pushes only the changed documents — deleting assets that
+                   were deactivated, blogs that were unpublished and rows
+                   that no longer exist
+
+Both tell API workers to rebuild their in-process fallback index
+(app.services.local_search). Can also be triggered manually:
+celery call tasks.search_index.reindex_search
 """
 
 import os
@@ -10,19 +20,20 @@ import logging
 
 import meilisearch
 from celery import shared_task
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session
-
-import sys
-sys.path.insert(0, '/root/metricshour/backend')
+from sqlalchemy import select, text, true
 
-from app.models import Country, Asset  # noqa: E402 — needs sys.path above
+from app.database import SessionLocal
+from app.models import Country, Asset
+from app.models.feed import BlogPost, BlogStatus
+from app.services.meili import blog_document
+from app.services.local_search import bump_local_index_version
 
 log = logging.getLogger(__name__)
 
 _MEILI_URL = os.environ.get("MEILI_URL", "http://127.0.0.1:7700")
 _MEILI_KEY = os.environ.get("MEILI_MASTER_KEY", "")
-_DB_URL = os.environ.get("DATABASE_URL", "")
+
+OUTBOX_BATCH_SIZE = 5000
 
 
 def _client() -> meilisearch.Client:
@@ -49,6 +60,19 @@ def _configure_indexes(client: meilisearch.Client) -> None:
         },
     })
 
+    # Blogs (published posts only)
+    client.create_index("blogs", {"primaryKey": "id"})
+    client.index("blogs").update_settings({
+        "searchableAttributes": ["title", "excerpt", "category", "body"],
+        "sortableAttributes": ["published_ts"],
+        "filterableAttributes": [],
+        "rankingRules": ["words", "typo", "proximity", "attribute", "sort", "exactness"],
+        "typoTolerance": {
+            "enabled": True,
+            "minWordSizeForTypos": {"oneTypo": 4, "twoTypos": 8},
+        },
+    })
+
     # Assets
     client.create_index("assets", {"primaryKey": "id"})
     client.index("assets").update_settings({
@@ -63,6 +87,55 @@ def _configure_indexes(client: meilisearch.Client) -> None:
     })
 
 
+def _indexed_ids(index, page_size: int = 1000) -> set[int]:
+    """Primary keys currently in a Meilisearch index."""
+    ids: set[int] = set()
+    offset = 0
+    while True:
+        page = index.get_documents({"fields": ["id"], "limit": page_size, "offset": offset})
+        ids.update(int(doc.id) for doc in page.results)
+        offset += page_size
+        if offset >= page.total:
+            return ids
+
+
+def _country_document(c: Country) -> dict:
+    return {
+        "id": c.id,
+        "code": c.code,
+        "name": c.name,
+        "name_official": c.name_official or c.name,
+        "flag_emoji": c.flag_emoji or "",
+        "region": c.region or "",
+        "subregion": c.subregion or "",
+        "currency_code": c.currency_code or "",
+        "currency_name": c.currency_name or "",
+        "capital_city": c.capital_city or "",
+        "is_g20": 1 if c.is_g20 else 0,
+    }
+
+
+def _asset_document(a: Asset) -> dict:
+    return {
+        "id": a.id,
+        "symbol": a.symbol,
+        "name": a.name,
+        "sector": a.sector or "",
+        "industry": a.industry or "",
+        "asset_type": a.asset_type.value,
+        "is_active": True,
+        "market_cap_usd": float(a.market_cap_usd) if a.market_cap_usd else 0.0,
+    }
+
+
+# indexUid → (model, rows that belong in the index, document builder)
+_INDEXED = {
+    "countries": (Country, true(), _country_document),
+    "assets": (Asset, Asset.is_active == True, _asset_document),
+    "blogs": (BlogPost, BlogPost.status == BlogStatus.published, blog_document),
+}
+
+
 @shared_task(
     name="tasks.search_index.reindex_search",
     bind=True,
@@ -70,66 +143,116 @@ def _configure_indexes(client: meilisearch.Client) -> None:
     default_retry_delay=60,
 )
 def reindex_search(self):
-    """Full reindex of countries + assets into Meilisearch."""
+    """Full reindex of countries, assets and blogs into Meilisearch."""
+    # API workers rebuild their in-process fallback index on the same schedule
+    bump_local_index_version()
     if not _MEILI_KEY:
         log.warning("MEILI_MASTER_KEY not set — skipping search reindex")
         return {"skipped": True}
 
-    engine = create_engine(_DB_URL, pool_pre_ping=True)
-
+    db = SessionLocal()
     try:
         client = _client()
         _configure_indexes(client)
 
-        with Session(engine) as db:
-            # --- Countries ---
-            countries = db.execute(select(Country)).scalars().all()
-            country_docs = [
-                {
-                    "id": c.id,
-                    "code": c.code,
-                    "name": c.name,
-                    "name_official": c.name_official or c.name,
-                    "flag_emoji": c.flag_emoji or "",
-                    "region": c.region or "",
-                    "subregion": c.subregion or "",
-                    "currency_code": c.currency_code or "",
-                    "currency_name": c.currency_name or "",
-                    "capital_city": c.capital_city or "",
-                    "is_g20": 1 if c.is_g20 else 0,
-                }
-                for c in countries
-            ]
-            client.index("countries").add_documents(country_docs)
-            log.info(f"Indexed {len(country_docs)} countries")
-
-            # --- Assets ---
-            assets = db.execute(
-                select(Asset).where(Asset.is_active == True)
-            ).scalars().all()
-            asset_docs = [
-                {
-                    "id": a.id,
-                    "symbol": a.symbol,
-                    "name": a.name,
-                    "sector": a.sector or "",
-                    "industry": a.industry or "",
-                    "asset_type": a.asset_type.value,
-                    "is_active": True,
-                    "market_cap_usd": float(a.market_cap_usd) if a.market_cap_usd else 0.0,
-                }
-                for a in assets
-            ]
-            client.index("assets").add_documents(asset_docs)
-            log.info(f"Indexed {len(asset_docs)} assets")
+        # --- Countries ---
+        countries = db.execute(select(Country)).scalars().all()
+        country_docs = [_country_document(c) for c in countries]
+        client.index("countries").add_documents(country_docs)
+        log.info(f"Indexed {len(country_docs)} countries")
+
+        # --- Assets ---
+        assets = db.execute(
+            select(Asset).where(Asset.is_active == True)
+        ).scalars().all()
+        asset_docs = [_asset_document(a) for a in assets]
+        client.index("assets").add_documents(asset_docs)
+        log.info(f"Indexed {len(asset_docs)} assets")
+
+        # --- Blogs --- upsert, then delete only posts that are no longer
+        # published: emptying the index first would serve an empty blog
+        # section until the add task finished. Ids are listed before the
+        # query so a post published in between is not deleted.
+        blogs = client.index("blogs")
+        indexed_blog_ids = _indexed_ids(blogs)
+        posts = db.execute(
+            select(BlogPost).where(BlogPost.status == BlogStatus.published)
+        ).scalars().all()
+        blog_docs = [blog_document(p) for p in posts]
+        if blog_docs:
+            blogs.add_documents(blog_docs)
+        removed = sorted(indexed_blog_ids - {d["id"] for d in blog_docs})
+        if removed:
+            blogs.delete_documents(removed)
+        log.info(f"Indexed {len(blog_docs)} blogs, removed {len(removed)}")
 
         return {
             "countries": len(country_docs),
             "assets": len(asset_docs),
+            "blogs": len(blog_docs),
         }
 
     except Exception as exc:
         log.error(f"Search reindex failed: {exc}")
         raise self.retry(exc=exc)
     finally:
-        engine.dispose()
+        db.close()
+
+
+@shared_task(name="tasks.search_index.sync_search_delta", ignore_result=True)
+def sync_search_delta():
+    """
+    Push documents changed since the last run. Outbox rows are locked
+    (SKIP LOCKED, so overlapping runs split the work) and deleted in the same
+    transaction that pushed them — a Meilisearch failure rolls back and the
+    next run retries them.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            SELECT id, index_uid, doc_id FROM search_outbox
+            ORDER BY id LIMIT :n
+            FOR UPDATE SKIP LOCKED
+        """), {"n": OUTBOX_BATCH_SIZE}).all()
+        if not rows:
+            return
+
+        changed: dict[str, set[int]] = {}
+        for _, index_uid, doc_id in rows:
+            changed.setdefault(index_uid, set()).add(doc_id)
+
+        counts = {}
+        client = _client() if _MEILI_KEY else None
+        for index_uid, ids in changed.items():
+            if index_uid not in _INDEXED:
+                log.warning("search_outbox: unknown index %s (%d rows ignored)", index_uid, len(ids))
+                continue
+            model, indexed, build = _INDEXED[index_uid]
+            docs = [
+                build(obj) for obj in db.execute(
+                    select(model).where(model.id.in_(ids), indexed)
+                ).scalars()
+            ]
+            removed = sorted(ids - {d["id"] for d in docs})
+            if client is not None:
+                index = client.index(index_uid)
+                if docs:
+                    index.add_documents(docs)
+                if removed:
+                    index.delete_documents(removed)
+            counts[index_uid] = (len(docs), len(removed))
+
+        db.execute(
+            text("DELETE FROM search_outbox WHERE id = ANY(:ids)"),
+            {"ids": [r[0] for r in rows]},
+        )
+        db.commit()
+        bump_local_index_version()
+        log.info("search delta: %s", ", ".join(
+            f"{uid} +{n}/-{m}" for uid, (n, m) in counts.items()
+        ))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -3,31 +3,28 @@ Smart Money Tracker — SEC EDGAR 13F-HR filing parser.
 
 Fetches quarterly 13F filings for tracked institutional investors.
 Runs after each quarterly deadline (mid-Feb, mid-May, mid-Aug, mid-Nov).
+All SEC requests go through tasks.edgar_client (shared rate limiter + archive cache).
 """
+import io
 import logging
 import re
-import time
 import xml.etree.ElementTree as ET
 from datetime import date, datetime, timedelta, timezone
-from typing import Optional
+from typing import BinaryIO, Optional
 
-import requests
 from celery import shared_task
 from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.database import SessionLocal
 from app.models.smart_money import SmartMoneyInvestor, SmartMoneyFiling, SmartMoneyHolding
+from tasks.cusip_resolver import SymbolResolver
+from tasks.edgar_client import edgar_get, edgar_open
 
 log = logging.getLogger(__name__)
 
 EDGAR_BASE = "https://data.sec.gov"
 EDGAR_SEARCH = "https://efts.sec.gov/LATEST/search-index"
-# SEC requires a User-Agent header with contact info
-HEADERS = {
-    "User-Agent": "MetricsHour contact@metricshour.com",
-    "Accept": "application/json",
-}
 
 # Tier 1 — featured individuals
 # Tier 2 — featured funds
@@ -82,8 +79,8 @@ def _fetch_13f_filings(cik: str) -> list[dict]:
     try:
         # Use the submissions API for structured data
         sub_url = f"{EDGAR_BASE}/submissions/CIK{padded_cik}.json"
-        r = requests.get(sub_url, headers=HEADERS, timeout=15)
-        if r.status_code != 200:
+        r = edgar_get(sub_url, timeout=15)
+        if r is None:
             return []
         data = r.json()
         filings_data = data.get("filings", {}).get("recent", {})
@@ -110,19 +107,17 @@ def _fetch_13f_filings(cik: str) -> list[dict]:
         return []
 
 
-def _fetch_holdings(cik: str, accession_raw: str) -> list[dict]:
-    """Parse holdings from a 13F-HR XML filing."""
+def _holdings_xml_url(cik: str, accession_raw: str) -> Optional[str]:
+    """Locate the infoTable XML document inside a 13F-HR filing directory."""
     cik_int = int(cik.lstrip("0") or "0")
     accession = accession_raw.replace("-", "")
-    acc_fmt = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
     dir_url = f"https://www.sec.gov/Archives/edgar/data/{cik_int}/{accession}/"
 
     primary_xml = None
     try:
-        time.sleep(0.2)
-        r = requests.get(dir_url, headers=HEADERS, timeout=15)
-        if r.status_code != 200:
-            return []
+        r = edgar_get(dir_url, timeout=15)
+        if r is None:
+            return None
         # Find XML files in the directory listing; skip primary_doc.xml and index files
         xml_files = re.findall(r'href="([^"]+\.xml)"', r.text, re.IGNORECASE)
         for fname in xml_files:
@@ -140,115 +135,128 @@ def _fetch_holdings(cik: str, accession_raw: str) -> list[dict]:
                     primary_xml = match.group(1).split("/")[-1]
     except Exception as e:
         log.debug("Filing directory fetch failed %s/%s: %s", cik, accession, e)
-        return []
+        return None
 
     if not primary_xml:
         log.debug("No XML found in filing directory for %s/%s", cik, accession)
-        return []
+        return None
+    return f"https://www.sec.gov/Archives/edgar/data/{cik_int}/{accession}/{primary_xml}"
 
-    xml_url = f"https://www.sec.gov/Archives/edgar/data/{cik_int}/{accession}/{primary_xml}"
+
+def _fetch_holdings(cik: str, accession_raw: str) -> list[dict]:
+    """Parse holdings from a 13F-HR XML filing."""
+    xml_url = _holdings_xml_url(cik, accession_raw)
+    if not xml_url:
+        return []
     try:
-        time.sleep(0.2)
-        r = requests.get(xml_url, headers=HEADERS, timeout=30)
-        if r.status_code != 200:
+        f = edgar_open(xml_url, timeout=60)
+        if f is None:
             return []
-        return _parse_13f_xml(r.text)
+        with f:
+            return _parse_13f_xml(f)
     except Exception as e:
         log.debug("Holdings XML fetch failed %s: %s", xml_url, e)
         return []
 
 
-def _parse_13f_xml(xml_text: str) -> list[dict]:
+# infoTable child elements we read — matched on local name so any namespace
+# prefix (ns1:, n1:, default xmlns) works without rewriting the document.
+_INFO_FIELDS = {"nameOfIssuer", "cusip", "value", "sshPrnamt"}
+_SCALE_SAMPLE_ROWS = 20
+
+
+def _local(tag: str) -> str:
+    """'{http://www.sec.gov/...}infoTable' → 'infoTable'."""
+    return tag.rsplit("}", 1)[-1] if tag[:1] == "{" else tag.rsplit(":", 1)[-1]
+
+
+def _parse_13f_xml(source: bytes | str | BinaryIO) -> list[dict]:
     """Parse 13F-HR XML infoTable into list of holdings.
+
+    Streaming: iterparse over a file object (or bytes/str), namespace-aware via
+    local tag names. Each infoTable is folded into a per-CUSIP aggregate as soon
+    as its end tag arrives and then cleared from the tree, so memory stays
+    proportional to distinct holdings, not rows or document size.
+
     Aggregates duplicate CUSIP entries (multiple subsidiary accounts for same stock).
     Auto-detects whether values are in USD or thousands of USD by checking
     the price-per-share implied by the first several holdings.
     """
+    if isinstance(source, str):
+        source = source.encode()
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
     raw: dict[str, dict] = {}
+    implied_prices: list[float] = []
+    root = None
     try:
-        xml_clean = re.sub(r'\s+(?:xmlns(?::\w+)?|\w+:\w+)="[^"]*"', '', xml_text)
-        xml_clean = re.sub(r'<(/?)(\w+):(\w)', r'<\1\3', xml_clean)
-        root = ET.fromstring(xml_clean)
-
-        rows = []
-        for info in root.iter("infoTable"):
-            name_el = info.find("nameOfIssuer")
-            cusip_el = info.find("cusip")
-            value_el = info.find("value")
-            shares_el = info.find(".//sshPrnamt")
-            if value_el is None:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if _local(elem.tag) != "infoTable":
+                continue
+
+            fields: dict[str, str] = {}
+            for child in elem.iter():
+                name = _local(child.tag)
+                if name in _INFO_FIELDS and name not in fields:
+                    fields[name] = (child.text or "").strip()
+            elem.clear()
+            root.clear()   # drop processed siblings — keeps the tree O(1)
+
+            if "value" not in fields:
                 continue
-            company_name = (name_el.text or "").strip() if name_el is not None else ""
-            cusip = (cusip_el.text or "").strip() if cusip_el is not None else ""
             try:
-                value_raw = float(value_el.text or 0)
-            except (ValueError, TypeError):
+                value_raw = float(fields["value"] or 0)
+            except ValueError:
                 continue
             shares = None
-            if shares_el is not None:
+            if "sshPrnamt" in fields:
                 try:
-                    shares = int(shares_el.text or 0)
-                except (ValueError, TypeError):
+                    shares = int(float(fields["sshPrnamt"] or 0))
+                except ValueError:
                     pass
-            rows.append({"company_name": company_name, "cusip": cusip, "value_raw": value_raw, "shares": shares})
 
-        if not rows:
-            return []
+            if len(implied_prices) < _SCALE_SAMPLE_ROWS and shares and value_raw > 0:
+                implied_prices.append(value_raw / shares)
 
-        # Auto-detect scale: check implied price per share for first few holdings with shares.
-        # SEC standard is thousands; some filers (e.g. Berkshire) report in dollars.
-        # If median implied $/share < $5, values are in thousands (need ×1000).
-        implied_prices = []
-        for r in rows[:20]:
-            if r["shares"] and r["shares"] > 0 and r["value_raw"] > 0:
-                implied_prices.append(r["value_raw"] / r["shares"])
-
-        scale = 1.0
-        if implied_prices:
-            median_price = sorted(implied_prices)[len(implied_prices) // 2]
-            if median_price < 5.0:
-                scale = 1000.0  # values are in thousands, convert to dollars
-
-        for r in rows:
-            value_usd = r["value_raw"] * scale
-            key = r["cusip"] if r["cusip"] else r["company_name"]
-            if key in raw:
-                raw[key]["value_usd"] += value_usd
-                if r["shares"]:
-                    raw[key]["shares"] = (raw[key]["shares"] or 0) + r["shares"]
-            else:
+            company_name = fields.get("nameOfIssuer", "")
+            cusip = fields.get("cusip", "")
+            key = cusip if cusip else company_name
+            agg = raw.get(key)
+            if agg is None:
                 raw[key] = {
-                    "company_name": r["company_name"],
-                    "cusip": r["cusip"],
-                    "value_usd": value_usd,
-                    "shares": r["shares"],
+                    "company_name": company_name,
+                    "cusip": cusip,
+                    "value_usd": value_raw,      # raw units until scale is known
+                    "shares": shares,
                 }
+            else:
+                agg["value_usd"] += value_raw
+                if shares:
+                    agg["shares"] = (agg["shares"] or 0) + shares
 
     except ET.ParseError as e:
         log.debug("XML parse error: %s", e)
-    return list(raw.values())
+        return []
 
+    if not raw:
+        return []
 
-def _resolve_symbol(company_name: str, cusip: str) -> Optional[str]:
-    """Best-effort: look up ticker symbol from company name in our assets table."""
-    if not company_name:
-        return None
-    db = SessionLocal()
-    try:
-        from app.models.asset import Asset, AssetType
-        from sqlalchemy import func as sqlfunc
-        row = db.execute(
-            select(Asset.symbol)
-            .where(Asset.asset_type == AssetType.stock)
-            .where(Asset.is_active == True)
-            .where(sqlfunc.lower(Asset.name).contains(company_name[:25].lower()))
-            .limit(1)
-        ).scalar_one_or_none()
-        return row
-    except Exception:
-        return None
-    finally:
-        db.close()
+    # Auto-detect scale: check implied price per share for first few holdings with shares.
+    # SEC standard is thousands; some filers (e.g. Berkshire) report in dollars.
+    # If median implied $/share < $5, values are in thousands (need ×1000).
+    # Scaling is linear, so applying it after aggregation matches per-row scaling.
+    if implied_prices:
+        median_price = sorted(implied_prices)[len(implied_prices) // 2]
+        if median_price < 5.0:
+            for agg in raw.values():
+                agg["value_usd"] *= 1000.0
+
+    return list(raw.values())
 
 
 def seed_investors():
@@ -291,7 +299,6 @@ def fetch_13f_filings(self, cik: str = None):
         for investor in investors:
             log.info("Fetching 13F filings for %s (CIK %s)", investor.name, investor.cik)
             filings = _fetch_13f_filings(investor.cik)
-            time.sleep(0.5)
 
             for f in filings:
                 try:
@@ -346,6 +353,9 @@ def parse_holdings(self, filing_id: int = None):
     """Parse holdings from 13F XML for unparsed filings."""
     db = SessionLocal()
     try:
+        # One in-memory CUSIP/name index for the whole run — O(1) lookups per holding
+        resolver = SymbolResolver.load(db)
+
         query = select(SmartMoneyFiling, SmartMoneyInvestor)\
             .join(SmartMoneyInvestor, SmartMoneyFiling.investor_id == SmartMoneyInvestor.id)\
             .where(SmartMoneyFiling.parsed == False)
@@ -363,7 +373,6 @@ def parse_holdings(self, filing_id: int = None):
                 continue
             log.info("Parsing holdings for %s %s", investor.name, filing.quarter_label)
             raw_holdings = _fetch_holdings(investor.cik, filing.accession_number)
-            time.sleep(0.3)
 
             if not raw_holdings:
                 filing.parsed = True
@@ -399,7 +408,7 @@ def parse_holdings(self, filing_id: int = None):
 
             holding_rows = []
             for h in raw_holdings:
-                symbol = _resolve_symbol(h["company_name"], h["cusip"])
+                symbol = resolver.resolve(h["company_name"], h["cusip"], h["value_usd"])
                 pct = (h["value_usd"] / total_value * 100) if total_value else None
 
                 change_type = "new"
@@ -436,14 +445,75 @@ def parse_holdings(self, filing_id: int = None):
             if holding_rows:
                 db.execute(pg_insert(SmartMoneyHolding).values(holding_rows).on_conflict_do_nothing())
 
+            resolver.flush(db)
             filing.parsed = True
             db.commit()
             parsed_count += 1
 
-        return {"parsed": parsed_count}
+        report = resolver.report()
+        log.info("13F symbol resolution: cusip=%d exact=%d fuzzy=%d unresolved=%d "
+                 "(%s%% of holdings, %s%% of value)",
+                 report["cusip"], report["exact"], report["fuzzy"], report["unresolved"],
+                 report["resolved_pct"], report["value_resolved_pct"])
+        return {"parsed": parsed_count, "resolution": report}
     except Exception as exc:
         db.rollback()
         log.error("Holdings parse error: %s", exc)
         raise self.retry(exc=exc, countdown=300)
     finally:
         db.close()
+
+
+# ── Parser benchmark ──────────────────────────────────────────────────────────
+
+def _bench_parser(slugs: list[str]) -> None:
+    """
+    Time + peak-memory comparison of the streaming parser against a full-document
+    parse (regex namespace strip + ET.fromstring), on each filer's latest 13F.
+    Defaults to the largest filers we track (tens of thousands of infoTable rows).
+    """
+    import time
+    import tracemalloc
+
+    ciks = {slug: cik for slug, _, _, cik, _, _ in INVESTOR_SEED}
+    print(f"{'filer':<26}{'rows':>8}{'xml MB':>9}{'stream s':>10}{'stream MB':>11}{'full s':>9}{'full MB':>9}")
+    for slug in slugs:
+        cik = ciks.get(slug)
+        filings = _fetch_13f_filings(cik) if cik else []
+        xml_url = _holdings_xml_url(cik, filings[0]["accession_number"]) if filings else None
+        f = edgar_open(xml_url) if xml_url else None   # warms the disk cache
+        if f is None:
+            print(f"{slug:<26}  no filing XML")
+            continue
+        with f:
+            size_mb = len(f.read()) / 1e6
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with edgar_open(xml_url) as f:
+            holdings = _parse_13f_xml(f)
+        stream_s = time.perf_counter() - t0
+        stream_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        with edgar_open(xml_url) as f:
+            xml_text = f.read().decode()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        xml_clean = re.sub(r'\s+(?:xmlns(?::\w+)?|\w+:\w+)="[^"]*"', '', xml_text)
+        xml_clean = re.sub(r'<(/?)(\w+):(\w)', r'<\1\3', xml_clean)
+        rows = sum(1 for _ in ET.fromstring(xml_clean).iter("infoTable"))
+        full_s = time.perf_counter() - t0
+        full_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        del xml_text, xml_clean
+
+        print(f"{slug:<26}{rows:>8}{size_mb:>9.1f}{stream_s:>10.2f}{stream_mb:>11.1f}"
+              f"{full_s:>9.2f}{full_mb:>9.1f}   ({len(holdings)} CUSIPs)")
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if sys.argv[1:2] == ["bench"]:
+        _bench_parser(sys.argv[2:] or ["citadel", "renaissance-technologies", "two-sigma"])